@@ -9,7 +9,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from app.database import Base
-from app.models import user, finance, document, marketing, task, chat
+from app.models import user, finance, document, marketing, task, chat, sync
 
 # this is the Alembic Config object
 config = context.config
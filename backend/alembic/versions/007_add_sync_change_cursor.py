@@ -0,0 +1,87 @@
+"""Add change cursor for delta sync
+
+Revision ID: 007
+Revises: 006
+Create Date: 2025-11-20
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+# table -> entity name used in tombstones
+SYNC_TABLES = {
+    'tasks': 'task',
+    'finance_records': 'finance_record',
+    'documents': 'document',
+    'marketing_campaigns': 'marketing_campaign',
+    'chat_conversations': 'chat_conversation',
+}
+
+
+def upgrade() -> None:
+    # Курсор изменений = id транзакции (xid8), монотонный 64-битный счётчик Postgres.
+    # Чтение ограничивается xmin снимка, поэтому незавершённые транзакции не теряются.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION sync_set_change_seq() RETURNS trigger AS $$
+        BEGIN
+            NEW.change_seq := pg_current_xact_id()::text::bigint;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION sync_record_tombstone() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO sync_tombstones (user_id, entity, entity_id, change_seq)
+            VALUES (OLD.user_id, TG_ARGV[0], OLD.id, pg_current_xact_id()::text::bigint);
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    op.create_table(
+        'sync_tombstones',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(length=50), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_sync_tombstones_user_change_seq', 'sync_tombstones', ['user_id', 'change_seq'])
+
+    for table, entity in SYNC_TABLES.items():
+        # Существующие строки получают курсор 1 — их вернёт первая синхронизация (since=0)
+        op.add_column(table, sa.Column('change_seq', sa.BigInteger(), nullable=False, server_default='1'))
+        op.create_index(f'idx_{table}_user_change_seq', table, ['user_id', 'change_seq'])
+        op.execute(f"""
+            CREATE TRIGGER trg_{table}_change_seq
+            BEFORE INSERT OR UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION sync_set_change_seq()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER trg_{table}_tombstone
+            AFTER DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION sync_record_tombstone('{entity}')
+        """)
+
+
+def downgrade() -> None:
+    for table in SYNC_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_tombstone ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_change_seq ON {table}")
+        op.drop_index(f'idx_{table}_user_change_seq', table_name=table)
+        op.drop_column(table, 'change_seq')
+
+    op.drop_index('idx_sync_tombstones_user_change_seq', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+
+    op.execute("DROP FUNCTION IF EXISTS sync_record_tombstone()")
+    op.execute("DROP FUNCTION IF EXISTS sync_set_change_seq()")
@@ -0,0 +1,38 @@
+"""Add keyword rules for finance categorization
+
+Revision ID: 008
+Revises: 007
+Create Date: 2025-11-21
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('finance_category_rules',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('keyword', sa.String(length=255), nullable=False),
+        sa.Column('category', sa.String(length=100), nullable=False),
+        sa.Column('type', sa.String(length=20), nullable=False),
+        sa.Column('weight', sa.Numeric(precision=6, scale=2), nullable=False, server_default='1'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_finance_category_rules_id'), 'finance_category_rules', ['id'], unique=False)
+    op.create_index('idx_category_rules_user_type', 'finance_category_rules', ['user_id', 'type'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_category_rules_user_type', table_name='finance_category_rules')
+    op.drop_index(op.f('ix_finance_category_rules_id'), table_name='finance_category_rules')
+    op.drop_table('finance_category_rules')
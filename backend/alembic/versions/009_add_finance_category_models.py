@@ -0,0 +1,38 @@
+"""Add per-user category classifier storage
+
+Revision ID: 009
+Revises: 008
+Create Date: 2025-11-22
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('finance_category_models',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('classes', sa.JSON(), nullable=False),
+        sa.Column('weights', sa.LargeBinary(), nullable=False),
+        sa.Column('samples', sa.Integer(), nullable=False),
+        sa.Column('trained_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    # Обучающая выборка: проверенные записи пользователя
+    op.create_index(
+        'idx_finance_records_user_verified', 'finance_records', ['user_id', 'id'],
+        unique=False, postgresql_where=sa.text('is_verified')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_finance_records_user_verified', table_name='finance_records')
+    op.drop_table('finance_category_models')
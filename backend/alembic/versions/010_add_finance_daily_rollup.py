@@ -0,0 +1,96 @@
+"""Add incrementally maintained daily finance rollup
+
+Revision ID: 010
+Revises: 009
+Create Date: 2025-11-23
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+UPSERT = """
+        INSERT INTO finance_daily_rollup AS r (user_id, day, type, category, amount, count)
+        SELECT user_id, day, type, category, sum(amount), sum(n)
+        FROM ({source}) delta
+        GROUP BY user_id, day, type, category
+        HAVING sum(amount) <> 0 OR sum(n) <> 0
+        ORDER BY user_id, day, type, category
+        ON CONFLICT (user_id, day, type, category) DO UPDATE
+        SET amount = r.amount + EXCLUDED.amount, count = r.count + EXCLUDED.count;
+"""
+NEW_ROWS = "SELECT user_id, date AS day, type, coalesce(category, '') AS category, amount, 1 AS n FROM new_rows"
+OLD_ROWS = "SELECT user_id, date AS day, type, coalesce(category, '') AS category, -amount AS amount, -1 AS n FROM old_rows"
+
+
+def upgrade() -> None:
+    # Без FK на users: при каскадном удалении пользователя триггер ещё пишет дельты,
+    # которые обнуляют и удаляют его строки
+    op.create_table('finance_daily_rollup',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('type', sa.String(length=20), nullable=False),
+        sa.Column('category', sa.String(length=100), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=18, scale=2), nullable=False, server_default='0'),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('user_id', 'day', 'type', 'category')
+    )
+
+    # Триггеры уровня оператора с таблицами переходов: пакетный INSERT/COPY
+    # даёт одно обновление агрегатов на оператор, а не на строку
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION finance_rollup_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {UPSERT.format(source=NEW_ROWS)}
+            ELSIF TG_OP = 'DELETE' THEN
+                {UPSERT.format(source=OLD_ROWS)}
+            ELSE
+                {UPSERT.format(source=NEW_ROWS + " UNION ALL " + OLD_ROWS)}
+            END IF;
+
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM finance_daily_rollup r
+                USING (SELECT DISTINCT user_id, date FROM old_rows) o
+                WHERE r.user_id = o.user_id AND r.day = o.date AND r.count = 0;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_finance_records_rollup_insert
+        AFTER INSERT ON finance_records REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION finance_rollup_apply()
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_finance_records_rollup_update
+        AFTER UPDATE ON finance_records REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION finance_rollup_apply()
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_finance_records_rollup_delete
+        AFTER DELETE ON finance_records REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION finance_rollup_apply()
+    """)
+
+    # Заполнение по существующим записям
+    op.execute("""
+        INSERT INTO finance_daily_rollup (user_id, day, type, category, amount, count)
+        SELECT user_id, date, type, coalesce(category, ''), sum(amount), count(*)
+        FROM finance_records
+        GROUP BY user_id, date, type, coalesce(category, '')
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_finance_records_rollup_delete ON finance_records")
+    op.execute("DROP TRIGGER IF EXISTS trg_finance_records_rollup_update ON finance_records")
+    op.execute("DROP TRIGGER IF EXISTS trg_finance_records_rollup_insert ON finance_records")
+    op.execute("DROP FUNCTION IF EXISTS finance_rollup_apply()")
+    op.drop_table('finance_daily_rollup')
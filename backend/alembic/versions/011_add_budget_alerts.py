@@ -0,0 +1,57 @@
+"""Add budget spend counters and threshold alerts
+
+Revision ID: 011
+Revises: 010
+Create Date: 2025-11-24
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('finance_budget_spend',
+        sa.Column('budget_id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(length=100), nullable=False),
+        sa.Column('window_start', sa.Date(), nullable=False),
+        sa.Column('window_end', sa.Date(), nullable=False),
+        sa.Column('spent', sa.Numeric(precision=18, scale=2), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['budget_id'], ['finance_budgets.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('budget_id')
+    )
+
+    op.create_table('finance_budget_alerts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('budget_id', sa.Integer(), nullable=False),
+        sa.Column('threshold', sa.Integer(), nullable=False),
+        sa.Column('window_start', sa.Date(), nullable=False),
+        sa.Column('spent', sa.Numeric(precision=18, scale=2), nullable=False),
+        sa.Column('budget_amount', sa.Numeric(precision=15, scale=2), nullable=False),
+        sa.Column('is_read', sa.Boolean(), nullable=True, server_default='false'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['budget_id'], ['finance_budgets.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_finance_budget_alerts_id'), 'finance_budget_alerts', ['id'], unique=False)
+    op.create_index(
+        'uq_budget_alert_window_threshold', 'finance_budget_alerts',
+        ['budget_id', 'window_start', 'threshold'], unique=True
+    )
+    op.create_index('idx_budget_alerts_user_created', 'finance_budget_alerts', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_budget_alerts_user_created', table_name='finance_budget_alerts')
+    op.drop_index('uq_budget_alert_window_threshold', table_name='finance_budget_alerts')
+    op.drop_index(op.f('ix_finance_budget_alerts_id'), table_name='finance_budget_alerts')
+    op.drop_table('finance_budget_alerts')
+    op.drop_table('finance_budget_spend')
@@ -0,0 +1,29 @@
+"""Add precomputed finance insights
+
+Revision ID: 012
+Revises: 011
+Create Date: 2025-11-25
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('finance_insight_snapshots',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('insights', sa.JSON(), nullable=False),
+        sa.Column('generated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('finance_insight_snapshots')
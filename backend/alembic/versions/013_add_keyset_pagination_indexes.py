@@ -0,0 +1,27 @@
+"""Extend list indexes with id for keyset pagination
+
+Revision ID: 013
+Revises: 012
+Create Date: 2025-11-26
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # (user_id, date, id) покрывает и прежние запросы по (user_id, date)
+    op.drop_index('idx_user_date', table_name='finance_records')
+    op.create_index('idx_user_date', 'finance_records', ['user_id', 'date', 'id'])
+    op.create_index('idx_documents_user_created', 'documents', ['user_id', 'created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_documents_user_created', table_name='documents')
+    op.drop_index('idx_user_date', table_name='finance_records')
+    op.create_index('idx_user_date', 'finance_records', ['user_id', 'date'])
@@ -0,0 +1,28 @@
+"""Add import fingerprints to finance records
+
+Revision ID: 014
+Revises: 013
+Create Date: 2025-11-27
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Записи, созданные вручную и до этой миграции, остаются без отпечатка (NULL не конфликтует)
+    op.add_column('finance_records', sa.Column('fingerprint', sa.String(length=40), nullable=True))
+    op.create_index(
+        'uq_finance_records_user_fingerprint', 'finance_records', ['user_id', 'fingerprint'], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_finance_records_user_fingerprint', table_name='finance_records')
+    op.drop_column('finance_records', 'fingerprint')
@@ -0,0 +1,23 @@
+"""Add counterparty INN to finance records
+
+Revision ID: 015
+Revises: 014
+Create Date: 2025-11-28
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '015'
+down_revision = '014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('finance_records', sa.Column('counterparty_inn', sa.String(length=12), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('finance_records', 'counterparty_inn')
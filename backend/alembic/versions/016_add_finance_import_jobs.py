@@ -0,0 +1,47 @@
+"""Add background finance import jobs
+
+Revision ID: 016
+Revises: 015
+Create Date: 2025-11-29
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '016'
+down_revision = '015'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('finance_import_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('file_name', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('total_size', sa.BigInteger(), nullable=False),
+        sa.Column('received_size', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('rows_processed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('records_created', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('records_failed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('records_skipped', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('errors', sa.JSON(), nullable=False, server_default='[]'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_finance_import_jobs_id'), 'finance_import_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_finance_import_jobs_user_id'), 'finance_import_jobs', ['user_id'], unique=False)
+    # Поиск зависших импортов фоновой задачей
+    op.create_index('idx_finance_import_jobs_status_updated', 'finance_import_jobs', ['status', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_finance_import_jobs_status_updated', table_name='finance_import_jobs')
+    op.drop_index(op.f('ix_finance_import_jobs_user_id'), table_name='finance_import_jobs')
+    op.drop_index(op.f('ix_finance_import_jobs_id'), table_name='finance_import_jobs')
+    op.drop_table('finance_import_jobs')
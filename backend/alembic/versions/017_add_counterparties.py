@@ -0,0 +1,76 @@
+"""Add normalized counterparties
+
+Revision ID: 017
+Revises: 016
+Create Date: 2025-11-30
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '017'
+down_revision = '016'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('counterparties',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('normalized_name', sa.String(length=255), nullable=False),
+        sa.Column('inn', sa.String(length=12), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_counterparties_id'), 'counterparties', ['id'], unique=False)
+    op.create_index(
+        'uq_counterparties_user_inn', 'counterparties', ['user_id', 'inn'],
+        unique=True, postgresql_where=sa.text('inn IS NOT NULL')
+    )
+    op.create_index(
+        'uq_counterparties_user_name_without_inn', 'counterparties', ['user_id', 'normalized_name'],
+        unique=True, postgresql_where=sa.text('inn IS NULL')
+    )
+    op.create_index('idx_counterparties_user_name', 'counterparties', ['user_id', 'normalized_name'], unique=False)
+
+    # Существующие записи и документы связываются с контрагентами задачей app.tasks.backfill_counterparties,
+    # которую ставит в очередь запуск Celery-воркера
+    op.add_column('finance_records', sa.Column('counterparty_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_finance_records_counterparty', 'finance_records', 'counterparties',
+        ['counterparty_id'], ['id'], ondelete='SET NULL'
+    )
+    op.create_index(
+        'idx_finance_records_user_counterparty', 'finance_records', ['user_id', 'counterparty_id', 'date'],
+        postgresql_include=['type', 'amount'], postgresql_where=sa.text('counterparty_id IS NOT NULL')
+    )
+
+    op.add_column('documents', sa.Column('counterparty_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_documents_counterparty', 'documents', 'counterparties',
+        ['counterparty_id'], ['id'], ondelete='SET NULL'
+    )
+    op.create_index(
+        'idx_documents_user_counterparty', 'documents', ['user_id', 'counterparty_id', 'created_at'],
+        postgresql_where=sa.text('counterparty_id IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_documents_user_counterparty', table_name='documents')
+    op.drop_constraint('fk_documents_counterparty', 'documents', type_='foreignkey')
+    op.drop_column('documents', 'counterparty_id')
+
+    op.drop_index('idx_finance_records_user_counterparty', table_name='finance_records')
+    op.drop_constraint('fk_finance_records_counterparty', 'finance_records', type_='foreignkey')
+    op.drop_column('finance_records', 'counterparty_id')
+
+    op.drop_index('idx_counterparties_user_name', table_name='counterparties')
+    op.drop_index('uq_counterparties_user_name_without_inn', table_name='counterparties')
+    op.drop_index('uq_counterparties_user_inn', table_name='counterparties')
+    op.drop_index(op.f('ix_counterparties_id'), table_name='counterparties')
+    op.drop_table('counterparties')
@@ -0,0 +1,30 @@
+"""Add sync tombstone retention horizon
+
+Revision ID: 018
+Revises: 017
+Create Date: 2025-12-01
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '018'
+down_revision = '017'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('sync_horizon',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_sync_tombstones_created', 'sync_tombstones', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_sync_tombstones_created', table_name='sync_tombstones')
+    op.drop_table('sync_horizon')
@@ -7,6 +7,7 @@ from typing import List
 
 from app.database import get_db_sync
 from app.auth import get_current_user
+from app.rate_limit import chat_message_limiter, chat_action_limiter, llm_tokens_quota
 from app.models.user import User
 from app.schemas.chat import (
     ChatConversation, ChatConversationCreate, ChatConversationUpdate, ChatConversationWithMessages,
@@ -87,18 +88,21 @@ def delete_conversation(
 
 # ============= Message Endpoints =============
 
-@router.post("/messages", response_model=ChatMessage)
+@router.post("/messages", response_model=ChatMessage, dependencies=[Depends(chat_message_limiter)])
 async def send_message(
     data: ChatMessageCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db_sync)
 ):
     """Send message to AI assistant."""
+    await llm_tokens_quota.check(current_user.id)
     service = ChatService(db)
     try:
-        return await service.send_message(current_user.id, data)
+        message = await service.send_message(current_user.id, data)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    await llm_tokens_quota.charge(current_user.id, message.tokens_used or 0)
+    return message
 
 
 @router.get("/conversations/{conversation_id}/messages", response_model=List[ChatMessage])
@@ -145,9 +149,10 @@ def get_statistics(
 
 from app.schemas.chat import ActionExecutionRequest, ActionExecutionResult, SuggestedAction
 from app.services.action_executor import ActionExecutor
+from app.services.finance_insights import schedule_refresh
 
 
-@router.post("/actions/execute", response_model=ActionExecutionResult)
+@router.post("/actions/execute", response_model=ActionExecutionResult, dependencies=[Depends(chat_action_limiter)])
 async def execute_action(
     request: ActionExecutionRequest,
     current_user: User = Depends(get_current_user),
@@ -162,6 +167,9 @@ async def execute_action(
         parameters=request.action.parameters
     )
     
+    if result["success"] and request.action.type in ActionExecutor.FINANCE_ACTIONS:
+        await schedule_refresh(current_user.id)
+    
     return ActionExecutionResult(**result)
 
 
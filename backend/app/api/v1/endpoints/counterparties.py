@@ -0,0 +1,44 @@
+"""API endpoints справочника контрагентов"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+
+from app.database import get_db_sync
+from app.auth import get_current_user
+from app.models.user import User
+from app.schemas.counterparty import CounterpartyTurnover
+from app.services.counterparties import counterparty_turnover
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[CounterpartyTurnover])
+async def get_counterparties(
+    start_date: Optional[date] = Query(None, description="Начальная дата"),
+    end_date: Optional[date] = Query(None, description="Конечная дата"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """Крупнейшие по обороту контрагенты за период: доходы, расходы, операции и документы"""
+    
+    return counterparty_turnover(db, current_user.id, start_date=start_date, end_date=end_date, limit=limit)
+
+
+@router.get("/{counterparty_id}", response_model=CounterpartyTurnover)
+async def get_counterparty(
+    counterparty_id: int,
+    start_date: Optional[date] = Query(None, description="Начальная дата"),
+    end_date: Optional[date] = Query(None, description="Конечная дата"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """Обороты с одним контрагентом за период"""
+    
+    turnover = counterparty_turnover(
+        db, current_user.id, start_date=start_date, end_date=end_date, counterparty_ids=[counterparty_id]
+    )
+    if not turnover:
+        raise HTTPException(status_code=404, detail="Контрагент не найден")
+    return turnover[0]
@@ -1,10 +1,11 @@
 """API endpoints для модуля документов"""
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from app.database import get_db_sync
 from app.auth import get_current_user
+from app.pagination import NEXT_CURSOR_HEADER, keyset_page
 from app.models.user import User
 from app.models.document import Document, Template
 from app.schemas.document import (
@@ -23,6 +24,7 @@ from app.schemas.document import (
     DocumentStatistics,
 )
 from app.services.document_service import DocumentService
+from app.services.counterparties import resolve_counterparty
 
 router = APIRouter()
 
@@ -148,14 +150,16 @@ async def delete_template(
 
 @router.get("/", response_model=List[DocumentPreview])
 async def get_documents(
+    response: Response,
     document_type: Optional[str] = Query(None, description="Фильтр по типу"),
     status: Optional[str] = Query(None, description="Фильтр по статусу"),
     limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+    offset: int = Query(0, ge=0, description="Устарело: используйте cursor"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db_sync)
 ):
-    """Получить список документов пользователя"""
+    """Получить список документов пользователя (от новых к старым, курсор - в X-Next-Cursor)"""
     
     query = db.query(Document).filter(Document.user_id == current_user.id)
     
@@ -164,7 +168,13 @@ async def get_documents(
     if status:
         query = query.filter(Document.status == status)
     
-    documents = query.order_by(Document.created_at.desc()).offset(offset).limit(limit).all()
+    try:
+        documents, next_cursor = keyset_page(query, [Document.created_at, Document.id], cursor, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return documents
 
 
@@ -197,6 +207,7 @@ async def create_document(
     
     db_document = Document(
         user_id=current_user.id,
+        counterparty_id=resolve_counterparty(db, current_user.id, document.counterparty_name, document.counterparty_inn),
         **document.model_dump()
     )
     db.add(db_document)
@@ -225,6 +236,10 @@ async def update_document(
     update_data = document_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_document, field, value)
+    if {'counterparty_name', 'counterparty_inn'} & update_data.keys():
+        db_document.counterparty_id = resolve_counterparty(
+            db, current_user.id, db_document.counterparty_name, db_document.counterparty_inn
+        )
     
     # Увеличиваем версию при изменении контента
     if 'content' in update_data:
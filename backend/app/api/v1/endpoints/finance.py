@@ -1,31 +1,55 @@
 """API endpoints для финансового модуля"""
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Integer, and_, any_, bindparam, delete, insert, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date, timedelta
 
+from app.config import settings
 from app.database import get_db_sync
 from app.auth import get_current_user
+from app.pagination import NEXT_CURSOR_HEADER, keyset_page
+from app.rate_limit import finance_upload_limiter, import_rows_quota
+from app.singleflight import finance_analytics_flight
 from app.models.user import User
-from app.models.finance import FinanceRecord, FinanceBudget, FinanceGoal
+from app.models.finance import FinanceRecord, FinanceBudget, FinanceGoal, FinanceCategoryRule, FinanceBudgetAlert
 from app.schemas.finance import (
     FinanceRecord as FinanceRecordSchema,
     FinanceRecordCreate,
     FinanceRecordUpdate,
+    FinanceRecordBulkCreate,
+    FinanceRecordBulkUpdate,
+    FinanceRecordBulkDelete,
+    FinanceRecordBulkDeleteResponse,
     CSVUploadResponse,
+    FinanceImportJob as FinanceImportJobSchema,
+    FinanceImportJobCreate,
     FinanceSummary,
     FinanceSummaryWithTrends,
     CashFlowData,
+    CashFlowForecast,
     FinanceInsights,
     FinanceBudget as FinanceBudgetSchema,
     FinanceBudgetCreate,
     FinanceBudgetUpdate,
     BudgetStatus,
+    FinanceBudgetAlert as FinanceBudgetAlertSchema,
     FinanceGoal as FinanceGoalSchema,
     FinanceGoalCreate,
     FinanceGoalUpdate,
+    FinanceCategoryRule as FinanceCategoryRuleSchema,
+    FinanceCategoryRuleCreate,
 )
 from app.services.finance_service import FinanceService
+from app.services.finance_export import record_filters, stream_csv, stream_xlsx
+from app.services.finance_classifier import categorize_batch, schedule_training
+from app.services.budget_alerts import BudgetAlertEngine, expense_deltas
+from app.services.counterparties import CounterpartyResolver, resolve_counterparty
+from app.services.finance_forecast import MAX_HORIZON, forecast_cache
+from app.services import finance_import_jobs
+from app.services.finance_insights import get_stored_insights, refresh_insights, schedule_refresh
 
 router = APIRouter()
 
@@ -41,51 +65,96 @@ async def create_record(
     """Создать финансовую запись вручную"""
     
     # Автоматическая категоризация
+    ai_category, ai_confidence = categorize_batch(
+        [(record.description or '', record.type)],
+        db=db,
+        user_id=current_user.id
+    )[0]
     if not record.category:
-        ai_category, ai_confidence = FinanceService.categorize_transaction(
-            record.description or '',
-            record.type
-        )
         record.category = ai_category
     
     db_record = FinanceRecord(
         user_id=current_user.id,
+        ai_category=ai_category,
+        ai_confidence=ai_confidence,
+        counterparty_id=resolve_counterparty(db, current_user.id, record.counterparty, record.counterparty_inn),
         **record.model_dump()
     )
     db.add(db_record)
+    db.flush()
+    BudgetAlertEngine(db).apply(current_user.id, expense_deltas(db_record))
     db.commit()
     db.refresh(db_record)
+    await schedule_refresh(current_user.id)
     return db_record
 
 
 @router.get("/records", response_model=List[FinanceRecordSchema])
 async def get_records(
+    response: Response,
     start_date: Optional[date] = Query(None, description="Начальная дата"),
     end_date: Optional[date] = Query(None, description="Конечная дата"),
     type: Optional[str] = Query(None, description="Тип: income или expense"),
     category: Optional[str] = Query(None, description="Категория"),
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+    offset: int = Query(0, ge=0, description="Устарело: используйте cursor"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db_sync)
 ):
-    """Получить список финансовых записей с фильтрами"""
+    """
+    Получить список финансовых записей с фильтрами.
     
-    query = db.query(FinanceRecord).filter(FinanceRecord.user_id == current_user.id)
+    Записи отсортированы по (date, id) от новых к старым. Если есть
+    следующая страница, её курсор возвращается в заголовке X-Next-Cursor.
+    """
+    
+    query = db.query(FinanceRecord).filter(
+        *record_filters(current_user.id, start_date, end_date, type, category)
+    )
     
-    if start_date:
-        query = query.filter(FinanceRecord.date >= start_date)
-    if end_date:
-        query = query.filter(FinanceRecord.date <= end_date)
-    if type:
-        query = query.filter(FinanceRecord.type == type)
-    if category:
-        query = query.filter(FinanceRecord.category == category)
+    try:
+        records, next_cursor = keyset_page(query, [FinanceRecord.date, FinanceRecord.id], cursor, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    records = query.order_by(FinanceRecord.date.desc()).offset(offset).limit(limit).all()
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return records
 
 
+@router.get("/records/export")
+async def export_records(
+    format: str = Query("csv", pattern="^(csv|xlsx)$", description="Формат: csv или xlsx"),
+    start_date: Optional[date] = Query(None, description="Начальная дата"),
+    end_date: Optional[date] = Query(None, description="Конечная дата"),
+    type: Optional[str] = Query(None, description="Тип: income или expense"),
+    category: Optional[str] = Query(None, description="Категория"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Выгрузить финансовые записи в CSV или XLSX (фильтры - как у списка записей).
+    
+    Файл формируется потоково: записи читаются из БД пачками по мере отправки.
+    """
+    
+    criteria = record_filters(current_user.id, start_date, end_date, type, category)
+    file_name = f"finance_records_{date.today().isoformat()}.{format}"
+    
+    if format == "xlsx":
+        body = stream_xlsx(criteria)
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        body = stream_csv(criteria)
+        media_type = "text/csv; charset=utf-8"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+    )
+
+
 @router.get("/records/{record_id}", response_model=FinanceRecordSchema)
 async def get_record(
     record_id: int,
@@ -123,12 +192,25 @@ async def update_record(
         raise HTTPException(status_code=404, detail="Запись не найдена")
     
     # Обновление полей
+    deltas = expense_deltas(db_record, sign=-1)
     update_data = record_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_record, field, value)
+    if COUNTERPARTY_FIELDS & update_data.keys():
+        db_record.counterparty_id = resolve_counterparty(
+            db, current_user.id, db_record.counterparty, db_record.counterparty_inn
+        )
     
+    db.flush()
+    BudgetAlertEngine(db).apply(current_user.id, deltas + expense_deltas(db_record))
     db.commit()
     db.refresh(db_record)
+    
+    # Проверенные записи - обучающая выборка классификатора категорий
+    if db_record.is_verified and ('is_verified' in update_data or 'category' in update_data):
+        await schedule_training(current_user.id)
+    await schedule_refresh(current_user.id)
+    
     return db_record
 
 
@@ -148,21 +230,160 @@ async def delete_record(
     if not db_record:
         raise HTTPException(status_code=404, detail="Запись не найдена")
     
+    deltas = expense_deltas(db_record, sign=-1)
     db.delete(db_record)
+    db.flush()
+    BudgetAlertEngine(db).apply(current_user.id, deltas)
     db.commit()
+    await schedule_refresh(current_user.id)
     return None
 
 
+# ========== Пакетные операции ==========
+
+# Поля, от которых зависят счётчики бюджетов
+BUDGET_FIELDS = {'date', 'type', 'category', 'amount'}
+
+# Поля, по которым запись связывается со справочником контрагентов
+COUNTERPARTY_FIELDS = {'counterparty', 'counterparty_inn'}
+
+
+def _owned_records(user_id: int, ids: List[int]):
+    """Условие id = ANY(:ids) с одним параметром-массивом вместо IN со списком параметров"""
+    return and_(
+        FinanceRecord.user_id == user_id,
+        FinanceRecord.id == any_(bindparam("ids", ids, type_=ARRAY(Integer)))
+    )
+
+
+@router.post("/records/bulk", response_model=List[FinanceRecordSchema], status_code=201)
+async def bulk_create_records(
+    bulk: FinanceRecordBulkCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """Создать пакет записей одним INSERT (до 1000 за запрос)"""
+    
+    categories = categorize_batch(
+        [(record.description or '', record.type) for record in bulk.records],
+        db=db,
+        user_id=current_user.id
+    )
+    counterparty_ids = CounterpartyResolver(db, current_user.id).resolve_batch(
+        [(record.counterparty, record.counterparty_inn) for record in bulk.records]
+    )
+    values = [
+        {
+            **record.model_dump(),
+            "category": record.category or ai_category,
+            "user_id": current_user.id,
+            "ai_category": ai_category,
+            "ai_confidence": ai_confidence,
+            "counterparty_id": counterparty_id,
+        }
+        for record, (ai_category, ai_confidence), counterparty_id in zip(bulk.records, categories, counterparty_ids)
+    ]
+    
+    records = db.execute(insert(FinanceRecord).returning(FinanceRecord), values).scalars().all()
+    BudgetAlertEngine(db).apply(
+        current_user.id,
+        [delta for record in records for delta in expense_deltas(record)]
+    )
+    db.commit()
+    await schedule_refresh(current_user.id)
+    return records
+
+
+@router.patch("/records/bulk", response_model=List[FinanceRecordSchema])
+async def bulk_update_records(
+    bulk: FinanceRecordBulkUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """
+    Применить одинаковые изменения к набору записей (например, проверить
+    или перекатегоризировать все записи после импорта) одним UPDATE.
+    Чужие и несуществующие id пропускаются; возвращаются обновлённые записи.
+    """
+    
+    changes = bulk.changes.model_dump(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="Нет изменений")
+    
+    deltas = []
+    if BUDGET_FIELDS & changes.keys():
+        # Прежние значения для счётчиков бюджетов; строки блокируются до UPDATE
+        previous = db.query(
+            FinanceRecord.date, FinanceRecord.type, FinanceRecord.category, FinanceRecord.amount
+        ).filter(_owned_records(current_user.id, bulk.ids)).with_for_update().all()
+        deltas = [delta for row in previous for delta in expense_deltas(row._asdict(), sign=-1)]
+    
+    records = db.execute(
+        update(FinanceRecord)
+        .where(_owned_records(current_user.id, bulk.ids))
+        .values(**changes)
+        .returning(FinanceRecord)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    
+    if deltas:
+        BudgetAlertEngine(db).apply(
+            current_user.id,
+            deltas + [delta for record in records for delta in expense_deltas(record)]
+        )
+    if COUNTERPARTY_FIELDS & changes.keys():
+        # Может меняться только наименование или только ИНН: контрагент - по итоговым значениям записи
+        counterparty_ids = CounterpartyResolver(db, current_user.id).resolve_batch(
+            [(record.counterparty, record.counterparty_inn) for record in records]
+        )
+        for record, counterparty_id in zip(records, counterparty_ids):
+            record.counterparty_id = counterparty_id
+    db.commit()
+    
+    if records and ('is_verified' in changes or 'category' in changes) and any(r.is_verified for r in records):
+        await schedule_training(current_user.id)
+    await schedule_refresh(current_user.id)
+    
+    return records
+
+
+@router.post("/records/bulk-delete", response_model=FinanceRecordBulkDeleteResponse)
+async def bulk_delete_records(
+    bulk: FinanceRecordBulkDelete,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """Удалить пакет записей одним DELETE; чужие и несуществующие id пропускаются"""
+    
+    deleted = db.execute(
+        delete(FinanceRecord)
+        .where(_owned_records(current_user.id, bulk.ids))
+        .returning(FinanceRecord.date, FinanceRecord.type, FinanceRecord.category, FinanceRecord.amount)
+        .execution_options(synchronize_session=False)
+    ).mappings().all()
+    
+    BudgetAlertEngine(db).apply(
+        current_user.id,
+        [delta for row in deleted for delta in expense_deltas(dict(row), sign=-1)]
+    )
+    db.commit()
+    await schedule_refresh(current_user.id)
+    return FinanceRecordBulkDeleteResponse(deleted=len(deleted))
+
+
 # ========== CSV Upload ==========
 
-@router.post("/upload-csv", response_model=CSVUploadResponse)
+@router.post("/upload-csv", response_model=CSVUploadResponse, dependencies=[Depends(finance_upload_limiter)])
 async def upload_csv(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db_sync)
 ):
     """
-    Загрузить финансовые данные из CSV файла
+    Загрузить финансовые данные из выписки (CSV или XLSX)
+    
+    В XLSX читаются все листы; строка заголовков может быть не первой.
+    Выписки 1С (1CClientBankExchange, обычно .txt) распознаются по содержимому.
     
     Ожидаемые колонки (гибкий парсинг):
     - date / Дата (DD.MM.YYYY или YYYY-MM-DD)
@@ -174,39 +395,124 @@ async def upload_csv(
     """
     
     # Проверка типа файла
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Файл должен быть в формате CSV")
+    if not file.filename.lower().endswith(finance_import_jobs.STATEMENT_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Файл должен быть в формате CSV, XLSX или выпиской 1С (.txt)")
     
-    # Чтение содержимого
-    content = await file.read()
+    await import_rows_quota.check(current_user.id)
     
-    # Попытка определить кодировку
-    encodings = ['utf-8', 'windows-1251', 'cp1251']
-    result = None
+    # Кодировка и формат определяются внутри по образцу, импорт выполняется один раз
+    result = await FinanceService.upload_statement(
+        db=db,
+        user_id=current_user.id,
+        file=file.file,
+        file_name=file.filename
+    )
     
-    for encoding in encodings:
-        try:
-            result = await FinanceService.upload_csv(
-                db=db,
-                user_id=current_user.id,
-                file_content=content,
-                file_name=file.filename,
-                encoding=encoding
-            )
-            if result.success:
-                break
-        except UnicodeDecodeError:
-            continue
-    
-    if not result or not result.success:
+    await import_rows_quota.charge(
+        current_user.id, result.records_created + result.records_failed + result.records_skipped
+    )
+    
+    if not result.success:
         raise HTTPException(
             status_code=400,
             detail="Не удалось обработать файл. Проверьте формат и кодировку."
         )
     
+    if result.records_created:
+        await schedule_refresh(current_user.id)
+    
     return result
 
 
+# ========== Фоновый импорт (загрузка частями) ==========
+
+UPLOAD_OFFSET_HEADER = "Upload-Offset"
+
+
+@router.post("/imports", response_model=FinanceImportJobSchema, status_code=201,
+             dependencies=[Depends(finance_upload_limiter)])
+async def create_import(
+    upload: FinanceImportJobCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """
+    Начать загрузку большой выписки частями
+    
+    Части отправляются по очереди в PUT /imports/{id}/chunks?offset=N телом
+    запроса. После обрыва загрузка продолжается со смещения received_size
+    (GET /imports/{id}). Когда файл получен целиком, импорт выполняется в
+    фоне; прогресс - в GET /imports/{id}.
+    """
+    
+    if not upload.file_name.lower().endswith(finance_import_jobs.STATEMENT_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Файл должен быть в формате CSV, XLSX или выпиской 1С (.txt)")
+    if upload.total_size > settings.IMPORT_MAX_FILE_BYTES:
+        raise HTTPException(status_code=413, detail="Файл слишком большой")
+    
+    await import_rows_quota.check(current_user.id)
+    
+    return finance_import_jobs.create_job(db, current_user.id, upload.file_name, upload.total_size)
+
+
+@router.put("/imports/{job_id}/chunks", response_model=FinanceImportJobSchema)
+async def upload_import_chunk(
+    request: Request,
+    job_id: int,
+    offset: int = Query(..., ge=0, description="Смещение части в файле"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """
+    Загрузить часть файла (тело запроса - байты части)
+    
+    Смещение должно совпадать с уже полученным размером; иначе 409 и
+    заголовок Upload-Offset с ожидаемым смещением.
+    """
+    
+    job = finance_import_jobs.get_job(db, current_user.id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Импорт не найден")
+    if job.status != 'uploading' or offset != job.received_size:
+        raise _offset_conflict(job)
+    
+    try:
+        accepted = await finance_import_jobs.receive_chunk(db, job, offset, request.stream())
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    if accepted is None:
+        # Часть с этим смещением уже принята другим запросом
+        db.refresh(job)
+        raise _offset_conflict(job)
+    return accepted
+
+
+def _offset_conflict(job) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail="Файл уже загружен" if job.status != 'uploading' else "Неверное смещение части",
+        headers={UPLOAD_OFFSET_HEADER: str(job.received_size)}
+    )
+
+
+@router.get("/imports/{job_id}", response_model=FinanceImportJobSchema)
+async def get_import(
+    response: Response,
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """Статус импорта: полученный размер файла и обработанные, ошибочные и пропущенные строки"""
+    
+    job = finance_import_jobs.get_job(db, current_user.id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Импорт не найден")
+    
+    response.headers[UPLOAD_OFFSET_HEADER] = str(job.received_size)
+    return job
+
+
 # ========== Аналитика ==========
 
 @router.get("/summary", response_model=FinanceSummary)
@@ -218,11 +524,15 @@ async def get_summary(
 ):
     """Получить финансовую сводку за период"""
     
-    return FinanceService.get_summary(
-        db=db,
-        user_id=current_user.id,
-        start_date=start_date,
-        end_date=end_date
+    return await finance_analytics_flight.do(
+        f"summary:{current_user.id}:{start_date}:{end_date}",
+        lambda: FinanceService.get_summary(
+            db=db,
+            user_id=current_user.id,
+            start_date=start_date,
+            end_date=end_date
+        ),
+        FinanceSummary
     )
 
 
@@ -250,18 +560,26 @@ async def get_summary_with_trends(
         prev_end = current_start - timedelta(days=1)
     
     # Получаем данные за оба периода
-    current_summary = FinanceService.get_summary(
-        db=db,
-        user_id=current_user.id,
-        start_date=current_start,
-        end_date=current_end
+    current_summary = await finance_analytics_flight.do(
+        f"summary:{current_user.id}:{current_start}:{current_end}",
+        lambda: FinanceService.get_summary(
+            db=db,
+            user_id=current_user.id,
+            start_date=current_start,
+            end_date=current_end
+        ),
+        FinanceSummary
     )
     
-    previous_summary = FinanceService.get_summary(
-        db=db,
-        user_id=current_user.id,
-        start_date=prev_start,
-        end_date=prev_end
+    previous_summary = await finance_analytics_flight.do(
+        f"summary:{current_user.id}:{prev_start}:{prev_end}",
+        lambda: FinanceService.get_summary(
+            db=db,
+            user_id=current_user.id,
+            start_date=prev_start,
+            end_date=prev_end
+        ),
+        FinanceSummary
     )
     
     # Функция для расчёта тренда
@@ -314,16 +632,51 @@ async def get_summary_with_trends(
 
 @router.get("/cash-flow", response_model=CashFlowData)
 async def get_cash_flow(
-    months: int = Query(12, ge=1, le=24, description="Количество месяцев для анализа"),
+    months: int = Query(12, ge=1, le=600, description="Количество месяцев для анализа"),
+    period: str = Query("month", pattern="^(week|month|quarter)$", description="Интервал: week, month, quarter"),
+    start_date: Optional[date] = Query(None, description="Начальная дата (вместо months)"),
+    end_date: Optional[date] = Query(None, description="Конечная дата"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db_sync)
 ):
-    """Получить данные денежного потока по месяцам"""
+    """Получить данные денежного потока по календарным периодам"""
     
-    return FinanceService.get_cash_flow(
-        db=db,
-        user_id=current_user.id,
-        months=months
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="Начальная дата позже конечной")
+    
+    try:
+        return await finance_analytics_flight.do(
+            f"cash-flow:{current_user.id}:{months}:{period}:{start_date}:{end_date}",
+            lambda: FinanceService.get_cash_flow(
+                db=db,
+                user_id=current_user.id,
+                months=months,
+                period=period,
+                start_date=start_date,
+                end_date=end_date
+            ),
+            CashFlowData
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/forecast", response_model=CashFlowForecast)
+async def get_forecast(
+    months: int = Query(6, ge=1, le=MAX_HORIZON, description="Горизонт прогноза в месяцах"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """
+    Прогноз доходов, расходов и чистого потока по месяцам, начиная с текущего.
+    
+    Прогноз пересчитывается только при изменении финансовых записей.
+    """
+    
+    return await finance_analytics_flight.do(
+        f"forecast:{current_user.id}:{months}",
+        lambda: forecast_cache.get(db, current_user.id, months),
+        CashFlowForecast
     )
 
 
@@ -332,11 +685,22 @@ async def get_insights(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db_sync)
 ):
-    """Получить AI-инсайты и рекомендации по финансам"""
+    """
+    Получить AI-инсайты и рекомендации по финансам.
     
-    return FinanceService.generate_insights(
-        db=db,
-        user_id=current_user.id
+    Инсайты предрассчитываются фоновой задачей после изменения данных
+    и ночью; здесь читается сохранённый результат.
+    """
+    
+    stored = get_stored_insights(db, current_user.id)
+    if stored is not None:
+        return stored
+    
+    # Первый запрос пользователя: расчёт на месте, параллельные запросы разделяют его
+    return await finance_analytics_flight.do(
+        f"insights:{current_user.id}",
+        lambda: refresh_insights(db, current_user.id),
+        FinanceInsights
     )
 
 
@@ -357,6 +721,58 @@ async def get_categories(
     return [cat[0] for cat in categories if cat[0]]
 
 
+
+@router.get("/category-rules", response_model=List[FinanceCategoryRuleSchema])
+async def get_category_rules(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """Получить правила автокатегоризации пользователя"""
+    
+    return db.query(FinanceCategoryRule).filter(
+        FinanceCategoryRule.user_id == current_user.id
+    ).order_by(FinanceCategoryRule.id).all()
+
+
+@router.post("/category-rules", response_model=FinanceCategoryRuleSchema, status_code=201)
+async def create_category_rule(
+    rule: FinanceCategoryRuleCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """Добавить правило автокатегоризации по ключевому слову"""
+    
+    db_rule = FinanceCategoryRule(
+        user_id=current_user.id,
+        **rule.model_dump()
+    )
+    db.add(db_rule)
+    db.commit()
+    db.refresh(db_rule)
+    return db_rule
+
+
+@router.delete("/category-rules/{rule_id}", status_code=204)
+async def delete_category_rule(
+    rule_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """Удалить правило автокатегоризации"""
+    
+    db_rule = db.query(FinanceCategoryRule).filter(
+        FinanceCategoryRule.id == rule_id,
+        FinanceCategoryRule.user_id == current_user.id
+    ).first()
+    
+    if not db_rule:
+        raise HTTPException(status_code=404, detail="Правило не найдено")
+    
+    db.delete(db_rule)
+    db.commit()
+    return None
+
+
 # ========== Бюджеты ==========
 
 @router.post("/budgets", response_model=FinanceBudgetSchema, status_code=201)
@@ -391,6 +807,58 @@ async def get_budgets(
     return budgets
 
 
+@router.get("/budgets/status", response_model=List[BudgetStatus])
+async def get_budgets_status(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """Получить статусы всех активных бюджетов"""
+    
+    return FinanceService.get_budget_statuses(
+        db=db,
+        user_id=current_user.id
+    )
+
+
+@router.get("/budgets/alerts", response_model=List[FinanceBudgetAlertSchema])
+async def get_budget_alerts(
+    unread_only: bool = Query(False, description="Только непрочитанные"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """Получить уведомления о достижении порогов бюджетов"""
+    
+    query = db.query(FinanceBudgetAlert).filter(FinanceBudgetAlert.user_id == current_user.id)
+    
+    if unread_only:
+        query = query.filter(FinanceBudgetAlert.is_read == False)
+    
+    return query.order_by(FinanceBudgetAlert.created_at.desc()).limit(limit).all()
+
+
+@router.put("/budgets/alerts/{alert_id}/read", response_model=FinanceBudgetAlertSchema)
+async def mark_budget_alert_read(
+    alert_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """Отметить уведомление прочитанным"""
+    
+    alert = db.query(FinanceBudgetAlert).filter(
+        FinanceBudgetAlert.id == alert_id,
+        FinanceBudgetAlert.user_id == current_user.id
+    ).first()
+    
+    if not alert:
+        raise HTTPException(status_code=404, detail="Уведомление не найдено")
+    
+    alert.is_read = True
+    db.commit()
+    db.refresh(alert)
+    return alert
+
+
 @router.get("/budgets/{budget_id}/status", response_model=BudgetStatus)
 async def get_budget_status(
     budget_id: int,
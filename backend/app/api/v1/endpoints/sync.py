@@ -0,0 +1,40 @@
+"""
+Sync endpoints - delta sync across modules.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db_sync
+from app.auth import get_current_user
+from app.models.user import User
+from app.schemas.sync import SyncResponse
+from app.services.sync_service import SyncService
+
+router = APIRouter()
+
+
+@router.get("", response_model=SyncResponse)
+def sync_changes(
+    since: str = Query("0", description="Cursor from the previous sync (0 for a full download)"),
+    limit: int = Query(500, ge=1, le=5000, description="Max rows per entity per page"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_sync)
+):
+    """
+    Get tasks, finance records, documents, campaigns and conversations
+    created, updated or deleted since the cursor.
+    Repeat with the returned cursor while has_more is true.
+    A cursor older than the tombstone retention period gets 410.
+    """
+    try:
+        cursor = int(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    service = SyncService(db)
+    if cursor and cursor < service.oldest_cursor():
+        # Deletions after this cursor may already be pruned
+        raise HTTPException(status_code=410, detail="Cursor expired, start a full sync with since=0")
+    return service.get_changes(current_user.id, cursor, limit)
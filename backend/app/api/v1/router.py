@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, finance, documents, marketing, tasks, chat, search
+from app.api.v1.endpoints import auth, finance, documents, counterparties, marketing, tasks, chat, search, sync
 
 api_router = APIRouter()
 
@@ -12,6 +12,9 @@ api_router.include_router(finance.router, prefix="/finance", tags=["finance"])
 # Include documents router
 api_router.include_router(documents.router, prefix="/documents", tags=["documents"])
 
+# Include counterparties router
+api_router.include_router(counterparties.router, prefix="/counterparties", tags=["counterparties"])
+
 # Include marketing router
 api_router.include_router(marketing.router, prefix="/marketing", tags=["marketing"])
 
@@ -24,6 +27,9 @@ api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 # Include search router
 api_router.include_router(search.router, prefix="/search", tags=["search"])
 
+# Include sync router
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+
 @api_router.get("/")
 async def api_root():
     return {"message": "API v1 is running"}
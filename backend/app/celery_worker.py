@@ -1,6 +1,14 @@
+import logging
+
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import worker_ready
+from redis.exceptions import RedisError
+
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 celery = Celery(
     "alfacopilot",
     broker=settings.REDIS_URL,
@@ -14,4 +22,36 @@ celery.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    beat_schedule={
+        "refresh-finance-insights-nightly": {
+            "task": "app.tasks.refresh_all_finance_insights",
+            "schedule": crontab(hour=settings.INSIGHTS_NIGHTLY_HOUR_UTC, minute=0),
+        },
+        "prune-sync-tombstones-daily": {
+            "task": "app.tasks.prune_sync_tombstones",
+            "schedule": crontab(hour=settings.SYNC_TOMBSTONE_PRUNE_HOUR_UTC, minute=0),
+        },
+        "resume-stalled-finance-imports": {
+            "task": "app.tasks.resume_stalled_imports",
+            "schedule": crontab(minute="*/5"),
+        },
+    },
 )
+
+
+@worker_ready.connect
+def backfill_on_startup(sender, **kwargs):
+    """
+    Связать со справочником контрагентов строки, созданные до миграции 017.
+    Задача ставится в очередь один раз на все воркеры и перезапуски (флаг в Redis).
+    """
+    from app.redis_client import get_sync_redis
+    from app.services.counterparties import BACKFILL_QUEUED_KEY
+
+    try:
+        if not get_sync_redis().set(BACKFILL_QUEUED_KEY, 1, nx=True):
+            return
+    except RedisError as e:
+        logger.warning(f"Counterparty backfill not queued: {e}")
+        return
+    sender.app.send_task("app.tasks.backfill_counterparties")
@@ -32,6 +32,42 @@ class Settings(BaseSettings):
     LITELLM_BASE_URL: str
     LLM_MODEL: str = "llama3.1:8b"
     
+    # Rate limiting
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_CHAT_MESSAGES_PER_MINUTE: int = 10
+    RATE_LIMIT_CHAT_ACTIONS_PER_MINUTE: int = 30
+    RATE_LIMIT_FINANCE_UPLOADS_PER_HOUR: int = 20
+    QUOTA_LLM_TOKENS_PER_HOUR: int = 50000
+    QUOTA_IMPORT_ROWS_PER_HOUR: int = 500000
+    
+    # Request coalescing across workers
+    SINGLEFLIGHT_REDIS_ENABLED: bool = True
+    
+    # Idempotency-Key support
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LOCK_TIMEOUT_SECONDS: int = 120
+    
+    # Per-user category classifier
+    CATEGORY_MODEL_MIN_SAMPLES: int = 30
+    CATEGORY_MODEL_MAX_SAMPLES: int = 20000
+    CATEGORY_MODEL_TRAIN_DELAY_SECONDS: int = 300
+    CATEGORY_MODEL_CACHE_SIZE: int = 128
+    
+    # Precomputed finance insights
+    INSIGHTS_REFRESH_DELAY_SECONDS: int = 60
+    INSIGHTS_NIGHTLY_HOUR_UTC: int = 3
+    
+    # Background statement imports (resumable chunked upload)
+    IMPORT_UPLOAD_DIR: str = "/tmp/alfacopilot/imports"  # Shared by API and Celery workers
+    IMPORT_MAX_FILE_BYTES: int = 1024 * 1024 * 1024
+    IMPORT_CHUNK_MAX_BYTES: int = 16 * 1024 * 1024
+    IMPORT_JOB_STALE_SECONDS: int = 600
+    IMPORT_UPLOAD_TTL_HOURS: int = 24
+    
+    # Delta sync: deletions older than this are pruned; older cursors get 410
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 90
+    SYNC_TOMBSTONE_PRUNE_HOUR_UTC: int = 4
+    
     # CORS
     CORS_ORIGINS: List[str] = [
         "http://localhost:3000",
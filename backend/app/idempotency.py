@@ -0,0 +1,201 @@
+"""
+Idempotency-Key support for mutating endpoints.
+
+The first request with a given key executes normally and its response is
+stored in Redis; retries with the same key get the stored response back.
+A duplicate that arrives while the first one is still running waits for
+it instead of executing again.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import uuid
+from typing import Iterable, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.redis_client import get_redis
+from app.singleflight import RELEASE_LOCK_SCRIPT
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+MAX_STORED_BODY = 1024 * 1024
+POLL_INTERVAL = 0.2
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware replaying stored responses for repeated Idempotency-Key requests."""
+
+    def __init__(self, app: ASGIApp, routes: Iterable[Tuple[str, str]]):
+        """routes: (method, path) pairs the middleware applies to"""
+        self.app = app
+        self.routes = {(method.upper(), path) for method, path in routes}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER, b"").decode("latin-1").strip()
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": "Idempotency-Key is too long"})
+            return
+
+        # Keys are scoped to the caller's credentials and the endpoint (method and path)
+        caller = hashlib.sha256(headers.get(b"authorization", b"")).hexdigest()[:32]
+        key = f"idempotency:{caller}:{scope['method']}:{scope['path']}:{idempotency_key}"
+
+        # Small JSON bodies are fingerprinted to catch key reuse with a different payload;
+        # uploads are passed through untouched so they can be streamed
+        fingerprint = None
+        if headers.get(b"content-type", b"").startswith(b"application/json"):
+            body = await _read_body(receive)
+            fingerprint = hashlib.sha256(body).hexdigest()
+            receive = _replay_body(body, receive)
+
+        try:
+            redis = await get_redis()
+            token = await self._acquire_or_wait(redis, key, fingerprint, send)
+        except (RedisError, OSError) as e:
+            logger.warning(f"Idempotency store unavailable, executing request: {e}")
+            await self.app(scope, receive, send)
+            return
+
+        if token is None:
+            return  # A stored response (or an error) has already been sent
+
+        try:
+            await self._execute_and_store(redis, key, fingerprint, scope, receive, send)
+        finally:
+            try:
+                await redis.eval(RELEASE_LOCK_SCRIPT, 1, f"{key}:lock", token)
+            except (RedisError, OSError):
+                pass
+
+    async def _acquire_or_wait(self, redis, key: str, fingerprint: Optional[str], send: Send) -> Optional[str]:
+        """Take the execution lock, or answer from the stored response. Returns the lock token."""
+        lock_timeout = settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS
+        deadline = asyncio.get_running_loop().time() + lock_timeout
+        token = uuid.uuid4().hex
+
+        while True:
+            stored = await redis.get(key)
+            if stored is not None:
+                await self._replay(json.loads(stored), fingerprint, send)
+                return None
+
+            if await redis.set(f"{key}:lock", token, nx=True, px=lock_timeout * 1000):
+                # The first execution may have finished right before we took the lock
+                stored = await redis.get(key)
+                if stored is None:
+                    return token
+                await redis.eval(RELEASE_LOCK_SCRIPT, 1, f"{key}:lock", token)
+                await self._replay(json.loads(stored), fingerprint, send)
+                return None
+
+            if asyncio.get_running_loop().time() >= deadline:
+                await _send_json(send, 409, {"detail": "Запрос с этим Idempotency-Key ещё выполняется"})
+                return None
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _replay(self, stored: dict, fingerprint: Optional[str], send: Send) -> None:
+        if stored.get("fingerprint") != fingerprint:
+            await _send_json(send, 422, {"detail": "Idempotency-Key уже использован с другим запросом"})
+            return
+
+        body = base64.b64decode(stored["body"])
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in stored["headers"]]
+        headers.append((b"content-length", str(len(body)).encode()))
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": stored["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _execute_and_store(
+        self,
+        redis,
+        key: str,
+        fingerprint: Optional[str],
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
+        status = 500
+        response_headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+        size = 0
+
+        async def capture(message: Message) -> None:
+            nonlocal status, response_headers, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                size += len(body)
+                if size <= MAX_STORED_BODY:
+                    chunks.append(body)
+            await send(message)
+
+        await self.app(scope, receive, capture)
+
+        # Server errors and rate-limit rejections are not final: let the client retry them
+        if status >= 500 or status == 429 or size > MAX_STORED_BODY:
+            return
+
+        stored = {
+            "status": status,
+            "headers": [
+                (k.decode("latin-1"), v.decode("latin-1"))
+                for k, v in response_headers
+                if k.lower() not in (b"content-length", b"date", b"server")
+            ],
+            "body": base64.b64encode(b"".join(chunks)).decode("ascii"),
+            "fingerprint": fingerprint,
+        }
+        try:
+            await redis.set(key, json.dumps(stored), ex=settings.IDEMPOTENCY_TTL_SECONDS)
+        except (RedisError, OSError) as e:
+            logger.warning(f"Failed to store idempotent response: {e}")
+
+
+async def _read_body(receive: Receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return body
+
+
+def _replay_body(body: bytes, receive: Receive) -> Receive:
+    """Serve an already consumed request body, then fall back to the real channel."""
+    sent = False
+
+    async def replay() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
+
+
+async def _send_json(send: Send, status: int, payload: dict) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.api.v1.router import api_router
+from app.idempotency import IdempotencyMiddleware
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -10,6 +11,21 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Повторы мутирующих запросов с тем же Idempotency-Key получают сохранённый ответ
+app.add_middleware(
+    IdempotencyMiddleware,
+    routes=[
+        ("POST", f"{settings.API_V1_PREFIX}/finance/records"),
+        ("POST", f"{settings.API_V1_PREFIX}/finance/records/bulk"),
+        ("PATCH", f"{settings.API_V1_PREFIX}/finance/records/bulk"),
+        ("POST", f"{settings.API_V1_PREFIX}/finance/records/bulk-delete"),
+        ("POST", f"{settings.API_V1_PREFIX}/finance/upload-csv"),
+        ("POST", f"{settings.API_V1_PREFIX}/finance/imports"),
+        ("POST", f"{settings.API_V1_PREFIX}/chat/messages"),
+        ("POST", f"{settings.API_V1_PREFIX}/chat/actions/execute"),
+    ],
+)
+
 # CORS middleware - разрешаем запросы с frontend
 cors_origins = settings.CORS_ORIGINS if not settings.DEBUG else ["*"]
 
@@ -19,7 +35,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # "*" не действует для запросов с credentials: заголовки перечислены явно
+    expose_headers=["X-Next-Cursor", "Upload-Offset", "Retry-After", "Idempotent-Replayed"],
 )
 
 # Logging middleware для отладки
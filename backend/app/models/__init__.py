@@ -1,19 +1,40 @@
 from app.models.user import User, MagicToken
-from app.models.finance import FinanceRecord
+from app.models.finance import (
+    FinanceRecord,
+    FinanceCategoryRule,
+    FinanceCategoryModel,
+    FinanceDailyRollup,
+    FinanceBudgetSpend,
+    FinanceBudgetAlert,
+    FinanceInsightSnapshot,
+    FinanceImportJob,
+)
 from app.models.document import Document, Template
+from app.models.counterparty import Counterparty
 from app.models.marketing import MarketingCampaign
 from app.models.task import Task
 from app.models.chat import ChatConversation, ChatMessage
+from app.models.sync import SyncTombstone, SyncHorizon
 
 __all__ = [
     "User",
     "MagicToken",
     "FinanceRecord",
+    "FinanceCategoryRule",
+    "FinanceCategoryModel",
+    "FinanceDailyRollup",
+    "FinanceBudgetSpend",
+    "FinanceBudgetAlert",
+    "FinanceInsightSnapshot",
+    "FinanceImportJob",
     "Document",
     "Template",
+    "Counterparty",
     "MarketingCampaign",
     "Task",
     "ChatConversation",
     "ChatMessage",
+    "SyncTombstone",
+    "SyncHorizon",
 ]
 
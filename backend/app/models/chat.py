@@ -1,7 +1,7 @@
 """
 Chat models for AI assistant conversations.
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, BigInteger, FetchedValue, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -18,6 +18,7 @@ class ChatConversation(Base):
     title = Column(String(255), nullable=False, default="Новый разговор")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    change_seq = Column(BigInteger, nullable=False, server_default="1", server_onupdate=FetchedValue())  # Курсор изменений (delta sync)
     is_archived = Column(Boolean, default=False)
     metadata_ = Column("metadata", JSONB, nullable=True)  # Store additional context
     
@@ -25,6 +26,10 @@ class ChatConversation(Base):
     user = relationship("User", back_populates="chat_conversations")
     messages = relationship("ChatMessage", back_populates="conversation", cascade="all, delete-orphan", order_by="ChatMessage.created_at")
 
+    __table_args__ = (
+        Index('idx_chat_conversations_user_change_seq', 'user_id', 'change_seq'),
+    )
+
     def __repr__(self):
         return f"<ChatConversation(id={self.id}, title={self.title})>"
 
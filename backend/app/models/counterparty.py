@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, text
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class Counterparty(Base):
+    """Контрагент пользователя: общий справочник для финансовых записей и документов"""
+    __tablename__ = "counterparties"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String(255), nullable=False)  # Наименование в первом встреченном написании
+    normalized_name = Column(String(255), nullable=False)  # Ключ сопоставления: без ОПФ, кавычек и регистра
+    inn = Column(String(12), nullable=True)  # ИНН - основной ключ, если известен
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index('uq_counterparties_user_inn', 'user_id', 'inn', unique=True, postgresql_where=text('inn IS NOT NULL')),
+        # Без ИНН контрагент определяется наименованием; с разными ИНН наименования могут совпадать
+        Index(
+            'uq_counterparties_user_name_without_inn', 'user_id', 'normalized_name',
+            unique=True, postgresql_where=text('inn IS NULL')
+        ),
+        Index('idx_counterparties_user_name', 'user_id', 'normalized_name'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index, BigInteger, FetchedValue, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -27,6 +27,7 @@ class Document(Base):
     # Связь с контрагентами/клиентами
     counterparty_name = Column(String(255), nullable=True)
     counterparty_inn = Column(String(50), nullable=True)
+    counterparty_id = Column(Integer, ForeignKey("counterparties.id", ondelete="SET NULL"), nullable=True)  # Нормализованный контрагент
     
     # Финансовая информация
     amount = Column(String(100), nullable=True)
@@ -37,6 +38,7 @@ class Document(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    change_seq = Column(BigInteger, nullable=False, server_default="1", server_onupdate=FetchedValue())  # Курсор изменений (delta sync)
     
     # Relationships
     user = relationship("User", back_populates="documents")
@@ -45,6 +47,12 @@ class Document(Base):
     __table_args__ = (
         Index('idx_user_type', 'user_id', 'document_type'),
         Index('idx_user_status', 'user_id', 'status'),
+        Index('idx_documents_user_change_seq', 'user_id', 'change_seq'),
+        Index('idx_documents_user_created', 'user_id', 'created_at', 'id'),  # Keyset-пагинация
+        Index(
+            'idx_documents_user_counterparty', 'user_id', 'counterparty_id', 'created_at',
+            postgresql_where=text('counterparty_id IS NOT NULL')
+        ),
     )
 
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Date, Numeric, DateTime, ForeignKey, Boolean, Index
+from sqlalchemy import Column, Integer, String, Text, Date, Numeric, DateTime, ForeignKey, Boolean, Index, BigInteger, FetchedValue, JSON, LargeBinary, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -19,6 +19,8 @@ class FinanceRecord(Base):
     
     # Дополнительные поля
     counterparty = Column(String(255), nullable=True)  # Контрагент
+    counterparty_inn = Column(String(12), nullable=True)  # ИНН контрагента (из выписок 1С)
+    counterparty_id = Column(Integer, ForeignKey("counterparties.id", ondelete="SET NULL"), nullable=True)  # Нормализованный контрагент
     payment_method = Column(String(50), nullable=True)  # Способ оплаты
     account = Column(String(100), nullable=True)  # Счёт
     tags = Column(Text, nullable=True)  # JSON массив тегов
@@ -27,6 +29,7 @@ class FinanceRecord(Base):
     # Для CSV импорта
     source_file = Column(String(255), nullable=True)  # Имя файла источника
     raw_data = Column(Text, nullable=True)  # Исходные данные из CSV
+    fingerprint = Column(String(40), nullable=True)  # Отпечаток операции для пропуска повторного импорта
     
     # AI анализ
     ai_category = Column(String(100), nullable=True)  # Категория от AI
@@ -35,15 +38,24 @@ class FinanceRecord(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    change_seq = Column(BigInteger, nullable=False, server_default="1", server_onupdate=FetchedValue())  # Курсор изменений (delta sync)
     
     # Relationships
     user = relationship("User", back_populates="finance_records")
     
     # Индексы для оптимизации запросов
     __table_args__ = (
-        Index('idx_user_date', 'user_id', 'date'),
+        Index('idx_user_date', 'user_id', 'date', 'id'),  # Keyset-пагинация по (date, id)
         Index('idx_user_category', 'user_id', 'category'),
         Index('idx_user_type', 'user_id', 'type'),
+        Index('idx_finance_records_user_change_seq', 'user_id', 'change_seq'),
+        Index('idx_finance_records_user_verified', 'user_id', 'id', postgresql_where=text('is_verified')),
+        Index('uq_finance_records_user_fingerprint', 'user_id', 'fingerprint', unique=True),
+        # Обороты по контрагенту: index-only scan без чтения строк
+        Index(
+            'idx_finance_records_user_counterparty', 'user_id', 'counterparty_id', 'date',
+            postgresql_include=['type', 'amount'], postgresql_where=text('counterparty_id IS NOT NULL')
+        ),
     )
 
 
@@ -89,3 +101,120 @@ class FinanceGoal(Base):
     
     # Relationships
     user = relationship("User", back_populates="finance_goals")
+
+
+class FinanceCategoryRule(Base):
+    """Правило категоризации по ключевому слову (user_id = NULL - общее правило)"""
+    __tablename__ = "finance_category_rules"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    keyword = Column(String(255), nullable=False)  # Подстрока описания (в нижнем регистре)
+    category = Column(String(100), nullable=False)
+    type = Column(String(20), nullable=False)  # income, expense
+    weight = Column(Numeric(6, 2), nullable=False, default=1)  # Вес при нескольких совпадениях
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    __table_args__ = (
+        Index('idx_category_rules_user_type', 'user_id', 'type'),
+    )
+
+
+class FinanceCategoryModel(Base):
+    """Обученный классификатор категорий пользователя"""
+    __tablename__ = "finance_category_models"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=1)  # Увеличивается при каждом обучении
+    classes = Column(JSON, nullable=False)  # [[type, category], ...] в порядке строк весов
+    weights = Column(LargeBinary, nullable=False)  # npz: разреженная матрица весов и свободные члены
+    samples = Column(Integer, nullable=False)  # Размер обучающей выборки
+    
+    trained_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class FinanceDailyRollup(Base):
+    """Дневные агрегаты транзакций (поддерживаются триггером на finance_records)"""
+    __tablename__ = "finance_daily_rollup"
+    
+    user_id = Column(Integer, primary_key=True)  # Без FK: см. миграцию 010
+    day = Column(Date, primary_key=True)
+    type = Column(String(20), primary_key=True)  # income, expense
+    category = Column(String(100), primary_key=True)  # '' - без категории
+    amount = Column(Numeric(18, 2), nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class FinanceBudgetSpend(Base):
+    """Текущие траты по бюджету за его окно (обновляется при записи расходов)"""
+    __tablename__ = "finance_budget_spend"
+    
+    budget_id = Column(Integer, ForeignKey("finance_budgets.id", ondelete="CASCADE"), primary_key=True)
+    category = Column(String(100), nullable=False)  # Категория на момент расчёта окна
+    window_start = Column(Date, nullable=False)
+    window_end = Column(Date, nullable=False)
+    spent = Column(Numeric(18, 2), nullable=False, default=0)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class FinanceBudgetAlert(Base):
+    """Уведомление о достижении порога бюджета (80%, 100%)"""
+    __tablename__ = "finance_budget_alerts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    budget_id = Column(Integer, ForeignKey("finance_budgets.id", ondelete="CASCADE"), nullable=False)
+    threshold = Column(Integer, nullable=False)  # Процент бюджета
+    window_start = Column(Date, nullable=False)
+    spent = Column(Numeric(18, 2), nullable=False)
+    budget_amount = Column(Numeric(15, 2), nullable=False)
+    is_read = Column(Boolean, default=False)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Один порог - одно уведомление за окно бюджета
+        Index('uq_budget_alert_window_threshold', 'budget_id', 'window_start', 'threshold', unique=True),
+        Index('idx_budget_alerts_user_created', 'user_id', 'created_at'),
+    )
+
+
+class FinanceInsightSnapshot(Base):
+    """Предрассчитанные AI-инсайты пользователя (обновляются фоновой задачей)"""
+    __tablename__ = "finance_insight_snapshots"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    insights = Column(JSON, nullable=False)  # Список AIInsight
+    generated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class FinanceImportJob(Base):
+    """Фоновый импорт выписки, загруженной частями (с контрольной точкой по строкам)"""
+    __tablename__ = "finance_import_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    file_name = Column(String(255), nullable=False)
+    status = Column(String(20), nullable=False, default="uploading")  # uploading, queued, processing, completed, failed
+    
+    # Загрузка: файл дописывается частями, received_size - подтверждённый размер
+    total_size = Column(BigInteger, nullable=False)
+    received_size = Column(BigInteger, nullable=False, default=0)
+    
+    # Импорт: rows_processed - контрольная точка, число строк выписки, записанных вместе с прогрессом
+    rows_processed = Column(Integer, nullable=False, default=0)
+    records_created = Column(Integer, nullable=False, default=0)
+    records_failed = Column(Integer, nullable=False, default=0)
+    records_skipped = Column(Integer, nullable=False, default=0)
+    errors = Column(JSON, nullable=False, default=list)  # Первые ошибки строк
+    error = Column(Text, nullable=True)  # Причина неудачи всего импорта
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())  # Пульс обработки
+    
+    __table_args__ = (
+        Index('idx_finance_import_jobs_status_updated', 'status', 'updated_at'),  # Поиск зависших импортов
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Date, JSON, Index
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Date, JSON, Index, BigInteger, FetchedValue
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -40,6 +40,7 @@ class MarketingCampaign(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    change_seq = Column(BigInteger, nullable=False, server_default="1", server_onupdate=FetchedValue())  # Курсор изменений (delta sync)
     
     # Relationships
     user = relationship("User", back_populates="marketing_campaigns")
@@ -48,4 +49,5 @@ class MarketingCampaign(Base):
         Index('idx_user_platform', 'user_id', 'platform'),
         Index('idx_user_status', 'user_id', 'status'),
         Index('idx_scheduled_date', 'scheduled_date'),
+        Index('idx_marketing_campaigns_user_change_seq', 'user_id', 'change_seq'),
     )
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class SyncTombstone(Base):
+    """Запись об удалении строки для delta sync (заполняется триггером)"""
+    __tablename__ = "sync_tombstones"
+
+    id = Column(BigInteger, primary_key=True)
+    user_id = Column(Integer, nullable=False)  # Без FK: триггер срабатывает и при каскадном удалении пользователя
+    entity = Column(String(50), nullable=False)  # task, finance_record, document, marketing_campaign, chat_conversation
+    entity_id = Column(Integer, nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('idx_sync_tombstones_user_change_seq', 'user_id', 'change_seq'),
+        Index('idx_sync_tombstones_created', 'created_at'),  # Очистка по сроку хранения
+    )
+
+
+class SyncHorizon(Base):
+    """Граница очистки tombstones: курсоры ниже неё больше не обслуживаются (одна строка)"""
+    __tablename__ = "sync_horizon"
+
+    id = Column(Integer, primary_key=True)  # Всегда 1
+    change_seq = Column(BigInteger, nullable=False)  # Наибольший change_seq удалённых tombstones
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
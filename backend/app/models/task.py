@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON, Index
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON, Index, BigInteger, FetchedValue
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -45,6 +45,7 @@ class Task(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    change_seq = Column(BigInteger, nullable=False, server_default="1", server_onupdate=FetchedValue())  # Курсор изменений (delta sync)
     
     # Relationships
     user = relationship("User", back_populates="tasks")
@@ -55,4 +56,5 @@ class Task(Base):
         Index('idx_user_priority', 'user_id', 'priority'),
         Index('idx_user_due_date', 'user_id', 'due_date'),
         Index('idx_user_category', 'user_id', 'category'),
+        Index('idx_tasks_user_change_seq', 'user_id', 'change_seq'),
     )
@@ -0,0 +1,79 @@
+"""
+Keyset-пагинация длинных списков.
+
+Страница продолжается после ключа последней строки предыдущей страницы
+(WHERE (date, id) < (:date, :id)), а не пропускает OFFSET строк, поэтому
+стоимость страницы не зависит от глубины прокрутки, если сортировка
+совпадает с индексом. Ключ передаётся клиенту непрозрачным курсором.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps(
+        [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values],
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    """Значения ключа в типах колонок; ValueError для повреждённого курсора"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Некорректный курсор") from e
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("Некорректный курсор")
+
+    decoded = []
+    for column, value in zip(columns, values):
+        python_type = column.type.python_type
+        try:
+            if python_type is datetime:
+                decoded.append(datetime.fromisoformat(value))
+            elif python_type is date:
+                decoded.append(date.fromisoformat(value))
+            else:
+                decoded.append(python_type(value))
+        except (ValueError, TypeError) as e:
+            raise ValueError("Некорректный курсор") from e
+    return decoded
+
+
+def keyset_page(
+    query: Query,
+    columns: Sequence[Any],
+    cursor: Optional[str],
+    limit: int,
+    offset: int = 0
+) -> Tuple[list, Optional[str]]:
+    """
+    Страница query по убыванию columns (последняя колонка - уникальный id).
+    offset поддерживается для старых клиентов и применяется только без курсора.
+
+    Returns:
+        tuple: (строки, курсор следующей страницы или None, если страница последняя)
+    """
+    if cursor:
+        query = query.filter(tuple_(*columns) < tuple_(*decode_cursor(cursor, columns)))
+
+    query = query.order_by(*[column.desc() for column in columns])
+    if offset and not cursor:
+        query = query.offset(offset)
+    # Лишняя строка показывает, есть ли следующая страница
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column in columns])
@@ -0,0 +1,168 @@
+"""
+Per-user rate limiting and cost-weighted quotas backed by Redis token buckets.
+"""
+import logging
+import math
+from typing import Tuple
+
+from fastapi import Depends, HTTPException, status
+from redis.exceptions import RedisError
+
+from app.auth import get_current_user
+from app.config import settings
+from app.models.user import User
+from app.redis_client import get_redis, get_sync_redis
+
+logger = logging.getLogger(__name__)
+
+# Atomic token bucket: refill by elapsed time, then take `cost` tokens.
+# With force=1 the cost is always deducted (the bucket may go negative),
+# which is used to charge usage that is only known after the call (LLM tokens).
+TOKEN_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local force = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local data = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if force == 1 or tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+local retry_after = 0
+if allowed == 0 then
+    retry_after = (cost - tokens) / rate
+elseif tokens < 0 then
+    retry_after = -tokens / rate
+end
+redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', key, math.ceil((capacity - math.min(tokens, 0)) / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+
+async def consume_tokens(
+    key: str,
+    capacity: float,
+    refill_per_second: float,
+    cost: float = 1,
+    force: bool = False
+) -> Tuple[bool, float]:
+    """
+    Take `cost` tokens from the bucket stored at `key`.
+
+    Returns (allowed, retry_after_seconds). Fails open when Redis is
+    unavailable so that a cache outage does not take the API down.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return True, 0.0
+
+    try:
+        redis = await get_redis()
+        allowed, retry_after = await redis.eval(
+            TOKEN_BUCKET_SCRIPT,
+            1,
+            key,
+            capacity,
+            refill_per_second,
+            min(cost, capacity) if not force else cost,
+            1 if force else 0
+        )
+    except (RedisError, OSError) as e:
+        logger.warning(f"Rate limiter unavailable, allowing request: {e}")
+        return True, 0.0
+
+    return bool(int(allowed)), float(retry_after)
+
+
+def too_many_requests(retry_after: float, detail: str) -> HTTPException:
+    """Build a 429 response with a standard Retry-After header."""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class RateLimiter:
+    """
+    FastAPI dependency limiting how often a user may call a route.
+
+    Usage:
+        @router.post("/messages", dependencies=[Depends(RateLimiter("chat:messages", 10, 60))])
+    """
+
+    def __init__(self, scope: str, limit: int, period_seconds: int):
+        self.scope = scope
+        self.capacity = limit
+        self.refill_per_second = limit / period_seconds
+
+    async def __call__(self, current_user: User = Depends(get_current_user)) -> None:
+        allowed, retry_after = await consume_tokens(
+            f"ratelimit:{self.scope}:{current_user.id}",
+            self.capacity,
+            self.refill_per_second
+        )
+        if not allowed:
+            raise too_many_requests(retry_after, "Слишком много запросов. Попробуйте позже.")
+
+
+class Quota:
+    """
+    Cost-weighted quota for expensive operations (LLM tokens, imported rows).
+
+    The actual cost is usually known only after the work is done, so the
+    request path calls `check` up front (rejecting users already in debt)
+    and `charge` afterwards with the real cost.
+    """
+
+    def __init__(self, scope: str, limit: int, period_seconds: int):
+        self.scope = scope
+        self.capacity = limit
+        self.refill_per_second = limit / period_seconds
+
+    def _key(self, user_id: int) -> str:
+        return f"quota:{self.scope}:{user_id}"
+
+    async def check(self, user_id: int) -> None:
+        """Raise 429 if the user's quota is exhausted."""
+        allowed, retry_after = await consume_tokens(
+            self._key(user_id), self.capacity, self.refill_per_second, cost=0
+        )
+        # A zero-cost take only fails while the balance is negative
+        if not allowed:
+            raise too_many_requests(retry_after, "Квота исчерпана. Попробуйте позже.")
+
+    async def charge(self, user_id: int, cost: float) -> None:
+        """Deduct the actual cost of a completed operation."""
+        if cost > 0:
+            await consume_tokens(
+                self._key(user_id), self.capacity, self.refill_per_second, cost=cost, force=True
+            )
+
+    def charge_sync(self, user_id: int, cost: float) -> None:
+        """`charge` for synchronous callers such as Celery tasks."""
+        if cost <= 0 or not settings.RATE_LIMIT_ENABLED:
+            return
+        try:
+            get_sync_redis().eval(
+                TOKEN_BUCKET_SCRIPT, 1, self._key(user_id), self.capacity, self.refill_per_second, cost, 1
+            )
+        except (RedisError, OSError) as e:
+            logger.warning(f"Quota unavailable, usage not charged: {e}")
+
+
+# Per-route limits
+chat_message_limiter = RateLimiter("chat:messages", settings.RATE_LIMIT_CHAT_MESSAGES_PER_MINUTE, 60)
+chat_action_limiter = RateLimiter("chat:actions", settings.RATE_LIMIT_CHAT_ACTIONS_PER_MINUTE, 60)
+finance_upload_limiter = RateLimiter("finance:upload", settings.RATE_LIMIT_FINANCE_UPLOADS_PER_HOUR, 3600)
+
+# Cost-weighted quotas
+llm_tokens_quota = Quota("llm_tokens", settings.QUOTA_LLM_TOKENS_PER_HOUR, 3600)
+import_rows_quota = Quota("import_rows", settings.QUOTA_IMPORT_ROWS_PER_HOUR, 3600)
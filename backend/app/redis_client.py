@@ -1,7 +1,9 @@
+import redis
 import redis.asyncio as aioredis
 from app.config import settings
 
 redis_client = None
+sync_redis_client = None
 
 
 async def get_redis():
@@ -16,6 +18,18 @@ async def get_redis():
     return redis_client
 
 
+def get_sync_redis():
+    """Get synchronous Redis connection (Celery workers have no event loop)"""
+    global sync_redis_client
+    if sync_redis_client is None:
+        sync_redis_client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            encoding="utf-8",
+            decode_responses=True
+        )
+    return sync_redis_client
+
+
 async def close_redis():
     """Close Redis connection"""
     global redis_client
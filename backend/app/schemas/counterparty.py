@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date, datetime
+from decimal import Decimal
+
+
+# ========== Counterparty Schemas ==========
+
+class Counterparty(BaseModel):
+    """Контрагент из справочника"""
+    id: int
+    name: str
+    inn: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class CounterpartyTurnover(BaseModel):
+    """Обороты с контрагентом по финансовым записям и документам за период"""
+    counterparty: Counterparty
+    income: Decimal
+    expense: Decimal
+    operations: int
+    first_operation: Optional[date] = None
+    last_operation: Optional[date] = None
+    documents: int
+    last_document_at: Optional[datetime] = None
@@ -94,6 +94,7 @@ class Document(DocumentBase):
     id: int
     user_id: int
     template_id: Optional[int] = None
+    counterparty_id: Optional[int] = None
     file_path: Optional[str] = None
     file_format: str
     status: str
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import date as date_type, datetime
 from decimal import Decimal
 
@@ -15,6 +15,7 @@ class FinanceRecordBase(BaseModel):
     subcategory: Optional[str] = None
     type: str = Field(..., pattern="^(income|expense)$")
     counterparty: Optional[str] = None
+    counterparty_inn: Optional[str] = Field(None, max_length=12)
     payment_method: Optional[str] = None
     account: Optional[str] = None
     tags: Optional[List[str]] = None
@@ -35,6 +36,7 @@ class FinanceRecordUpdate(BaseModel):
     subcategory: Optional[str] = None
     type: Optional[str] = Field(None, pattern="^(income|expense)$")
     counterparty: Optional[str] = None
+    counterparty_inn: Optional[str] = Field(None, max_length=12)
     payment_method: Optional[str] = None
     account: Optional[str] = None
     tags: Optional[List[str]] = None
@@ -46,6 +48,7 @@ class FinanceRecord(FinanceRecordBase):
     """Схема финансовой записи для ответа"""
     id: int
     user_id: int
+    counterparty_id: Optional[int] = None  # Контрагент из справочника
     ai_category: Optional[str] = None
     ai_confidence: Optional[float] = None
     is_verified: bool
@@ -57,6 +60,29 @@ class FinanceRecord(FinanceRecordBase):
         from_attributes = True
 
 
+MAX_BULK_RECORDS = 1000
+
+
+class FinanceRecordBulkCreate(BaseModel):
+    """Пакетное создание записей"""
+    records: List[FinanceRecordCreate] = Field(..., min_length=1, max_length=MAX_BULK_RECORDS)
+
+
+class FinanceRecordBulkUpdate(BaseModel):
+    """Одинаковые изменения для набора записей (перекатегоризация, проверка)"""
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_RECORDS)
+    changes: FinanceRecordUpdate
+
+
+class FinanceRecordBulkDelete(BaseModel):
+    """Пакетное удаление записей"""
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_RECORDS)
+
+
+class FinanceRecordBulkDeleteResponse(BaseModel):
+    deleted: int
+
+
 # ========== CSV Upload Schemas ==========
 
 class CSVUploadResponse(BaseModel):
@@ -64,10 +90,37 @@ class CSVUploadResponse(BaseModel):
     success: bool
     records_created: int
     records_failed: int
+    records_skipped: int = 0  # Уже загруженные ранее операции
     errors: List[str] = []
     file_name: str
 
 
+class FinanceImportJobCreate(BaseModel):
+    """Начало загрузки выписки частями"""
+    file_name: str = Field(..., min_length=1, max_length=255)
+    total_size: int = Field(..., gt=0, description="Размер файла в байтах")
+
+
+class FinanceImportJob(BaseModel):
+    """Задача фонового импорта: загрузка файла и прогресс обработки"""
+    id: int
+    file_name: str
+    status: str  # uploading, queued, processing, completed, failed
+    total_size: int
+    received_size: int  # Смещение, с которого продолжается загрузка
+    rows_processed: int
+    records_created: int
+    records_failed: int
+    records_skipped: int
+    errors: List[str] = []
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
 class CSVRowData(BaseModel):
     """Данные одной строки CSV"""
     date: str
@@ -118,8 +171,10 @@ class FinanceSummaryWithTrends(BaseModel):
 
 
 class MonthlyTrend(BaseModel):
-    """Тренд по месяцам"""
-    month: str
+    """Тренд по месяцам (или неделям/кварталам)"""
+    month: str  # 2025-11, 2025-W47 или 2025-Q4
+    period_start: Optional[date_type] = None
+    period_end: Optional[date_type] = None
     income: Decimal
     expense: Decimal
     net: Decimal
@@ -127,6 +182,7 @@ class MonthlyTrend(BaseModel):
 
 class CashFlowData(BaseModel):
     """Данные денежного потока"""
+    period: str = "month"  # month, week, quarter
     monthly_trends: List[MonthlyTrend]
     average_income: Decimal
     average_expense: Decimal
@@ -134,6 +190,24 @@ class CashFlowData(BaseModel):
     highest_expense_month: str
 
 
+class RecurringPayment(BaseModel):
+    """Регулярная операция (подписка, аренда, зарплата)"""
+    name: str  # Контрагент или описание
+    type: str  # income, expense
+    amount: Decimal  # Типичная сумма в месяц
+    months_seen: int
+
+
+class CashFlowForecast(BaseModel):
+    """Прогноз денежного потока по месяцам"""
+    horizon: int
+    history_months: int  # Полных месяцев истории в модели
+    methods: Dict[str, str]  # income/expense -> mean, holt, seasonal_naive
+    forecast: List[MonthlyTrend]
+    recurring: List[RecurringPayment] = []
+    generated_at: datetime
+
+
 # ========== Budget Schemas ==========
 
 class FinanceBudgetBase(BaseModel):
@@ -177,6 +251,23 @@ class BudgetStatus(BaseModel):
     remaining: Decimal
     percentage_used: float
     is_over_budget: bool
+    period_start: Optional[date_type] = None  # Текущее окно бюджета (месяц/год от start_date)
+    period_end: Optional[date_type] = None
+
+
+class FinanceBudgetAlert(BaseModel):
+    """Уведомление о достижении порога бюджета"""
+    id: int
+    budget_id: int
+    threshold: int
+    window_start: date_type
+    spent: Decimal
+    budget_amount: Decimal
+    is_read: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
 
 
 # ========== Goal Schemas ==========
@@ -228,6 +319,26 @@ class FinanceGoal(FinanceGoalBase):
         return 0.0
 
 
+# ========== Category Rule Schemas ==========
+
+class FinanceCategoryRuleCreate(BaseModel):
+    """Схема создания правила категоризации"""
+    keyword: str = Field(..., min_length=2, max_length=255)
+    category: str = Field(..., min_length=1, max_length=100)
+    type: str = Field(..., pattern="^(income|expense)$")
+    weight: Decimal = Field(Decimal("2"), gt=0, le=1000)
+
+
+class FinanceCategoryRule(FinanceCategoryRuleCreate):
+    """Схема правила категоризации для ответа"""
+    id: int
+    user_id: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 # ========== AI Insights Schemas ==========
 
 class AIInsight(BaseModel):
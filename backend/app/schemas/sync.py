@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from typing import List
+
+from app.schemas.task import TaskInDB
+from app.schemas.finance import FinanceRecord
+from app.schemas.document import Document
+from app.schemas.marketing import MarketingCampaignInDB
+from app.schemas.chat import ChatConversation
+
+
+class DeletedEntity(BaseModel):
+    """Удалённая сущность"""
+    entity: str  # task, finance_record, document, marketing_campaign, chat_conversation
+    id: int
+
+
+class SyncResponse(BaseModel):
+    """Изменения с момента курсора"""
+    cursor: str  # Передать в следующий запрос как since
+    has_more: bool
+    tasks: List[TaskInDB] = []
+    finance_records: List[FinanceRecord] = []
+    documents: List[Document] = []
+    marketing_campaigns: List[MarketingCampaignInDB] = []
+    chat_conversations: List[ChatConversation] = []
+    deleted: List[DeletedEntity] = []
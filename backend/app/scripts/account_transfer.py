@@ -0,0 +1,42 @@
+"""
+Export or import a full user account (gzip NDJSON archive)
+
+Usage:
+    python -m app.scripts.account_transfer export --user-id 42 --file account.ndjson.gz
+    python -m app.scripts.account_transfer import --file account.ndjson.gz [--email user@example.com]
+"""
+import argparse
+
+from app.services.account_transfer import export_account, import_account
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Account export/import for tenant migration")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export all records of a user")
+    export_parser.add_argument("--user-id", type=int, required=True)
+    export_parser.add_argument("--file", required=True, help="Output archive path")
+
+    import_parser = subparsers.add_parser("import", help="Import an archive")
+    import_parser.add_argument("--file", required=True, help="Input archive path")
+    import_parser.add_argument("--email", help="Target user email (default: exported user's email)")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        with open(args.file, "wb") as out:
+            counts = export_account(args.user_id, out)
+        print(f"✅ Exported user {args.user_id} to {args.file}")
+    else:
+        with open(args.file, "rb") as source:
+            result = import_account(source, args.email)
+        counts = result["counts"]
+        print(f"✅ Imported {args.file} into user {result['user_id']}")
+
+    for table, count in counts.items():
+        print(f"   {table}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+Rebuild the daily finance rollup from finance_records
+
+Usage:
+    python -m app.scripts.rebuild_finance_rollup [--user-id 42]
+"""
+import argparse
+
+from app.services.finance_rollup import rebuild_rollup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild finance_daily_rollup")
+    parser.add_argument("--user-id", type=int, help="Rebuild only this user (default: all users)")
+    args = parser.parse_args()
+
+    rows = rebuild_rollup(args.user_id)
+    target = f"user {args.user_id}" if args.user_id is not None else "all users"
+    print(f"✅ Rebuilt finance rollup for {target}: {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Full-account export and import for moving a tenant between environments.
+
+The archive is gzip-compressed NDJSON: a header line followed by one
+`{"table": ..., "row": ...}` line per record. Export streams every table
+through a server-side cursor inside one REPEATABLE READ snapshot; import
+bulk-loads the rows with COPY in chunks, assigning fresh primary keys and
+remapping foreign keys on the way.
+"""
+import gzip
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import IO, Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import JSON, Integer, Table, select, text
+from sqlalchemy.engine import Connection
+
+from app.database import sync_engine
+from app.models.user import User
+from app.models.finance import FinanceRecord, FinanceBudget, FinanceGoal
+from app.models.counterparty import Counterparty
+from app.models.document import Document, Template
+from app.models.task import Task
+from app.models.marketing import MarketingCampaign
+from app.models.chat import ChatConversation, ChatMessage
+
+ARCHIVE_FORMAT = "alfa-copilot-account"
+ARCHIVE_VERSION = 1
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_CHUNK_SIZE = 5000
+
+# Tables in dependency order: referenced tables come first
+TABLES: List[Table] = [
+    Template.__table__,
+    Counterparty.__table__,
+    Document.__table__,
+    FinanceRecord.__table__,
+    FinanceBudget.__table__,
+    FinanceGoal.__table__,
+    Task.__table__,
+    MarketingCampaign.__table__,
+    ChatConversation.__table__,
+    ChatMessage.__table__,
+]
+
+# table -> {column: referenced table}
+REFERENCES: Dict[str, Dict[str, str]] = {
+    "documents": {"template_id": "templates", "counterparty_id": "counterparties"},
+    "finance_records": {"counterparty_id": "counterparties"},
+    "tasks": {"parent_task_id": "tasks", "linked_document_id": "documents"},
+    "chat_messages": {"conversation_id": "chat_conversations"},
+}
+
+# Not carried over: ownership is reassigned, change_seq is set by a trigger
+SKIPPED_COLUMNS = {"user_id", "change_seq"}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "tolist"):  # pgvector embeddings come back as numpy arrays
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _export_query(table: Table, user_id: int):
+    if table.name == "chat_messages":
+        conversations = ChatConversation.__table__
+        owned = select(conversations.c.id).where(conversations.c.user_id == user_id)
+        return select(table).where(table.c.conversation_id.in_(owned)).order_by(table.c.id)
+
+    if table.name == "tasks":
+        # Parents before subtasks, so that import can remap parent_task_id in one pass
+        depth = text("""
+            WITH RECURSIVE tree AS (
+                SELECT id, 0 AS depth FROM tasks
+                WHERE user_id = :user_id AND (parent_task_id IS NULL OR parent_task_id NOT IN (
+                    SELECT id FROM tasks WHERE user_id = :user_id
+                ))
+                UNION ALL
+                SELECT t.id, tree.depth + 1 FROM tasks t JOIN tree ON t.parent_task_id = tree.id
+            )
+            SELECT id, depth FROM tree
+        """).bindparams(user_id=user_id).columns(id=Integer, depth=Integer).subquery("tree")
+        return (
+            select(table)
+            .join(depth, depth.c.id == table.c.id)
+            .order_by(depth.c.depth, table.c.id)
+        )
+
+    return select(table).where(table.c.user_id == user_id).order_by(table.c.id)
+
+
+def export_account(user_id: int, out: IO[bytes]) -> Dict[str, int]:
+    """Write all of a user's records to `out` as gzip NDJSON. Returns row counts."""
+    counts: Dict[str, int] = {}
+
+    with sync_engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="REPEATABLE READ")
+        with conn.begin():
+            user = conn.execute(select(User.__table__).where(User.__table__.c.id == user_id)).mappings().first()
+            if user is None:
+                raise ValueError(f"User {user_id} not found")
+
+            with gzip.open(out, "wt", encoding="utf-8") as archive:
+                header = {
+                    "format": ARCHIVE_FORMAT,
+                    "version": ARCHIVE_VERSION,
+                    "exported_at": datetime.utcnow().isoformat(),
+                    "user": {"email": user["email"], "full_name": user["full_name"]},
+                }
+                archive.write(json.dumps(header, ensure_ascii=False) + "\n")
+
+                for table in TABLES:
+                    columns = [c.name for c in table.columns if c.name not in SKIPPED_COLUMNS]
+                    result = conn.execute(
+                        _export_query(table, user_id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+                    )
+                    count = 0
+                    for row in result.mappings():
+                        line = {"table": table.name, "row": {c: row[c] for c in columns}}
+                        archive.write(json.dumps(line, ensure_ascii=False, default=_json_default) + "\n")
+                        count += 1
+                    counts[table.name] = count
+
+    return counts
+
+
+def _read_archive(source: IO[bytes]) -> Tuple[Dict[str, Any], Iterator[Tuple[str, Dict[str, Any]]]]:
+    archive = gzip.open(source, "rt", encoding="utf-8")
+    header = json.loads(archive.readline())
+    if header.get("format") != ARCHIVE_FORMAT:
+        raise ValueError("Not an account archive")
+    if header.get("version") != ARCHIVE_VERSION:
+        raise ValueError(f"Unsupported archive version: {header.get('version')}")
+
+    def rows() -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with archive:
+            for line in archive:
+                if line.strip():
+                    item = json.loads(line)
+                    yield item["table"], item["row"]
+
+    return header, rows()
+
+
+def _copy_value(value: Any, is_json: bool = False) -> str:
+    """Encode a value for COPY ... FROM STDIN (text format)."""
+    if value is None:
+        return "\\N"
+    if is_json or isinstance(value, list):
+        value = json.dumps(value, ensure_ascii=False)
+    elif isinstance(value, bool):
+        return "t" if value else "f"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class _AccountImporter:
+    """Bulk-load archive rows for one target user inside a single transaction."""
+
+    def __init__(self, conn: Connection, user_id: int):
+        self.conn = conn
+        self.user_id = user_id
+        self.id_maps: Dict[str, Dict[int, int]] = {table.name: {} for table in TABLES}
+        self.table_columns = {table.name: {c.name for c in table.columns} for table in TABLES}
+        self.json_columns = {
+            table.name: {c.name for c in table.columns if isinstance(c.type, JSON)} for table in TABLES
+        }
+        self.system_templates: Set[int] = {
+            row[0] for row in conn.execute(text("SELECT id FROM templates WHERE user_id IS NULL"))
+        }
+
+    def _allocate_ids(self, table: str, count: int) -> List[int]:
+        return [
+            row[0] for row in self.conn.execute(
+                text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+                {"table": table, "count": count}
+            )
+        ]
+
+    def _remap(self, table: str, column: str, old_id: Optional[int]) -> Optional[int]:
+        if old_id is None:
+            return None
+        target = REFERENCES[table][column]
+        new_id = self.id_maps[target].get(old_id)
+        if new_id is None and target == "templates" and old_id in self.system_templates:
+            return old_id  # System templates are shared between users
+        return new_id
+
+    def encode_chunk(self, table: str, rows: List[Dict[str, Any]]) -> Tuple[str, io.StringIO]:
+        """Assign new ids and build COPY input for rows of one table. Returns (column list, data)."""
+        if table not in self.id_maps:
+            raise ValueError(f"Unknown table in archive: {table}")
+
+        id_map = self.id_maps[table]
+        for old_id, new_id in zip((r["id"] for r in rows), self._allocate_ids(table, len(rows))):
+            id_map[old_id] = new_id
+
+        known = self.table_columns[table]
+        columns = [c for c in rows[0] if c in known and c != "id"]
+        has_user = "user_id" in known
+        references = REFERENCES.get(table, {})
+        json_columns = self.json_columns[table]
+
+        buffer = io.StringIO()
+        for row in rows:
+            fields = [_copy_value(id_map[row["id"]])]
+            if has_user:
+                fields.append(_copy_value(self.user_id))
+            for column in columns:
+                value = row.get(column)
+                if column in references:
+                    value = self._remap(table, column, value)
+                fields.append(_copy_value(value, column in json_columns))
+            buffer.write("\t".join(fields) + "\n")
+        buffer.seek(0)
+
+        column_list = ", ".join(["id"] + (["user_id"] if has_user else []) + [f'"{c}"' for c in columns])
+        return column_list, buffer
+
+    def load_chunk(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        column_list, buffer = self.encode_chunk(table, rows)
+        cursor = self.conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {table} ({column_list}) FROM STDIN", buffer)
+        finally:
+            cursor.close()
+
+
+def import_account(source: IO[bytes], email: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load an archive into the user with `email` (created if missing;
+    defaults to the exported user's email). Returns the user id and row counts.
+    """
+    header, rows = _read_archive(source)
+    target_email = email or header["user"]["email"]
+    counts: Dict[str, int] = {}
+
+    with sync_engine.begin() as conn:
+        users = User.__table__
+        user_id = conn.execute(select(users.c.id).where(users.c.email == target_email)).scalar()
+        if user_id is None:
+            user_id = conn.execute(
+                users.insert()
+                .values(email=target_email, full_name=header["user"].get("full_name"), is_active=True)
+                .returning(users.c.id)
+            ).scalar()
+
+        importer = _AccountImporter(conn, user_id)
+        chunk: List[Dict[str, Any]] = []
+        chunk_table: Optional[str] = None
+
+        for table, row in rows:
+            if chunk and (table != chunk_table or len(chunk) >= IMPORT_CHUNK_SIZE):
+                importer.load_chunk(chunk_table, chunk)
+                chunk = []
+            chunk_table = table
+            chunk.append(row)
+            counts[table] = counts.get(table, 0) + 1
+
+        if chunk:
+            importer.load_chunk(chunk_table, chunk)
+
+    return {"user_id": user_id, "counts": counts}
@@ -4,21 +4,26 @@ Execute actions suggested by AI across different modules.
 """
 from typing import Dict, Any, Optional, List
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from datetime import datetime, timedelta
 
 from app.models.task import Task
-from app.models.finance import FinanceRecord
+from app.models.finance import FinanceRecord, FinanceDailyRollup
 from app.models.document import Document
 from app.models.marketing import MarketingCampaign
 from app.schemas.task import TaskCreate
 from app.schemas.finance import FinanceRecordCreate
 from app.schemas.document import DocumentCreate
 from app.schemas.marketing import MarketingCampaignCreate
+from app.services.budget_alerts import BudgetAlertEngine, expense_deltas
 
 
 class ActionExecutor:
     """Execute cross-module actions based on AI suggestions."""
     
+    # Actions that change finance records (stored insights must be refreshed)
+    FINANCE_ACTIONS = {"add_expense", "add_income"}
+    
     def __init__(self, db: Session):
         self.db = db
     
@@ -89,29 +94,37 @@ class ActionExecutor:
         start_date: datetime,
         end_date: datetime
     ) -> Dict[str, Any]:
-        """Analyze finance records for a period."""
-        records = self.db.query(FinanceRecord).filter(
-            FinanceRecord.user_id == user_id,
-            FinanceRecord.date >= start_date,
-            FinanceRecord.date <= end_date
-        ).all()
+        """Analyze finance records for a period (reads the daily rollup)."""
+        rows = self.db.query(
+            FinanceDailyRollup.type,
+            FinanceDailyRollup.category,
+            func.sum(FinanceDailyRollup.amount),
+            func.sum(FinanceDailyRollup.count)
+        ).filter(
+            FinanceDailyRollup.user_id == user_id,
+            FinanceDailyRollup.day >= start_date,
+            FinanceDailyRollup.day <= end_date
+        ).group_by(FinanceDailyRollup.type, FinanceDailyRollup.category).all()
         
-        income = sum(float(r.amount) for r in records if r.type == "income")
-        expense = sum(float(r.amount) for r in records if r.type == "expense")
+        income = sum(float(amount) for type_, _, amount, _ in rows if type_ == "income")
+        expense = sum(float(amount) for type_, _, amount, _ in rows if type_ == "expense")
         balance = income - expense
+        records_count = sum(int(count) for _, _, _, count in rows)
         
         # Category breakdown
         categories: Dict[str, float] = {}
-        for record in records:
-            cat = record.category or "Без категории"
-            categories[cat] = categories.get(cat, 0) + float(record.amount)
+        for _, category, amount, count in rows:
+            if not count:
+                continue
+            cat = category or "Без категории"
+            categories[cat] = categories.get(cat, 0) + float(amount)
         
         return {
             "period": {"start": start_date.isoformat(), "end": end_date.isoformat()},
             "total_income": round(income, 2),
             "total_expense": round(expense, 2),
             "balance": round(balance, 2),
-            "records_count": len(records),
+            "records_count": records_count,
             "categories": categories,
             "top_expense_category": max(
                 [(cat, amt) for cat, amt in categories.items() if amt < 0],
@@ -139,6 +152,8 @@ class ActionExecutor:
             date=date or datetime.utcnow()
         )
         self.db.add(record)
+        self.db.flush()
+        BudgetAlertEngine(self.db).apply(user_id, expense_deltas(record))
         self.db.commit()
         self.db.refresh(record)
         return record
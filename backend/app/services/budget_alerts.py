@@ -0,0 +1,146 @@
+"""
+Уведомления о бюджетах, вычисляемые при записи расходов.
+
+Для каждого активного бюджета хранится счётчик трат за текущее окно
+(finance_budget_spend). Запись расхода меняет только счётчики бюджетов
+своей категории, и если трата пересекает порог (80%, 100%), в
+finance_budget_alerts добавляется уведомление - по одному на порог за окно.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.finance import FinanceBudget, FinanceBudgetSpend, FinanceBudgetAlert, FinanceDailyRollup
+from app.services.finance_service import budget_window
+
+ALERT_THRESHOLDS = (80, 100)
+
+# (дата, категория, изменение суммы расходов)
+ExpenseDelta = Tuple[date, Optional[str], Decimal]
+
+
+def expense_deltas(record, sign: int = 1) -> List[ExpenseDelta]:
+    """Дельта для записи (ORM-объекта или словаря значений); доходы не учитываются"""
+    get = record.get if isinstance(record, dict) else lambda field: getattr(record, field)
+    if get("type") != "expense":
+        return []
+    return [(get("date"), get("category"), Decimal(str(get("amount"))) * sign)]
+
+
+class BudgetAlertEngine:
+    """Обновление счётчиков бюджетов и выпуск уведомлений о порогах"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def apply(
+        self,
+        user_id: int,
+        deltas: Iterable[ExpenseDelta],
+        today: Optional[date] = None
+    ) -> List[FinanceBudgetAlert]:
+        """
+        Учесть изменения расходов. Вызывается после flush записи в той же
+        транзакции: при открытии нового окна счётчик берётся из rollup,
+        который уже включает текущую запись.
+        """
+        by_category: Dict[str, List[Tuple[date, Decimal]]] = {}
+        for day, category, amount in deltas:
+            if not category or not amount:
+                continue
+            if isinstance(day, datetime):
+                day = day.date()
+            by_category.setdefault(category, []).append((day, Decimal(amount)))
+        if not by_category:
+            return []
+
+        # Блокировка бюджетов сериализует параллельные записи в одну категорию
+        budgets = self.db.query(FinanceBudget).filter(
+            FinanceBudget.user_id == user_id,
+            FinanceBudget.is_active == True,
+            FinanceBudget.category.in_(list(by_category))
+        ).order_by(FinanceBudget.id).with_for_update().all()
+        if not budgets:
+            return []
+
+        counters = {
+            counter.budget_id: counter
+            for counter in self.db.query(FinanceBudgetSpend).filter(
+                FinanceBudgetSpend.budget_id.in_([budget.id for budget in budgets])
+            ).all()
+        }
+
+        today = today or date.today()
+        alerts: List[FinanceBudgetAlert] = []
+        for budget in budgets:
+            window_start, window_end = budget_window(budget, today)
+            delta = sum(
+                (amount for day, amount in by_category[budget.category] if window_start <= day <= window_end),
+                Decimal(0)
+            )
+
+            counter = counters.get(budget.id)
+            if counter is None or (counter.category, counter.window_start, counter.window_end) != (
+                budget.category, window_start, window_end
+            ):
+                # Новое окно (или изменённый бюджет): начальное значение из дневного rollup
+                if counter is None:
+                    counter = FinanceBudgetSpend(budget_id=budget.id)
+                    self.db.add(counter)
+                counter.category = budget.category
+                counter.window_start = window_start
+                counter.window_end = window_end
+                counter.spent = self._spent_from_rollup(user_id, budget.category, window_start, window_end)
+            elif delta:
+                counter.spent = counter.spent + delta
+            else:
+                continue
+
+            alerts.extend(self._crossed_thresholds(budget, counter, counter.spent - delta))
+
+        self.db.flush()
+        return alerts
+
+    def _spent_from_rollup(self, user_id: int, category: str, window_start: date, window_end: date) -> Decimal:
+        return Decimal(self.db.query(func.coalesce(func.sum(FinanceDailyRollup.amount), 0)).filter(
+            FinanceDailyRollup.user_id == user_id,
+            FinanceDailyRollup.type == 'expense',
+            FinanceDailyRollup.category == category,
+            FinanceDailyRollup.day >= window_start,
+            FinanceDailyRollup.day <= window_end
+        ).scalar())
+
+    def _crossed_thresholds(
+        self,
+        budget: FinanceBudget,
+        counter: FinanceBudgetSpend,
+        spent_before: Decimal
+    ) -> List[FinanceBudgetAlert]:
+        alerts = []
+        for threshold in ALERT_THRESHOLDS:
+            limit = budget.amount * threshold / 100
+            if not (spent_before < limit <= counter.spent):
+                continue
+            # Повторное пересечение (после уменьшения трат) не дублирует уведомление
+            exists = self.db.query(FinanceBudgetAlert.id).filter(
+                FinanceBudgetAlert.budget_id == budget.id,
+                FinanceBudgetAlert.window_start == counter.window_start,
+                FinanceBudgetAlert.threshold == threshold
+            ).first()
+            if exists:
+                continue
+            alert = FinanceBudgetAlert(
+                user_id=budget.user_id,
+                budget_id=budget.id,
+                threshold=threshold,
+                window_start=counter.window_start,
+                spent=counter.spent,
+                budget_amount=budget.amount,
+                is_read=False
+            )
+            self.db.add(alert)
+            alerts.append(alert)
+        return alerts
@@ -0,0 +1,123 @@
+"""
+Выписки в формате обмена 1С с клиент-банком (1CClientBankExchange).
+
+Файл - строки "Ключ=Значение"; документы расположены между
+"СекцияДокумент=..." и "КонецДокумента", собственные счета перечислены
+в заголовке ("РасчСчет=") и секциях "СекцияРасчСчет". Файл читается
+построчно, каждый документ сразу превращается в строку импорта, так что
+память не зависит от числа документов.
+"""
+import codecs
+import io
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, Optional, Set
+
+MARKER = '1CClientBankExchange'
+SAMPLE_SIZE = 4096
+
+
+def is_client_bank_exchange(sample: bytes) -> bool:
+    return sample.lstrip(codecs.BOM_UTF8).lstrip().startswith(MARKER.encode())
+
+
+def _detect_encoding(sample: bytes) -> str:
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    # Ключ "Кодировка" (Windows/DOS) записан в кодировке файла: она та, в которой он читается
+    for codec in ('utf-8', 'cp1251', 'cp866'):
+        if 'Кодировка=' in sample.decode(codec, errors='replace'):
+            return codec
+    return 'cp1251'  # Значение по умолчанию в стандарте обмена
+
+
+def _parse_date(value: str) -> Optional[str]:
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%d.%m.%Y').date().isoformat()
+    except ValueError:
+        return None
+
+
+def _party(document: Dict[str, str], role: str) -> str:
+    """Наименование: "Плательщик1" или "Плательщик" (бывает в виде "ИНН 7701234567 ООО Ромашка")"""
+    name = document.get(f'{role}1') or document.get(role, '')
+    if name.startswith('ИНН '):
+        name = name.split(' ', 2)[2] if name.count(' ') >= 2 else ''
+    return name.strip()
+
+
+def document_to_row(document: Dict[str, str], accounts: Set[str]) -> Dict[str, str]:
+    """
+    Документ -> канонические поля импорта. Направление определяется по
+    собственным счетам: списание со своего счёта - расход.
+    """
+    payer_account = document.get('ПлательщикСчет', '') or document.get('ПлательщикРасчСчет', '')
+    recipient_account = document.get('ПолучательСчет', '') or document.get('ПолучательРасчСчет', '')
+
+    if payer_account in accounts and recipient_account not in accounts:
+        is_expense = True
+    elif recipient_account in accounts and payer_account not in accounts:
+        is_expense = False
+    else:
+        # Счёт выписки не указан или перевод между своими счетами
+        is_expense = bool(document.get('ДатаСписано', '').strip())
+
+    counterparty_role = 'Получатель' if is_expense else 'Плательщик'
+    own_account = payer_account if is_expense else recipient_account
+    operation_date = (
+        _parse_date(document.get('ДатаСписано' if is_expense else 'ДатаПоступило', ''))
+        or _parse_date(document.get('Дата', ''))
+        or ''
+    )
+    amount = document.get('Сумма', '').strip().replace(',', '.')
+
+    return {
+        'date': operation_date,
+        'amount': f"-{amount}" if is_expense and amount else amount,
+        'type': 'expense' if is_expense else 'income',
+        'description': document.get('НазначениеПлатежа', '').strip(),
+        'counterparty': _party(document, counterparty_role),
+        'counterparty_inn': document.get(f'{counterparty_role}ИНН', '').strip(),
+        'account': own_account,
+        'payment_method': document.get('_section', '')[:50],  # Вид документа: платёжное поручение, ордер...
+        'category': '',
+    }
+
+
+def iter_client_bank_exchange_rows(stream: BinaryIO) -> Iterator[tuple]:
+    """
+    Строки импорта (номер строки начала документа, канонические поля,
+    исходные данные) в формате SourceRow пайплайна импорта
+    """
+    position = stream.tell()
+    sample = stream.read(SAMPLE_SIZE)
+    stream.seek(position)
+
+    text = io.TextIOWrapper(stream, encoding=_detect_encoding(sample), errors='replace', newline=None)
+    try:
+        accounts: Set[str] = set()
+        document: Optional[Dict[str, str]] = None
+        start_line = 0
+
+        for line_num, line in enumerate(text, start=1):
+            key, _, value = line.strip().partition('=')
+            if document is not None:
+                if key == 'КонецДокумента':
+                    raw = str({k: v for k, v in document.items() if not k.startswith('_')})
+                    yield start_line, document_to_row(document, accounts), raw
+                    document = None
+                elif key:
+                    document[key] = value
+            elif key == 'СекцияДокумент':
+                document = {'_section': value.strip()}
+                start_line = line_num
+            elif key == 'РасчСчет' and value.strip():
+                # Собственные счета: в заголовке и в секциях СекцияРасчСчет
+                accounts.add(value.strip())
+            elif key == 'КонецФайла':
+                break
+    finally:
+        # Поток принадлежит вызывающему коду
+        text.detach()
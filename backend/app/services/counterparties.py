@@ -0,0 +1,339 @@
+"""
+Справочник контрагентов.
+
+Финансовые записи и документы хранят контрагента свободным текстом, поэтому
+"ООО Ромашка", "Ромашка ООО" и "ооо «ромашка»" - разные строки. Каждая
+запись и документ ссылается на контрагента из справочника: основной ключ -
+ИНН, без ИНН - нормализованное наименование (без организационно-правовой
+формы, кавычек и регистра). Контрагент без ИНН, для которого позже пришёл
+ИНН (например, из выписки 1С), получает этот ИНН, а не дублируется.
+
+При импорте сопоставление идёт пакетами через CounterpartyResolver: ключи
+кэшируются в памяти, недостающие загружаются одним запросом, новые
+контрагенты создаются одним INSERT на пакет. Обороты по контрагенту
+считаются по индексам (user_id, counterparty_id, ...), без полного просмотра.
+"""
+import re
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_, case, exists, func, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+
+from app.models.counterparty import Counterparty
+from app.models.document import Document
+from app.models.finance import FinanceRecord
+from app.schemas.counterparty import Counterparty as CounterpartySchema, CounterpartyTurnover
+
+BACKFILL_BATCH_SIZE = 2000
+BACKFILL_QUEUED_KEY = "counterparties:backfill:queued"
+
+# Организационно-правовые формы: длинные варианты раньше сокращений
+LEGAL_FORMS = sorted([
+    'общество с ограниченной ответственностью',
+    'публичное акционерное общество',
+    'непубличное акционерное общество',
+    'открытое акционерное общество',
+    'закрытое акционерное общество',
+    'акционерное общество',
+    'индивидуальный предприниматель',
+    'автономная некоммерческая организация',
+    'некоммерческая организация',
+    'федеральное государственное унитарное предприятие',
+    'государственное унитарное предприятие',
+    'муниципальное унитарное предприятие',
+    'ооо', 'пао', 'оао', 'зао', 'нао', 'ао', 'ип', 'ано', 'нко', 'фгуп', 'гуп', 'муп',
+    'llc', 'ltd', 'inc', 'gmbh',
+], key=len, reverse=True)
+
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+# Шаблоны действуют и в Python, и в регулярных выражениях PostgreSQL (_unlinked)
+_INN_PATTERN = r'^\s*(?:[иИ][нН][нН]\s*)?(\d{12}|\d{10})(?!\d)'
+_NAME_PATTERN = r'\w'  # Ключ наименования непустой, если в нём есть буква или цифра
+_INN = re.compile(_INN_PATTERN)
+_LEGAL_FORM = re.compile(r'\b(?:' + '|'.join(LEGAL_FORMS) + r')\b')
+
+# (наименование, ИНН) в том виде, в каком пришли из записи или документа
+Party = Tuple[Optional[str], Optional[str]]
+
+
+def normalize_inn(value: Optional[str]) -> Optional[str]:
+    """
+    ИНН из 10 (организация) или 12 (ИП, физлицо) цифр; остальное - не ИНН.
+    Берётся первая группа цифр: "7701234567/770101001" (ИНН/КПП) -> "7701234567"
+    """
+    match = _INN.match(value or '')
+    return match.group(1) if match else None
+
+
+def normalize_counterparty_name(value: Optional[str]) -> str:
+    """Ключ наименования: "ООО «Ромашка»", "Ромашка ООО" -> "ромашка" """
+    text = ' '.join(_PUNCTUATION.sub(' ', (value or '').lower().replace('ё', 'е')).split())
+    # Наименование, состоящее только из ОПФ ("ИП"), остаётся как есть
+    normalized = ' '.join(_LEGAL_FORM.sub(' ', text).split()) or text
+    return normalized[:255]
+
+
+class CounterpartyResolver:
+    """
+    Сопоставление (наименование, ИНН) с контрагентами пользователя с
+    кэшем в памяти на время импорта или обработки запроса
+    """
+
+    def __init__(self, db: Session, user_id: int):
+        self.db = db
+        self.user_id = user_id
+        self._by_inn: Dict[str, int] = {}
+        self._by_name: Dict[str, int] = {}
+        self._without_inn: Set[int] = set()  # Контрагенты, которым можно присвоить ИНН
+
+    def resolve(self, name: Optional[str], inn: Optional[str]) -> Optional[int]:
+        return self.resolve_batch([(name, inn)])[0]
+
+    def resolve_batch(self, parties: Sequence[Party]) -> List[Optional[int]]:
+        """id контрагентов в порядке parties; None - контрагент не указан"""
+        keys = [(normalize_inn(inn), normalize_counterparty_name(name), (name or '').strip()) for name, inn in parties]
+        self._load(
+            {inn for inn, _, _ in keys if inn and inn not in self._by_inn},
+            {normalized for _, normalized, _ in keys if normalized and normalized not in self._by_name}
+        )
+
+        new_by_inn: Dict[str, Tuple[str, str]] = {}
+        new_by_name: Dict[str, str] = {}
+        for inn, normalized, name in keys:
+            if inn:
+                if inn in self._by_inn or inn in new_by_inn:
+                    continue
+                known = self._by_name.get(normalized) if normalized else None
+                if known in self._without_inn and self._assign_inn(known, inn):
+                    continue
+                new_by_inn[inn] = (normalized, name or inn)
+            elif normalized and normalized not in self._by_name:
+                new_by_name.setdefault(normalized, name)
+
+        # Наименование без ИНН, пришедшее в пакете и с ИНН, - тот же контрагент
+        for normalized, _ in new_by_inn.values():
+            new_by_name.pop(normalized, None)
+
+        if new_by_inn or new_by_name:
+            self._create(
+                [(inn, normalized, name) for inn, (normalized, name) in new_by_inn.items()]
+                + [(None, normalized, name) for normalized, name in new_by_name.items()]
+            )
+
+        return [
+            self._by_inn.get(inn) if inn else self._by_name.get(normalized) if normalized else None
+            for inn, normalized, _ in keys
+        ]
+
+    def _remember(self, counterparty_id: int, inn: Optional[str], normalized: str) -> None:
+        if inn:
+            self._by_inn.setdefault(inn, counterparty_id)
+        else:
+            self._without_inn.add(counterparty_id)
+        if normalized:
+            self._by_name.setdefault(normalized, counterparty_id)
+
+    def _load(self, inns: Set[str], names: Set[str]) -> None:
+        if not inns and not names:
+            return
+        conditions = []
+        if inns:
+            conditions.append(Counterparty.inn.in_(inns))
+        if names:
+            conditions.append(Counterparty.normalized_name.in_(names))
+        rows = self.db.query(Counterparty.id, Counterparty.inn, Counterparty.normalized_name).filter(
+            Counterparty.user_id == self.user_id,
+            or_(*conditions)
+        ).order_by(Counterparty.id).all()
+        for row in rows:
+            self._remember(*row)
+
+    def _assign_inn(self, counterparty_id: int, inn: str) -> bool:
+        """ИНН для контрагента, известного до сих пор только по наименованию"""
+        other = aliased(Counterparty)
+        updated = self.db.execute(
+            update(Counterparty)
+            .where(
+                Counterparty.id == counterparty_id,
+                Counterparty.inn.is_(None),
+                ~exists().where(and_(other.user_id == self.user_id, other.inn == inn))
+            )
+            .values(inn=inn)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        self._without_inn.discard(counterparty_id)
+        if updated:
+            self._by_inn[inn] = counterparty_id
+        return bool(updated)
+
+    def _create(self, rows: List[Tuple[Optional[str], str, str]]) -> None:
+        values = [
+            {"user_id": self.user_id, "inn": inn, "normalized_name": normalized, "name": name[:255]}
+            for inn, normalized, name in rows
+        ]
+        # Конфликт - контрагента одновременно создал другой импорт: он загружается ниже
+        created = self.db.execute(
+            insert(Counterparty).on_conflict_do_nothing().returning(
+                Counterparty.id, Counterparty.inn, Counterparty.normalized_name
+            ),
+            values
+        ).all()
+        for row in created:
+            self._remember(*row)
+
+        self._load(
+            {inn for inn, _, _ in rows if inn and inn not in self._by_inn},
+            {normalized for inn, normalized, _ in rows if not inn and normalized not in self._by_name}
+        )
+
+
+def resolve_counterparty(db: Session, user_id: int, name: Optional[str], inn: Optional[str]) -> Optional[int]:
+    """Контрагент для одной записи или документа (создаётся при необходимости)"""
+    return CounterpartyResolver(db, user_id).resolve(name, inn)
+
+
+_BACKFILL_SOURCES = [
+    (FinanceRecord, FinanceRecord.counterparty, FinanceRecord.counterparty_inn),
+    (Document, Document.counterparty_name, Document.counterparty_inn),
+]
+
+
+def _unlinked(model, name_column, inn_column):
+    """
+    Контрагент указан, но не связан со справочником. "Указан" - как у
+    CounterpartyResolver: непустое нормализованное наименование или
+    корректный ИНН; заглушки вроде "-" без ИНН никогда не связываются.
+    """
+    return and_(
+        model.counterparty_id.is_(None),
+        or_(name_column.regexp_match(_NAME_PATTERN), inn_column.regexp_match(_INN_PATTERN))
+    )
+
+
+def users_with_unlinked(db: Session) -> List[int]:
+    """Пользователи, у которых есть записи или документы без связи со справочником"""
+    queries = [
+        db.query(model.user_id).filter(_unlinked(model, name_column, inn_column)).distinct()
+        for model, name_column, inn_column in _BACKFILL_SOURCES
+    ]
+    return sorted({user_id for (user_id,) in queries[0].union(*queries[1:]).all()})
+
+
+def link_unresolved(db: Session, user_id: int) -> int:
+    """
+    Связать со справочником записи и документы, созданные до его появления.
+    Обрабатывается пакетами по id с фиксацией после каждого пакета.
+
+    Returns:
+        int: число связанных записей и документов
+    """
+    resolver = CounterpartyResolver(db, user_id)
+    linked = 0
+    for model, name_column, inn_column in _BACKFILL_SOURCES:
+        last_id = 0
+        while True:
+            rows = db.query(model.id, name_column, inn_column).filter(
+                model.user_id == user_id,
+                model.id > last_id,
+                _unlinked(model, name_column, inn_column)
+            ).order_by(model.id).limit(BACKFILL_BATCH_SIZE).all()
+            if not rows:
+                break
+
+            ids = resolver.resolve_batch([(name, inn) for _, name, inn in rows])
+            changes = [
+                {"id": row_id, "counterparty_id": counterparty_id}
+                for (row_id, _, _), counterparty_id in zip(rows, ids) if counterparty_id is not None
+            ]
+            if changes:
+                # Пакетный UPDATE по первичному ключу
+                db.execute(update(model), changes)
+            db.commit()
+            linked += len(changes)
+            last_id = rows[-1][0]
+    return linked
+
+
+def counterparty_turnover(
+    db: Session,
+    user_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    counterparty_ids: Optional[Iterable[int]] = None,
+    limit: int = 50
+) -> List[CounterpartyTurnover]:
+    """
+    Обороты по контрагентам за период: доходы, расходы и число операций по
+    финансовым записям, число документов. Без counterparty_ids - крупнейшие
+    по обороту контрагенты. Агрегаты считаются по индексам
+    idx_finance_records_user_counterparty и idx_documents_user_counterparty.
+    """
+    income = func.coalesce(func.sum(case((FinanceRecord.type == 'income', FinanceRecord.amount))), 0)
+    expense = func.coalesce(func.sum(case((FinanceRecord.type == 'expense', FinanceRecord.amount))), 0)
+
+    record_criteria = [FinanceRecord.user_id == user_id, FinanceRecord.counterparty_id.isnot(None)]
+    document_criteria = [Document.user_id == user_id, Document.counterparty_id.isnot(None)]
+    if start_date:
+        record_criteria.append(FinanceRecord.date >= start_date)
+        document_criteria.append(Document.created_at >= start_date)
+    if end_date:
+        record_criteria.append(FinanceRecord.date <= end_date)
+        document_criteria.append(Document.created_at < end_date + timedelta(days=1))
+
+    if counterparty_ids is not None:
+        ids = list(counterparty_ids)
+        record_criteria.append(FinanceRecord.counterparty_id.in_(ids))
+        document_criteria.append(Document.counterparty_id.in_(ids))
+    else:
+        # Крупнейшие по обороту контрагенты
+        ids = [counterparty_id for (counterparty_id,) in db.query(FinanceRecord.counterparty_id).filter(
+            *record_criteria
+        ).group_by(FinanceRecord.counterparty_id).order_by(
+            (income + expense).desc(), FinanceRecord.counterparty_id
+        ).limit(limit).all()]
+        record_criteria.append(FinanceRecord.counterparty_id.in_(ids))
+        document_criteria.append(Document.counterparty_id.in_(ids))
+    if not ids:
+        return []
+
+    operations = {
+        row[0]: row[1:]
+        for row in db.query(
+            FinanceRecord.counterparty_id, income, expense, func.count(),
+            func.min(FinanceRecord.date), func.max(FinanceRecord.date)
+        ).filter(*record_criteria).group_by(FinanceRecord.counterparty_id).all()
+    }
+    documents = {
+        row[0]: row[1:]
+        for row in db.query(
+            Document.counterparty_id, func.count(), func.max(Document.created_at)
+        ).filter(*document_criteria).group_by(Document.counterparty_id).all()
+    }
+    counterparties = {
+        counterparty.id: counterparty
+        for counterparty in db.query(Counterparty).filter(
+            Counterparty.user_id == user_id,
+            Counterparty.id.in_(ids)
+        ).all()
+    }
+
+    result = []
+    for counterparty_id in ids:
+        counterparty = counterparties.get(counterparty_id)
+        if counterparty is None:
+            continue
+        record_income, record_expense, count, first, last = operations.get(counterparty_id, (0, 0, 0, None, None))
+        document_count, last_document_at = documents.get(counterparty_id, (0, None))
+        result.append(CounterpartyTurnover(
+            counterparty=CounterpartySchema.model_validate(counterparty),
+            income=record_income,
+            expense=record_expense,
+            operations=count,
+            first_operation=first,
+            last_operation=last,
+            documents=document_count,
+            last_document_at=last_document_at
+        ))
+    return result
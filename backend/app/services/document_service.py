@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, desc
 
 from app.models.document import Document, Template
+from app.services.counterparties import resolve_counterparty
 from app.schemas.document import (
     DocumentCreate,
     DocumentUpdate,
@@ -256,6 +257,7 @@ _________________/{{contractor_representative}}/    _________________/{{executor
             variables=request.variables,
             counterparty_name=request.counterparty_name,
             counterparty_inn=request.counterparty_inn,
+            counterparty_id=resolve_counterparty(db, user_id, request.counterparty_name, request.counterparty_inn),
             amount=request.amount,
             status="draft",
         )
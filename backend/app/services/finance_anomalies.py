@@ -0,0 +1,239 @@
+"""
+Поиск аномалий в истории транзакций.
+
+Данные загружаются колоночными запросами (или из дневного rollup) в массивы
+NumPy, и все статистики считаются векторно, без цикла по записям. Строковые
+ключи (категории) кодируются в БД через dense_rank, поэтому числовой
+результат запроса сразу превращается в матрицу float, а наименования
+загружаются отдельно - по одному на группу:
+
+- выбросы сумм: робастный z-score (медиана и MAD) внутри категории;
+- всплески категорий: траты за прошлый месяц против сезонной базы
+  (медиана предыдущих месяцев и тот же месяц год назад);
+- новые контрагенты: первые операции за последние 30 дней на сумму,
+  крупную для пользователя.
+
+Результаты - AIInsight; правила подключены в finance_insights и считаются
+фоновой задачей обновления инсайтов.
+"""
+from datetime import date, timedelta
+from typing import List, Tuple
+
+import numpy as np
+from sqlalchemy import Float, case, cast, func
+from sqlalchemy.orm import Session
+
+from app.models.finance import FinanceRecord, FinanceDailyRollup
+from app.schemas.finance import AIInsight
+
+HISTORY_DAYS = 365
+RECENT_DAYS = 30
+MAX_FINDINGS = 3
+
+# Робастный z-score: 0.6745 * (x - медиана) / MAD; > 3.5 - выброс (Iglewicz, Hoaglin)
+MAD_SCALE = 0.6745
+OUTLIER_Z = 3.5
+MIN_CATEGORY_SAMPLES = 10
+
+SPIKE_RATIO = 1.5
+SPIKE_MONTHS = 13  # прошлый месяц и 12 предыдущих
+MIN_BASELINE_MONTHS = 3
+
+NEW_COUNTERPARTY_PERCENTILE = 90
+
+
+def fetch_matrix(query) -> np.ndarray:
+    """Числовой результат запроса матрицей float (строки x колонки) одним преобразованием NumPy"""
+    rows = query.all()
+    return np.array(rows, dtype=float).reshape(len(rows), len(query.column_descriptions))
+
+
+def group_median(codes: np.ndarray, values: np.ndarray, groups: int) -> np.ndarray:
+    """Медиана values по группам codes (0..groups-1) одной сортировкой; NaN для пустых групп"""
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    medians = np.full(groups, np.nan)
+    present = counts > 0
+    low = starts[present] + (counts[present] - 1) // 2
+    high = starts[present] + counts[present] // 2
+    medians[present] = (sorted_values[low] + sorted_values[high]) / 2
+    return medians
+
+
+def robust_z(codes: np.ndarray, values: np.ndarray, groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Робастный z-score каждого значения внутри своей группы и медианы групп"""
+    medians = group_median(codes, values, groups)
+    deviations = np.abs(values - medians[codes])
+    mad = group_median(codes, deviations, groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = MAD_SCALE * (values - medians[codes]) / mad[codes]
+    # MAD = 0 (почти все суммы одинаковы): выбросом считается любое отклонение вверх
+    z = np.where(mad[codes] > 0, z, np.where(values > medians[codes], np.inf, 0.0))
+    return z, medians
+
+
+def find_amount_outliers(db: Session, user_id: int, today: date) -> List[AIInsight]:
+    """Недавние расходы, аномально крупные для своей категории"""
+    recent_from = today - timedelta(days=RECENT_DAYS)
+    criteria = [
+        FinanceRecord.user_id == user_id,
+        FinanceRecord.type == 'expense',
+        FinanceRecord.date > today - timedelta(days=HISTORY_DAYS),
+        FinanceRecord.date <= today
+    ]
+    category = func.coalesce(FinanceRecord.category, '')
+    # Только числовые колонки: категория - номером в порядке сортировки, суммы - сразу float
+    table = fetch_matrix(db.query(
+        FinanceRecord.id,
+        func.dense_rank().over(order_by=category) - 1,
+        cast(FinanceRecord.amount, Float),
+        case((FinanceRecord.date > recent_from, 1), else_=0)
+    ).filter(*criteria))
+    if not len(table):
+        return []
+
+    names = [name for (name,) in db.query(category).filter(*criteria).distinct().order_by(category)]
+    ids = table[:, 0].astype(np.int64)
+    codes = table[:, 1].astype(np.intp)
+    amounts = table[:, 2]
+    recent = table[:, 3] > 0
+
+    z, medians = robust_z(codes, amounts, len(names))
+    samples = np.bincount(codes, minlength=len(names))
+    flagged = np.flatnonzero(recent & (z > OUTLIER_Z) & (samples[codes] >= MIN_CATEGORY_SAMPLES))
+    flagged = flagged[np.argsort(-z[flagged], kind='stable')][:MAX_FINDINGS]
+    if not len(flagged):
+        return []
+
+    details = dict(
+        (record_id, (record_date, description))
+        for record_id, record_date, description in db.query(
+            FinanceRecord.id, FinanceRecord.date, FinanceRecord.description
+        ).filter(FinanceRecord.id.in_([int(ids[i]) for i in flagged])).all()
+    )
+
+    insights = []
+    for i in flagged:
+        category = names[codes[i]] or "Без категории"
+        record_date, description = details[ids[i]]
+        insights.append(AIInsight(
+            type="warning",
+            title=f"Необычно крупный расход: {category}",
+            description=(
+                f"{record_date:%d.%m.%Y}: {amounts[i]:,.2f} ₽"
+                f"{f' ({description})' if description else ''} при обычной сумме "
+                f"около {medians[codes[i]]:,.2f} ₽ в этой категории"
+            ),
+            priority="medium",
+            category=category,
+            amount=round(amounts[i], 2)
+        ))
+    return insights
+
+
+def find_category_spikes(db: Session, user_id: int, today: date) -> List[AIInsight]:
+    """Категории, в которых траты прошлого месяца резко выше сезонной базы"""
+    last_month = today.replace(day=1) - timedelta(days=1)
+    first_month = np.datetime64(last_month, 'M') - np.timedelta64(SPIKE_MONTHS - 1, 'M')
+    criteria = [
+        FinanceDailyRollup.user_id == user_id,
+        FinanceDailyRollup.type == 'expense',
+        FinanceDailyRollup.day >= first_month.astype('datetime64[D]').item(),
+        FinanceDailyRollup.day <= last_month
+    ]
+    category = FinanceDailyRollup.category
+    month = func.extract('year', FinanceDailyRollup.day) * 12 + func.extract('month', FinanceDailyRollup.day)
+    # Суммы по (категория, месяц) считает БД
+    table = fetch_matrix(db.query(
+        func.dense_rank().over(order_by=category) - 1,
+        month,
+        cast(func.sum(FinanceDailyRollup.amount), Float)
+    ).filter(*criteria).group_by(category, month))
+    if not len(table):
+        return []
+
+    names = [name for (name,) in db.query(category).filter(*criteria).distinct().order_by(category)]
+    codes = table[:, 0].astype(np.intp)
+    first_index = last_month.year * 12 + last_month.month - (SPIKE_MONTHS - 1)
+    months = table[:, 1].astype(np.intp) - first_index
+
+    # Матрица категория x месяц; последний столбец - прошлый месяц
+    totals = np.zeros((len(names), SPIKE_MONTHS))
+    np.add.at(totals, (codes, months), table[:, 2])
+
+    current = totals[:, -1]
+    history = totals[:, 1:-1]  # 11 месяцев между тем же месяцем год назад и прошлым
+    active = (history > 0).sum(axis=1) >= MIN_BASELINE_MONTHS
+    baseline = np.maximum(np.median(history, axis=1), totals[:, 0])
+    mad = np.median(np.abs(history - np.median(history, axis=1, keepdims=True)), axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(mad > 0, MAD_SCALE * (current - baseline) / mad, np.inf)
+
+    flagged = np.flatnonzero(active & (baseline > 0) & (current > SPIKE_RATIO * baseline) & (z > OUTLIER_Z))
+    flagged = flagged[np.argsort(-(current[flagged] / baseline[flagged]), kind='stable')][:MAX_FINDINGS]
+
+    return [
+        AIInsight(
+            type="warning",
+            title=f"Всплеск расходов: {names[i] or 'Без категории'}",
+            description=(
+                f"В {last_month:%m.%Y} потрачено {current[i]:,.2f} ₽ - "
+                f"в {current[i] / baseline[i]:.1f} раза больше обычного ({baseline[i]:,.2f} ₽)"
+            ),
+            priority="medium",
+            category=names[i] or None,
+            amount=round(current[i] - baseline[i], 2)
+        )
+        for i in flagged
+    ]
+
+
+def find_new_counterparties(db: Session, user_id: int, today: date) -> List[AIInsight]:
+    """Новые контрагенты последних 30 дней с платежами, крупными для пользователя"""
+    rows = db.query(
+        FinanceRecord.counterparty,
+        func.min(FinanceRecord.date),
+        cast(func.sum(FinanceRecord.amount), Float),
+        func.count(FinanceRecord.id)
+    ).filter(
+        FinanceRecord.user_id == user_id,
+        FinanceRecord.type == 'expense',
+        FinanceRecord.counterparty.isnot(None),
+        FinanceRecord.counterparty != '',
+        FinanceRecord.date <= today
+    ).group_by(FinanceRecord.counterparty).all()
+    if len(rows) < 2:
+        return []
+
+    # Строка на контрагента; колонки - срезами массива без разбора строк в Python
+    table = np.array(rows, dtype=object)
+    names = table[:, 0]
+    first_seen = table[:, 1].astype('datetime64[D]')
+    totals = table[:, 2].astype(float)
+    average_payment = totals / table[:, 3].astype(float)
+
+    new = first_seen > np.datetime64(today - timedelta(days=RECENT_DAYS))
+    if new.all():
+        return []  # Вся история новая: сравнивать не с чем
+    # Сравнивается средний платёж: оборот старых контрагентов накоплен за годы
+    threshold = np.percentile(average_payment[~new], NEW_COUNTERPARTY_PERCENTILE)
+
+    flagged = np.flatnonzero(new & (average_payment > threshold))
+    flagged = flagged[np.argsort(-totals[flagged], kind='stable')][:MAX_FINDINGS]
+
+    return [
+        AIInsight(
+            type="warning",
+            title=f"Новый контрагент: {names[i]}",
+            description=(
+                f"С {first_seen[i].item():%d.%m.%Y} переведено {totals[i]:,.2f} ₽; средний платёж "
+                f"больше, чем у {NEW_COUNTERPARTY_PERCENTILE}% ваших постоянных контрагентов"
+            ),
+            priority="medium",
+            amount=round(totals[i], 2)
+        )
+        for i in flagged
+    ]
@@ -0,0 +1,240 @@
+"""
+Категоризация транзакций по ключевым словам.
+
+Все правила (встроенные, общие из БД и правила пользователя) компилируются
+в автомат Ахо-Корасик, поэтому описание просматривается за один проход
+независимо от количества правил. Скомпилированные автоматы кэшируются и
+пересобираются только при изменении набора правил.
+"""
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.models.finance import FinanceCategoryRule
+
+USER_CACHE_SIZE = 512
+
+UNCATEGORIZED = ("Без категории", 0.0)
+OTHER = ("Прочее", 0.5)
+
+# (keyword, category, type, weight)
+Rule = Tuple[str, str, str, float]
+
+
+def _normalize(text: str) -> str:
+    return text.lower().replace('ё', 'е')
+
+
+class KeywordAutomaton:
+    """Автомат Ахо-Корасик: все вхождения всех ключевых слов за O(длина текста)"""
+
+    def __init__(self, keywords: Sequence[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[List[int]] = [[]]
+
+        for index, keyword in enumerate(keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+
+        # Суффиксные ссылки обходом в ширину
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def matches(self, text: str) -> Set[int]:
+        """Индексы ключевых слов, встречающихся в тексте"""
+        found: Set[int] = set()
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class CompiledRules:
+    """Правила одного набора, скомпилированные по типу транзакции"""
+
+    def __init__(self, rules: Iterable[Rule]):
+        by_type: Dict[str, List[Rule]] = {}
+        for keyword, category, transaction_type, weight in rules:
+            keyword = _normalize(keyword.strip())
+            if keyword:
+                by_type.setdefault(transaction_type, []).append((keyword, category, transaction_type, float(weight)))
+
+        self._rules = by_type
+        self._automata = {
+            transaction_type: KeywordAutomaton([rule[0] for rule in type_rules])
+            for transaction_type, type_rules in by_type.items()
+        }
+
+    def score(self, text: str, transaction_type: str, scores: Dict[str, List[float]], offset: int = 0) -> None:
+        """Добавить веса совпавших правил в scores: category -> [сумма весов, -порядок первого правила]"""
+        automaton = self._automata.get(transaction_type)
+        if automaton is None:
+            return
+        rules = self._rules[transaction_type]
+        for index in automaton.matches(text):
+            _, category, _, weight = rules[index]
+            entry = scores.setdefault(category, [0.0, -(offset + index)])
+            entry[0] += weight
+            entry[1] = max(entry[1], -(offset + index))
+
+
+def _builtin_rules() -> List[Rule]:
+    from app.services.finance_service import FinanceService
+
+    return (
+        [(k, c, "expense", 1.0) for k, c in FinanceService.EXPENSE_CATEGORIES.items()]
+        + [(k, c, "income", 1.0) for k, c in FinanceService.INCOME_CATEGORIES.items()]
+    )
+
+
+class CategoryMatcher:
+    """
+    Категоризатор с кэшем скомпилированных правил.
+
+    Общие правила (встроенные + user_id IS NULL) и правила пользователя
+    компилируются отдельно; версия набора проверяется одним запросом
+    на пакет описаний.
+    """
+
+    def __init__(self, user_cache_size: int = USER_CACHE_SIZE):
+        self.user_cache_size = user_cache_size
+        self._lock = threading.Lock()
+        self._builtin: Optional[CompiledRules] = None
+        self._global: Optional[Tuple[tuple, CompiledRules]] = None
+        self._users: "OrderedDict[int, Tuple[tuple, CompiledRules]]" = OrderedDict()
+
+    def categorize(
+        self,
+        description: str,
+        transaction_type: str,
+        db: Optional[Session] = None,
+        user_id: Optional[int] = None
+    ) -> Tuple[str, float]:
+        return self.categorize_batch([(description, transaction_type)], db, user_id)[0]
+
+    def categorize_batch(
+        self,
+        items: Sequence[Tuple[str, str]],
+        db: Optional[Session] = None,
+        user_id: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Категоризировать пакет (описание, тип).
+        Без db используются только встроенные правила.
+
+        Returns:
+            list: [(category, confidence)] в порядке items
+        """
+        rule_sets = self._rule_sets(db, user_id)
+        results = []
+        for description, transaction_type in items:
+            if not description:
+                results.append(UNCATEGORIZED)
+                continue
+
+            text = _normalize(description)
+            scores: Dict[str, List[float]] = {}
+            offset = 0
+            for rules in rule_sets:
+                rules.score(text, transaction_type, scores, offset)
+                offset += 1_000_000  # Порядок правил: при равенстве весов побеждает более раннее
+
+            if not scores:
+                results.append(OTHER)
+                continue
+
+            category, (best, _) = max(scores.items(), key=lambda item: (item[1][0], item[1][1]))
+            total = sum(entry[0] for entry in scores.values())
+            # Однозначное совпадение даёт 0.8, как и прежняя эвристика
+            results.append((category, round(0.5 + 0.3 * best / total, 2)))
+        return results
+
+    def _rule_sets(self, db: Optional[Session], user_id: Optional[int]) -> List[CompiledRules]:
+        if db is None:
+            with self._lock:
+                if self._builtin is None:
+                    self._builtin = CompiledRules(_builtin_rules())
+                return [self._builtin]
+
+        versions = {
+            is_global: (count, max_id, max_updated)
+            for is_global, count, max_id, max_updated in db.query(
+                FinanceCategoryRule.user_id.is_(None),
+                func.count(FinanceCategoryRule.id),
+                func.max(FinanceCategoryRule.id),
+                func.max(FinanceCategoryRule.updated_at)
+            ).filter(
+                or_(FinanceCategoryRule.user_id.is_(None), FinanceCategoryRule.user_id == user_id)
+            ).group_by(FinanceCategoryRule.user_id.is_(None)).all()
+        }
+        global_version = versions.get(True, (0, None, None))
+        user_version = versions.get(False, (0, None, None))
+
+        with self._lock:
+            cached_global = self._global
+            cached_user = self._users.get(user_id) if user_id is not None else None
+            if cached_user is not None:
+                self._users.move_to_end(user_id)
+
+        if cached_global is None or cached_global[0] != global_version:
+            rules = _builtin_rules() + self._load_rules(db, None)
+            cached_global = (global_version, CompiledRules(rules))
+            with self._lock:
+                self._global = cached_global
+
+        rule_sets = [cached_global[1]]
+        if user_id is None or user_version[0] == 0:
+            return rule_sets
+
+        if cached_user is None or cached_user[0] != user_version:
+            cached_user = (user_version, CompiledRules(self._load_rules(db, user_id)))
+            with self._lock:
+                self._users[user_id] = cached_user
+                self._users.move_to_end(user_id)
+                if len(self._users) > self.user_cache_size:
+                    self._users.popitem(last=False)
+
+        # Правила пользователя проверяются первыми и выигрывают при равенстве весов
+        return [cached_user[1]] + rule_sets
+
+    @staticmethod
+    def _load_rules(db: Session, user_id: Optional[int]) -> List[Rule]:
+        query = db.query(
+            FinanceCategoryRule.keyword,
+            FinanceCategoryRule.category,
+            FinanceCategoryRule.type,
+            FinanceCategoryRule.weight
+        )
+        if user_id is None:
+            query = query.filter(FinanceCategoryRule.user_id.is_(None))
+        else:
+            query = query.filter(FinanceCategoryRule.user_id == user_id)
+        return [tuple(row) for row in query.order_by(FinanceCategoryRule.id).all()]
+
+
+category_matcher = CategoryMatcher()
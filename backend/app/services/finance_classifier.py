@@ -0,0 +1,214 @@
+"""
+Обучаемый классификатор категорий транзакций (отдельная модель на пользователя).
+
+Признаки - хэшированные символьные n-граммы описания, модель - линейная
+(логистическая регрессия). Обучение выполняется в Celery по проверенным
+пользователем записям; веса хранятся в БД разреженной матрицей, а в процессе
+API держатся в LRU-кэше с проверкой версии. Предсказание считается одним
+матричным умножением на весь пакет описаний.
+"""
+import io
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.finance import FinanceRecord, FinanceCategoryModel
+from app.services.finance_categorizer import category_matcher
+
+logger = logging.getLogger(__name__)
+
+TRAIN_DEBOUNCE_KEY = "finance:category-model:train:{user_id}"
+
+# HashingVectorizer не хранит состояния: одинаковые параметры при обучении и предсказании
+vectorizer = HashingVectorizer(
+    analyzer="char_wb",
+    ngram_range=(2, 4),
+    n_features=2 ** 18,
+    alternate_sign=False,
+    preprocessor=lambda text: text.lower().replace('ё', 'е'),
+)
+
+
+class CategoryModel:
+    """Веса линейной модели: строка на класс (тип, категория)"""
+
+    def __init__(self, classes: List[Tuple[str, str]], coef: sparse.csr_matrix, intercept: np.ndarray):
+        self.classes = classes
+        self.coef = coef
+        self.intercept = intercept
+        self._types = np.array([transaction_type for transaction_type, _ in classes])
+
+    def predict(self, items: Sequence[Tuple[str, str]]) -> List[Optional[Tuple[str, float]]]:
+        """Категория и вероятность для каждого (описание, тип); None - класса этого типа нет"""
+        if not items:
+            return []
+        features = vectorizer.transform([description for description, _ in items])
+        scores = (features @ self.coef.T).toarray() + self.intercept
+
+        # Категории другого типа транзакции исключаются
+        transaction_types = np.array([transaction_type for _, transaction_type in items])
+        allowed = transaction_types[:, None] == self._types[None, :]
+        scores = np.where(allowed, scores, -np.inf)
+
+        has_class = allowed.any(axis=1)
+        scores[~has_class] = 0.0
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+
+        return [
+            (self.classes[index][1], float(probabilities[row, index])) if has_class[row] else None
+            for row, index in enumerate(best)
+        ]
+
+    def dump(self) -> bytes:
+        buffer = io.BytesIO()
+        coef = self.coef.tocsr()
+        np.savez_compressed(
+            buffer,
+            data=coef.data,
+            indices=coef.indices,
+            indptr=coef.indptr,
+            shape=np.array(coef.shape),
+            intercept=self.intercept,
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def load(cls, classes: List[List[str]], weights: bytes) -> "CategoryModel":
+        arrays = np.load(io.BytesIO(weights))
+        coef = sparse.csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=tuple(arrays["shape"])
+        )
+        return cls([tuple(c) for c in classes], coef, arrays["intercept"])
+
+
+def train_user_model(db: Session, user_id: int) -> Dict[str, Any]:
+    """Обучить и сохранить модель пользователя по проверенным записям"""
+    rows = db.query(FinanceRecord.description, FinanceRecord.type, FinanceRecord.category).filter(
+        FinanceRecord.user_id == user_id,
+        FinanceRecord.is_verified == True,
+        FinanceRecord.category.isnot(None),
+        FinanceRecord.description.isnot(None)
+    ).order_by(FinanceRecord.id.desc()).limit(settings.CATEGORY_MODEL_MAX_SAMPLES).all()
+
+    labels = [(transaction_type, category) for _, transaction_type, category in rows]
+    classes = sorted(set(labels))
+    if len(rows) < settings.CATEGORY_MODEL_MIN_SAMPLES or len(classes) < 2:
+        return {"trained": False, "samples": len(rows), "classes": len(classes)}
+
+    class_index = {label: index for index, label in enumerate(classes)}
+    # Тип транзакции добавляется к тексту: одинаковые описания дохода и расхода различаются
+    features = vectorizer.transform([f"{t} {description}" for description, t, _ in rows])
+    target = np.array([class_index[label] for label in labels])
+
+    estimator = LogisticRegression(C=10.0, max_iter=1000)
+    estimator.fit(features, target)
+
+    coef, intercept = estimator.coef_, estimator.intercept_
+    if len(classes) == 2:
+        # Бинарная модель: sigmoid(w·x + b) == softmax([0, w·x + b])
+        coef = np.vstack([np.zeros_like(coef), coef])
+        intercept = np.concatenate([[0.0], intercept])
+    # Веса ненулевые только для встречавшихся n-грамм
+    model = CategoryModel(classes, sparse.csr_matrix(coef), intercept)
+
+    stored = db.query(FinanceCategoryModel).filter(FinanceCategoryModel.user_id == user_id).first()
+    if stored is None:
+        stored = FinanceCategoryModel(user_id=user_id, version=1)
+        db.add(stored)
+    else:
+        stored.version += 1
+    stored.classes = [list(c) for c in classes]
+    stored.weights = model.dump()
+    stored.samples = len(rows)
+    db.commit()
+
+    logger.info(f"Category model for user {user_id}: v{stored.version}, {len(rows)} samples, {len(classes)} classes")
+    return {"trained": True, "samples": len(rows), "classes": len(classes), "version": stored.version}
+
+
+class CategoryModelCache:
+    """LRU-кэш моделей; актуальность проверяется по версии в БД"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._lock = threading.Lock()
+        self._models: "OrderedDict[int, Tuple[int, CategoryModel]]" = OrderedDict()
+
+    def get(self, db: Session, user_id: int) -> Optional[CategoryModel]:
+        version = db.query(FinanceCategoryModel.version).filter(
+            FinanceCategoryModel.user_id == user_id
+        ).scalar()
+        if version is None:
+            return None
+
+        with self._lock:
+            cached = self._models.get(user_id)
+            if cached is not None and cached[0] == version:
+                self._models.move_to_end(user_id)
+                return cached[1]
+
+        stored = db.query(FinanceCategoryModel).filter(FinanceCategoryModel.user_id == user_id).first()
+        if stored is None:
+            return None
+        model = CategoryModel.load(stored.classes, stored.weights)
+
+        with self._lock:
+            self._models[user_id] = (stored.version, model)
+            self._models.move_to_end(user_id)
+            if len(self._models) > self.size:
+                self._models.popitem(last=False)
+        return model
+
+
+category_models = CategoryModelCache(settings.CATEGORY_MODEL_CACHE_SIZE)
+
+
+def categorize_batch(
+    items: Sequence[Tuple[str, str]],
+    db: Session,
+    user_id: int
+) -> List[Tuple[str, float]]:
+    """
+    Категоризировать пакет (описание, тип): правила по ключевым словам
+    и модель пользователя, побеждает более уверенный результат.
+
+    Returns:
+        list: [(category, confidence)] в порядке items
+    """
+    results = category_matcher.categorize_batch(items, db, user_id)
+
+    model = category_models.get(db, user_id)
+    if model is None:
+        return results
+
+    # Описания без текста модель не оценивает
+    indexes = [i for i, (description, _) in enumerate(items) if description]
+    predictions = model.predict([(f"{items[i][1]} {items[i][0]}", items[i][1]) for i in indexes])
+    for i, prediction in zip(indexes, predictions):
+        if prediction is not None and prediction[1] > results[i][1]:
+            results[i] = (prediction[0], round(prediction[1], 2))
+    return results
+
+
+async def schedule_training(user_id: int) -> None:
+    """Запланировать переобучение модели (не чаще раза в CATEGORY_MODEL_TRAIN_DELAY_SECONDS)"""
+    from app.tasks import schedule_debounced, train_category_model
+
+    await schedule_debounced(
+        train_category_model,
+        TRAIN_DEBOUNCE_KEY.format(user_id=user_id),
+        settings.CATEGORY_MODEL_TRAIN_DELAY_SECONDS,
+        user_id
+    )
@@ -0,0 +1,141 @@
+"""
+Потоковый экспорт финансовых записей в CSV и XLSX.
+
+Записи читаются серверным курсором пачками (yield_per), поэтому память
+не зависит от размера выгрузки. CSV отдаётся клиенту по мере чтения;
+XLSX собирается openpyxl в режиме write-only во временном файле (формат -
+zip-архив, который можно закрыть только после последней строки) и затем
+отдаётся частями.
+"""
+import codecs
+import csv
+import io
+import tempfile
+from datetime import date
+from typing import Any, Iterator, List, Optional, Tuple
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from sqlalchemy.orm import Session
+
+from app.database import SyncSessionLocal
+from app.models.finance import FinanceRecord
+
+EXPORT_BATCH_SIZE = 1000
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Заголовки совпадают с названиями колонок, которые понимает импорт
+EXPORT_COLUMNS = [
+    (FinanceRecord.date, 'Дата'),
+    (FinanceRecord.type, 'Тип'),
+    (FinanceRecord.amount, 'Сумма'),
+    (FinanceRecord.category, 'Категория'),
+    (FinanceRecord.subcategory, 'Подкатегория'),
+    (FinanceRecord.description, 'Описание'),
+    (FinanceRecord.counterparty, 'Контрагент'),
+    (FinanceRecord.counterparty_inn, 'ИНН контрагента'),
+    (FinanceRecord.payment_method, 'Способ оплаты'),
+    (FinanceRecord.account, 'Счёт'),
+    (FinanceRecord.notes, 'Заметки'),
+]
+
+TYPE_LABELS = {'income': 'доход', 'expense': 'расход'}
+
+# С этих символов Excel и LibreOffice начинают формулу
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def record_filters(
+    user_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    type: Optional[str] = None,
+    category: Optional[str] = None
+) -> List[Any]:
+    """Условия отбора записей (общие для списка и экспорта)"""
+    criteria = [FinanceRecord.user_id == user_id]
+    if start_date:
+        criteria.append(FinanceRecord.date >= start_date)
+    if end_date:
+        criteria.append(FinanceRecord.date <= end_date)
+    if type:
+        criteria.append(FinanceRecord.type == type)
+    if category:
+        criteria.append(FinanceRecord.category == category)
+    return criteria
+
+
+def iter_export_rows(db: Session, criteria: List[Any]) -> Iterator[Tuple]:
+    """Строки выгрузки по возрастанию даты; расходы - с минусом"""
+    query = db.query(*[column for column, _ in EXPORT_COLUMNS]).filter(*criteria).order_by(
+        FinanceRecord.date, FinanceRecord.id
+    ).yield_per(EXPORT_BATCH_SIZE)
+
+    for row in query:
+        day, transaction_type, amount, *rest = row
+        yield (day, TYPE_LABELS.get(transaction_type, transaction_type),
+               -amount if transaction_type == 'expense' else amount, *rest)
+
+
+def stream_csv(criteria: List[Any]) -> Iterator[bytes]:
+    """CSV для Excel: UTF-8 с BOM, разделитель ';'"""
+    db = SyncSessionLocal()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=';')
+        writer.writerow([title for _, title in EXPORT_COLUMNS])
+        yield codecs.BOM_UTF8 + _drain(buffer)
+
+        for count, row in enumerate(iter_export_rows(db, criteria), start=1):
+            writer.writerow([_csv_value(value) for value in row])
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield _drain(buffer)
+        yield _drain(buffer)
+    finally:
+        db.close()
+
+
+def stream_xlsx(criteria: List[Any]) -> Iterator[bytes]:
+    """XLSX одним листом; строки пишутся на диск, а не держатся в памяти"""
+    db = SyncSessionLocal()
+    try:
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Операции')
+        sheet.append([title for _, title in EXPORT_COLUMNS])
+        for row in iter_export_rows(db, criteria):
+            sheet.append([_xlsx_value(sheet, value) for value in row])
+    finally:
+        db.close()
+
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while chunk := file.read(STREAM_CHUNK_SIZE):
+            yield chunk
+
+
+def _is_formula(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(FORMULA_PREFIXES)
+
+
+def _csv_value(value: Any) -> Any:
+    """Текст, похожий на формулу, экранируется апострофом"""
+    if value is None:
+        return ''
+    return "'" + value if _is_formula(value) else value
+
+
+def _xlsx_value(sheet, value: Any) -> Any:
+    """Текст, похожий на формулу, записывается строковой ячейкой (openpyxl сделал бы из него формулу)"""
+    if not _is_formula(value):
+        return value
+    cell = WriteOnlyCell(sheet, value=value)
+    cell.data_type = 's'
+    return cell
+
+
+def _drain(buffer: io.StringIO) -> bytes:
+    data = buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+    return data
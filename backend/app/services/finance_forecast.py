@@ -0,0 +1,291 @@
+"""
+Прогноз денежного потока на N месяцев вперёд.
+
+Ряды доходов и расходов по полным месяцам берутся из дневного rollup.
+Каждый ряд прогнозируется несколькими моделями (среднее, сезонная наивная,
+экспоненциальное сглаживание с трендом), модели считаются векторно сразу
+для обоих рядов и всей сетки параметров, а лучшая выбирается по ошибке на
+последних месяцах истории. Регулярные платежи (подписки, аренда, зарплата)
+находятся отдельно и задают нижнюю границу прогноза.
+
+Прогноз кэшируется в процессе и пересчитывается только при изменении
+финансовых записей пользователя (по курсору изменений delta sync).
+"""
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import Float, cast, func
+from sqlalchemy.orm import Session
+
+from app.models.finance import FinanceRecord, FinanceDailyRollup
+from app.models.sync import SyncTombstone
+from app.schemas.finance import CashFlowForecast, MonthlyTrend, RecurringPayment
+from app.services.finance_anomalies import group_median
+
+MAX_HORIZON = 24
+HISTORY_MONTHS = 36
+SEASON = 12
+MIN_BACKTEST_MONTHS = 3
+
+# Сетка параметров сглаживания: уровень x тренд
+ALPHAS = np.array([0.1, 0.2, 0.3, 0.5, 0.7, 0.9])
+BETAS = np.array([0.0, 0.05, 0.1, 0.2])
+
+RECURRING_WINDOW = 6  # последние полные месяцы
+RECURRING_MIN_MONTHS = 4
+RECURRING_MAX_DEVIATION = 0.1  # MAD / медиана суммы
+
+CACHE_SIZE = 256
+
+SERIES = ('income', 'expense')
+
+
+def seasonal_naive(history: np.ndarray, horizon: int) -> np.ndarray:
+    """Значение того же месяца год назад; history: (ряды, месяцы)"""
+    last_season = history[:, -SEASON:]
+    return last_season[:, np.arange(horizon) % SEASON]
+
+
+def mean_forecast(history: np.ndarray, horizon: int) -> np.ndarray:
+    window = history[:, -SEASON:]
+    return np.repeat(window.mean(axis=1, keepdims=True), horizon, axis=1)
+
+
+def holt_forecast(history: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Экспоненциальное сглаживание с аддитивным трендом (Холт). Все комбинации
+    (alpha, beta) считаются одновременно, для каждого ряда выбирается
+    комбинация с минимальной ошибкой прогноза на шаг вперёд.
+    """
+    series, months = history.shape
+    alpha = np.repeat(ALPHAS, len(BETAS))[None, :]
+    beta = np.tile(BETAS, len(ALPHAS))[None, :]
+
+    level = np.repeat(history[:, :1], alpha.shape[1], axis=1)
+    trend = np.zeros_like(level)
+    errors = np.zeros_like(level)
+    for t in range(1, months):
+        observed = history[:, t:t + 1]
+        predicted = level + trend
+        errors += (observed - predicted) ** 2
+        new_level = alpha * observed + (1 - alpha) * predicted
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        level = new_level
+
+    best = errors.argmin(axis=1)
+    rows = np.arange(series)
+    steps = np.arange(1, horizon + 1)[None, :]
+    return level[rows, best][:, None] + trend[rows, best][:, None] * steps
+
+
+MODELS: Dict[str, Tuple[int, Callable[[np.ndarray, int], np.ndarray]]] = {
+    # название -> (минимум месяцев истории, модель)
+    'mean': (1, mean_forecast),
+    'holt': (4, holt_forecast),
+    'seasonal_naive': (SEASON, seasonal_naive),
+}
+
+
+def forecast_series(history: np.ndarray, horizon: int) -> Tuple[np.ndarray, List[str]]:
+    """
+    Прогноз рядов history (ряды, месяцы) на horizon месяцев.
+    Модель для каждого ряда выбирается по средней абсолютной ошибке
+    на последних месяцах истории.
+
+    Returns:
+        tuple: (прогноз (ряды, horizon), название модели для каждого ряда)
+    """
+    series, months = history.shape
+    holdout = max(MIN_BACKTEST_MONTHS, min(SEASON, months // 4))
+
+    candidates = []
+    for name, (min_months, model) in MODELS.items():
+        if months < min_months:
+            continue
+        if months - holdout >= min_months:
+            backtest = model(history[:, :-holdout], holdout)
+            error = np.abs(backtest - history[:, -holdout:]).mean(axis=1)
+        else:
+            error = np.full(series, np.inf)
+        candidates.append((name, error, model(history, horizon)))
+
+    errors = np.vstack([error for _, error, _ in candidates])
+    # При равных ошибках (или без возможности проверки) - более простая модель
+    best = np.where(np.isfinite(errors).any(axis=0), errors.argmin(axis=0), 0)
+    forecasts = np.stack([forecast for _, _, forecast in candidates])
+    result = np.maximum(forecasts[best, np.arange(series)], 0)
+    return result, [candidates[index][0] for index in best]
+
+
+def monthly_history(db: Session, user_id: int, first_month: date, last_month: date) -> np.ndarray:
+    """Суммы по полным месяцам из rollup: (доходы/расходы, месяцы)"""
+    start = np.datetime64(first_month, 'M')
+    months = (np.datetime64(last_month, 'M') - start).astype(int) + 1
+    history = np.zeros((len(SERIES), months))
+
+    rows = db.query(FinanceDailyRollup.type, FinanceDailyRollup.day, cast(FinanceDailyRollup.amount, Float)).filter(
+        FinanceDailyRollup.user_id == user_id,
+        FinanceDailyRollup.day >= first_month,
+        FinanceDailyRollup.day < last_month + relativedelta(months=1)
+    ).all()
+    if rows:
+        types, days, amounts = zip(*rows)
+        series = np.array([SERIES.index(t) if t in SERIES else -1 for t in types])
+        month = (np.array(days, dtype='datetime64[M]') - start).astype(int)
+        known = series >= 0
+        np.add.at(history, (series[known], month[known]), np.array(amounts, dtype=float)[known])
+    return history
+
+
+def find_recurring_payments(db: Session, user_id: int, last_month: date) -> List[RecurringPayment]:
+    """
+    Регулярные операции: один контрагент (или описание) в большинстве
+    последних месяцев с почти одинаковой суммой
+    """
+    first_month = last_month - relativedelta(months=RECURRING_WINDOW - 1)
+    key = func.lower(func.coalesce(func.nullif(FinanceRecord.counterparty, ''), FinanceRecord.description))
+    rows = db.query(key, FinanceRecord.type, FinanceRecord.date, cast(FinanceRecord.amount, Float)).filter(
+        FinanceRecord.user_id == user_id,
+        FinanceRecord.date >= first_month,
+        FinanceRecord.date < last_month + relativedelta(months=1),
+        key.isnot(None)
+    ).all()
+    if not rows:
+        return []
+
+    names, types, days, amounts = zip(*rows)
+    groups, codes = np.unique(
+        np.array([f"{t}\x1f{name.strip()}" for name, t in zip(names, types)], dtype=object),
+        return_inverse=True
+    )
+    month = (np.array(days, dtype='datetime64[M]') - np.datetime64(first_month, 'M')).astype(int)
+    amounts = np.array(amounts, dtype=float)
+
+    # Сумма группы по месяцам; регулярность - по числу месяцев с операциями
+    monthly = np.zeros((len(groups), RECURRING_WINDOW))
+    np.add.at(monthly, (codes, month), amounts)
+    present = monthly > 0
+    months_seen = present.sum(axis=1)
+
+    cell_codes, cell_months = np.nonzero(present)
+    cell_values = monthly[cell_codes, cell_months]
+    median = group_median(cell_codes, cell_values, len(groups))
+    deviation = group_median(cell_codes, np.abs(cell_values - median[cell_codes]), len(groups))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stable = deviation / median <= RECURRING_MAX_DEVIATION
+    # Платёж должен продолжаться: был в одном из двух последних месяцев
+    recurring = np.flatnonzero((months_seen >= RECURRING_MIN_MONTHS) & stable & present[:, -2:].any(axis=1))
+    recurring = recurring[np.argsort(-median[recurring], kind='stable')]
+
+    payments = []
+    for index in recurring:
+        transaction_type, name = groups[index].split('\x1f', 1)
+        payments.append(RecurringPayment(
+            name=name,
+            type=transaction_type,
+            amount=_money(median[index]),
+            months_seen=int(months_seen[index])
+        ))
+    return payments
+
+
+def _money(value: float) -> Decimal:
+    return Decimal(f"{value:.2f}")
+
+
+def build_forecast(db: Session, user_id: int, horizon: int = MAX_HORIZON, today: Optional[date] = None) -> CashFlowForecast:
+    """Прогноз с текущего месяца на horizon месяцев"""
+    today = today or date.today()
+    current_month = today.replace(day=1)
+    last_month = current_month - relativedelta(months=1)
+
+    first_day = db.query(func.min(FinanceDailyRollup.day)).filter(FinanceDailyRollup.user_id == user_id).scalar()
+    first_month = max(
+        (first_day or current_month).replace(day=1),
+        current_month - relativedelta(months=HISTORY_MONTHS)
+    )
+
+    if first_month > last_month:
+        # Нет ни одного полного месяца истории
+        history = np.zeros((len(SERIES), 0))
+        forecast, methods = np.zeros((len(SERIES), horizon)), ['none'] * len(SERIES)
+    else:
+        history = monthly_history(db, user_id, first_month, last_month)
+        forecast, methods = forecast_series(history, horizon)
+
+    recurring = find_recurring_payments(db, user_id, last_month)
+    for series, transaction_type in enumerate(SERIES):
+        floor = sum((float(p.amount) for p in recurring if p.type == transaction_type), 0.0)
+        forecast[series] = np.maximum(forecast[series], floor)
+
+    points = []
+    for step in range(horizon):
+        month_start = current_month + relativedelta(months=step)
+        income, expense = _money(forecast[0, step]), _money(forecast[1, step])
+        points.append(MonthlyTrend(
+            month=month_start.strftime('%Y-%m'),
+            period_start=month_start,
+            period_end=month_start + relativedelta(months=1) - timedelta(days=1),
+            income=income,
+            expense=expense,
+            net=income - expense
+        ))
+
+    return CashFlowForecast(
+        horizon=horizon,
+        history_months=history.shape[1],
+        methods=dict(zip(SERIES, methods)),
+        forecast=points,
+        recurring=recurring,
+        generated_at=datetime.now(timezone.utc)
+    )
+
+
+def data_version(db: Session, user_id: int) -> tuple:
+    """Версия финансовых данных пользователя: курсоры изменений записей и удалений"""
+    return (
+        db.query(func.max(FinanceRecord.change_seq)).filter(FinanceRecord.user_id == user_id).scalar(),
+        db.query(func.max(SyncTombstone.change_seq)).filter(
+            SyncTombstone.user_id == user_id,
+            SyncTombstone.entity == 'finance_record'
+        ).scalar(),
+    )
+
+
+class ForecastCache:
+    """LRU-кэш прогнозов; прогноз пересчитывается при новой версии данных или новом месяце"""
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._forecasts: "OrderedDict[int, Tuple[tuple, CashFlowForecast]]" = OrderedDict()
+
+    def get(self, db: Session, user_id: int, horizon: int) -> CashFlowForecast:
+        version = data_version(db, user_id) + (date.today().replace(day=1),)
+
+        with self._lock:
+            cached = self._forecasts.get(user_id)
+            if cached is not None and cached[0] == version:
+                self._forecasts.move_to_end(user_id)
+                forecast = cached[1]
+            else:
+                forecast = None
+
+        if forecast is None:
+            forecast = build_forecast(db, user_id, MAX_HORIZON)
+            with self._lock:
+                self._forecasts[user_id] = (version, forecast)
+                self._forecasts.move_to_end(user_id)
+                if len(self._forecasts) > self.size:
+                    self._forecasts.popitem(last=False)
+
+        return forecast.model_copy(update={'horizon': horizon, 'forecast': forecast.forecast[:horizon]})
+
+
+forecast_cache = ForecastCache()
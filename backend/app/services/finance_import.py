@@ -0,0 +1,367 @@
+"""Потоковый импорт финансовых записей пакетами"""
+import csv
+import hashlib
+import io
+import itertools
+import logging
+import zipfile
+from collections import Counter, OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from xml.etree.ElementTree import ParseError
+
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.finance import FinanceRecord
+from app.schemas.finance import CSVUploadResponse
+from app.services.budget_alerts import BudgetAlertEngine, expense_deltas
+from app.services.client_bank_exchange import is_client_bank_exchange, iter_client_bank_exchange_rows
+from app.services.counterparties import CounterpartyResolver
+from app.services.finance_classifier import categorize_batch
+from app.services.finance_service import FinanceService
+from app.services.statement_format import (
+    SAMPLE_ROWS,
+    StatementFormat,
+    find_header,
+    format_from_rows,
+    statement_format_detector,
+)
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 10
+HEADER_SEARCH_ROWS = 30
+OCCURRENCE_WINDOW_DATES = 7
+
+# Строка источника: (номер строки в файле, канонические поля, исходные данные)
+SourceRow = Tuple[int, Dict[str, str], str]
+
+
+def record_fingerprint(
+    record_date: date,
+    transaction_type: str,
+    amount: Decimal,
+    description: Optional[str],
+    account: Optional[str],
+    occurrence: int = 1
+) -> str:
+    """
+    Отпечаток импортированной операции. occurrence - номер повтора той же
+    операции в файле: две одинаковые покупки за день остаются двумя записями,
+    а при повторной загрузке выписки получают те же отпечатки.
+    """
+    signed = Decimal(amount).quantize(Decimal('0.01')) * (-1 if transaction_type == 'expense' else 1)
+    normalized = '\x1f'.join([
+        record_date.isoformat(),
+        str(signed),
+        ' '.join((description or '').lower().replace('ё', 'е').split()),
+        (account or '').strip().lower(),
+        str(occurrence),
+    ])
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def iter_csv_rows(stream: BinaryIO, statement_format: StatementFormat) -> Iterator[SourceRow]:
+    """Читать CSV из бинарного потока построчно, не загружая файл в память"""
+    # Кодировка определена по образцу начала файла: байт другой кодировки дальше
+    # не должен обрывать импорт после записанных пакетов (как в iter_client_bank_rows)
+    text = io.TextIOWrapper(stream, encoding=statement_format.encoding, errors='replace', newline='')
+    try:
+        reader = csv.reader(text, delimiter=statement_format.delimiter)
+        header = next(reader, [])
+        for row_num, values in enumerate(reader, start=2):  # start=2 т.к. 1-я строка - заголовки
+            if not any(v.strip() for v in values):
+                continue
+            raw = str(dict(zip(header, values)))
+            yield row_num, statement_format.normalize_row(values), raw
+    finally:
+        # Поток принадлежит вызывающему коду
+        text.detach()
+
+
+def _cell_text(value: Any, decimal_separator: Optional[str] = '.') -> str:
+    """
+    Значение ячейки как текст строки выписки. Числа выводятся с десятичным
+    разделителем текстовых сумм листа (None - не выводятся: при определении
+    формата по образцу учитываются только текстовые ячейки).
+    """
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        if decimal_separator is None:
+            return ''
+        return f"{round(value, 2)}".replace('.', decimal_separator)
+    return str(value)
+
+
+def _find_sheet_header(sheet) -> Optional[Tuple[Iterator[tuple], List[tuple], int]]:
+    """Строка заголовков среди первых HEADER_SEARCH_ROWS строк листа: (остаток строк, голова, индекс)"""
+    rows = sheet.iter_rows(values_only=True)
+    head = list(itertools.islice(rows, HEADER_SEARCH_ROWS))
+    header_index = find_header([[_cell_text(value) for value in row] for row in head])
+    if header_index is None:
+        return None
+    return rows, head, header_index
+
+
+def _iter_sheet_rows(sheet, rows: Iterator[tuple], head: List[tuple], header_index: int) -> Iterator[SourceRow]:
+    header = [_cell_text(value) for value in head[header_index]]
+    # Образец для определения форматов даты и суммы: остаток головы + следующие строки
+    buffered = head[header_index + 1:] + list(itertools.islice(rows, SAMPLE_ROWS))
+    statement_format = format_from_rows(
+        header, [[_cell_text(value, None) for value in row] for row in buffered]
+    )
+
+    for row_num, row in enumerate(itertools.chain(buffered, rows), start=header_index + 2):
+        values = [_cell_text(value, statement_format.decimal_separator) for value in row]
+        if not any(v.strip() for v in values):
+            continue
+        raw = f"{sheet.title}: {dict(zip(header, values))}"
+        yield row_num, statement_format.normalize_row(values), raw
+
+
+def _iter_workbook_rows(workbook, sheets: List[Any], first: Tuple[Any, ...]) -> Iterator[SourceRow]:
+    try:
+        yield from _iter_sheet_rows(*first)
+        for sheet in sheets:
+            found = _find_sheet_header(sheet)
+            if found is not None:
+                yield from _iter_sheet_rows(sheet, *found)
+    finally:
+        workbook.close()
+
+
+def iter_xlsx_rows(stream: BinaryIO) -> Iterator[SourceRow]:
+    """
+    Читать XLSX потоково (openpyxl read-only): все листы, на каждом строка
+    заголовков ищется среди первых HEADER_SEARCH_ROWS строк. Листы без
+    колонок даты и суммы пропускаются.
+
+    Книга открывается и первый лист с заголовками находится сразу, а не
+    при первом чтении строк: ValueError, если файл не XLSX или ни на одном
+    листе нет колонок даты и суммы.
+    """
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        raise ValueError(f"Файл не является книгой XLSX: {e}") from e
+
+    try:
+        sheets = iter(workbook.worksheets)
+        for sheet in sheets:
+            found = _find_sheet_header(sheet)
+            if found is not None:
+                return _iter_workbook_rows(workbook, list(sheets), (sheet, *found))
+    except (zipfile.BadZipFile, KeyError, ParseError) as e:
+        workbook.close()
+        raise ValueError(f"Повреждённая книга XLSX: {e}") from e
+
+    workbook.close()
+    raise ValueError("Ни на одном листе не найдены колонки даты и суммы")
+
+
+def statement_rows(stream: BinaryIO, file_name: str) -> Iterator[SourceRow]:
+    """
+    Строки выписки: XLSX по расширению, формат обмена 1С по заголовку
+    файла, остальное - CSV. Формат определяется сразу: ValueError,
+    если файл не распознан.
+    """
+    if file_name.lower().endswith('.xlsx'):
+        return iter_xlsx_rows(stream)
+
+    position = stream.tell()
+    sample = stream.read(64)
+    stream.seek(position)
+    if is_client_bank_exchange(sample):
+        return iter_client_bank_exchange_rows(stream)
+
+    return iter_csv_rows(stream, statement_format_detector.detect(stream))
+
+
+class OccurrenceCounter:
+    """
+    Номера повторов операций в файле. Выписки упорядочены по дате, поэтому
+    счётчики хранятся только для OCCURRENCE_WINDOW_DATES последних дат:
+    память зависит от числа операций за день, а не от размера файла.
+    Небольшой беспорядок дат (дата проводки и дата валютирования) окно
+    выдерживает.
+    """
+
+    def __init__(self, window: int = OCCURRENCE_WINDOW_DATES):
+        self.window = window
+        self._by_date: "OrderedDict[date, Counter]" = OrderedDict()
+        self._dropped: Set[date] = set()
+
+    def next(self, record_date: date, base: str) -> int:
+        """Номер очередного повтора операции с отпечатком base (с 1)"""
+        counter = self._by_date.get(record_date)
+        if counter is None:
+            if record_date in self._dropped:
+                # Дата вернулась после выхода из окна: номера повторов начнутся заново
+                logger.warning(f"Statement is not ordered by date: {record_date} appears again")
+                self._dropped.discard(record_date)
+            counter = self._by_date[record_date] = Counter()
+            if len(self._by_date) > self.window:
+                dropped, _ = self._by_date.popitem(last=False)
+                self._dropped.add(dropped)
+        else:
+            self._by_date.move_to_end(record_date)
+        counter[base] += 1
+        return counter[base]
+
+
+class FinanceImportPipeline:
+    """
+    Пакетный импорт: строки разбираются и категоризируются пачками
+    и записываются многострочными INSERT, так что память не зависит
+    от размера файла.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        user_id: int,
+        source_file: str,
+        batch_size: int = IMPORT_BATCH_SIZE,
+        on_progress: Optional[Callable[["FinanceImportPipeline"], None]] = None
+    ):
+        self.db = db
+        self.user_id = user_id
+        self.source_file = source_file
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.alert_engine = BudgetAlertEngine(db)
+        # Кэш контрагентов на весь импорт: каждый встречается в БД один раз
+        self.counterparties = CounterpartyResolver(db, user_id)
+
+        self.rows_processed = 0
+        self.records_created = 0
+        self.records_failed = 0
+        self.records_skipped = 0
+        self.errors: List[str] = []
+        # Сколько раз операция уже встретилась в файле (по отпечатку без номера повтора)
+        self._occurrences = OccurrenceCounter()
+
+    def run(self, rows: Iterable[SourceRow], skip_rows: int = 0) -> None:
+        """
+        Обработать все строки источника. Первые skip_rows строк уже
+        импортированы (продолжение с контрольной точки): они только
+        разбираются, чтобы восстановить счётчики повторов операций.
+        """
+        rows = iter(rows)
+        for _, row, _ in itertools.islice(rows, skip_rows):
+            record_data = FinanceService.parse_csv_row(row, categorize=False)
+            if record_data:
+                self._occurrences.next(record_data.date, self._base_fingerprint(record_data))
+
+        batch: List[SourceRow] = []
+        for source_row in rows:
+            batch.append(source_row)
+            if len(batch) >= self.batch_size:
+                self._process_batch(batch)
+                batch = []
+        if batch:
+            self._process_batch(batch)
+
+    def _fail(self, row_num: int, message: str) -> None:
+        self.records_failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Строка {row_num}: {message}")
+
+    @staticmethod
+    def _base_fingerprint(record_data) -> str:
+        return record_fingerprint(
+            record_data.date, record_data.type, record_data.amount,
+            record_data.description, record_data.account, occurrence=0
+        )
+
+    def _process_batch(self, batch: List[SourceRow]) -> None:
+        parsed = []
+        for row_num, row, raw in batch:
+            record_data = FinanceService.parse_csv_row(row, categorize=False)
+            if not record_data:
+                self._fail(row_num, "не удалось распарсить данные")
+                continue
+            parsed.append((record_data, raw))
+
+        # Автоматическая категоризация всего пакета за один вызов (правила + модель пользователя)
+        categories = categorize_batch(
+            [(record_data.description or '', record_data.type) for record_data, _ in parsed],
+            db=self.db,
+            user_id=self.user_id
+        )
+
+        counterparty_ids = self.counterparties.resolve_batch(
+            [(record_data.counterparty, record_data.counterparty_inn) for record_data, _ in parsed]
+        )
+
+        values = []
+        for (record_data, raw), (ai_category, ai_confidence), counterparty_id in zip(
+            parsed, categories, counterparty_ids
+        ):
+            occurrence = self._occurrences.next(record_data.date, self._base_fingerprint(record_data))
+            values.append({
+                "user_id": self.user_id,
+                "date": record_data.date,
+                "description": record_data.description,
+                "amount": record_data.amount,
+                "category": record_data.category or ai_category,
+                "type": record_data.type,
+                "counterparty": record_data.counterparty,
+                "counterparty_inn": record_data.counterparty_inn,
+                "counterparty_id": counterparty_id,
+                "payment_method": record_data.payment_method,
+                "account": record_data.account,
+                "source_file": self.source_file,
+                "raw_data": raw,
+                "ai_category": ai_category,
+                "ai_confidence": float(ai_confidence),
+                "is_verified": False,
+                "fingerprint": record_fingerprint(
+                    record_data.date, record_data.type, record_data.amount,
+                    record_data.description, record_data.account, occurrence
+                ),
+            })
+
+        if values:
+            # Уже загруженные операции пропускаются индексом, без поиска по каждой строке
+            table = FinanceRecord.__table__
+            statement = insert(table).on_conflict_do_nothing(
+                index_elements=[table.c.user_id, table.c.fingerprint]
+            ).returning(table.c.date, table.c.type, table.c.category, table.c.amount)
+            inserted = self.db.execute(statement, values).mappings().all()
+
+            self.records_created += len(inserted)
+            self.records_skipped += len(values) - len(inserted)
+            self.alert_engine.apply(
+                self.user_id,
+                [delta for row in inserted for delta in expense_deltas(dict(row))]
+            )
+
+        self.rows_processed += len(batch)
+        logger.info(
+            f"Import {self.source_file}: {self.rows_processed} rows processed, "
+            f"{self.records_created} created, {self.records_skipped} skipped, {self.records_failed} failed"
+        )
+        if self.on_progress:
+            self.on_progress(self)
+
+    def result(self) -> CSVUploadResponse:
+        return CSVUploadResponse(
+            success=self.records_created > 0 or self.records_skipped > 0,
+            records_created=self.records_created,
+            records_failed=self.records_failed,
+            records_skipped=self.records_skipped,
+            errors=self.errors,
+            file_name=self.source_file
+        )
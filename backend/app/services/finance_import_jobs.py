@@ -0,0 +1,281 @@
+"""
+Импорт больших выписок фоновой задачей.
+
+Файл загружается частями: каждая часть отправляется со смещением и
+дописывается в файл на локальном диске, подтверждённый размер хранится в
+задаче импорта, поэтому прерванную загрузку можно продолжить с этого
+смещения. Смещение сдвигается условным UPDATE (compare-and-set), так что
+из конкурирующих частей с одним смещением принимается одна. Когда файл получен целиком, импорт выполняет Celery-задача.
+После каждого пакета записи и прогресс (число обработанных строк выписки)
+фиксируются одной транзакцией, так что после падения воркера импорт
+продолжается с контрольной точки без повторов и пропусков.
+
+Задачу обрабатывает один воркер: он захватывает её, переводя в статус
+processing, и каждым пакетом обновляет updated_at. Задача без обновлений
+дольше IMPORT_JOB_STALE_SECONDS считается брошенной и может быть захвачена
+снова (периодической задачей resume_stalled_imports).
+"""
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import closing
+from datetime import timedelta
+from typing import AsyncIterator, BinaryIO, List, Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models.finance import FinanceImportJob
+from app.rate_limit import import_rows_quota
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_EXTENSIONS = ('.csv', '.xlsx', '.txt')
+SPOOL_WRITE_BYTES = 1024 * 1024
+
+
+def upload_path(job_id: int) -> str:
+    return os.path.join(settings.IMPORT_UPLOAD_DIR, f"{job_id}.part")
+
+
+def _remove_upload(job_id: int) -> None:
+    try:
+        os.remove(upload_path(job_id))
+    except FileNotFoundError:
+        pass
+
+
+def create_job(db: Session, user_id: int, file_name: str, total_size: int) -> FinanceImportJob:
+    """Начать загрузку: задача в статусе uploading и пустой файл"""
+    job = FinanceImportJob(
+        user_id=user_id,
+        file_name=file_name,
+        status='uploading',
+        total_size=total_size,
+        received_size=0,
+        errors=[]
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    os.makedirs(settings.IMPORT_UPLOAD_DIR, exist_ok=True)
+    open(upload_path(job.id), 'wb').close()
+    return job
+
+
+def get_job(db: Session, user_id: int, job_id: int) -> Optional[FinanceImportJob]:
+    return db.query(FinanceImportJob).filter(
+        FinanceImportJob.id == job_id,
+        FinanceImportJob.user_id == user_id
+    ).first()
+
+
+async def receive_chunk(
+    db: Session,
+    job: FinanceImportJob,
+    offset: int,
+    chunks: AsyncIterator[bytes]
+) -> Optional[FinanceImportJob]:
+    """
+    Принять часть файла со смещения offset. Тело части читается во временный
+    файл без блокировок; затем смещение задачи переводится с offset на
+    offset + размер условным UPDATE, и только выигравший запрос дописывает
+    часть в файл загрузки. Последняя часть переводит задачу в очередь.
+
+    Returns:
+        FinanceImportJob или None, если offset уже не совпадает с полученным размером
+
+    Raises:
+        ValueError: часть больше IMPORT_CHUNK_MAX_BYTES или выходит за размер файла
+    """
+    with tempfile.TemporaryFile(dir=settings.IMPORT_UPLOAD_DIR) as spool:
+        size = 0
+        buffer = bytearray()
+        async for data in chunks:
+            size += len(data)
+            if size > settings.IMPORT_CHUNK_MAX_BYTES:
+                raise ValueError(f"Часть больше {settings.IMPORT_CHUNK_MAX_BYTES} байт")
+            if offset + size > job.total_size:
+                raise ValueError("Часть выходит за объявленный размер файла")
+            buffer += data
+            if len(buffer) >= SPOOL_WRITE_BYTES:
+                await run_in_threadpool(spool.write, bytes(buffer))
+                buffer.clear()
+        await run_in_threadpool(spool.write, bytes(buffer))
+
+        accepted = await run_in_threadpool(_append_chunk, db, job, offset, size, spool)
+
+    if accepted and job.status == 'queued':
+        enqueue_job(job.id)
+    return job if accepted else None
+
+
+def _append_chunk(db: Session, job: FinanceImportJob, offset: int, size: int, spool: BinaryIO) -> bool:
+    """
+    Сдвинуть подтверждённое смещение и дописать часть. Конкурирующий запрос
+    с тем же смещением ждёт строку задачи только на время копирования и
+    получает 0 строк. Хвост прерванной части (записанный, но не
+    подтверждённый) отбрасывается.
+    """
+    received_size = offset + size
+    advanced = db.execute(
+        update(FinanceImportJob)
+        .where(
+            FinanceImportJob.id == job.id,
+            FinanceImportJob.status == 'uploading',
+            FinanceImportJob.received_size == offset
+        )
+        .values(
+            received_size=received_size,
+            status='queued' if received_size == job.total_size else 'uploading',
+            updated_at=func.now()
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not advanced:
+        db.rollback()
+        return False
+
+    try:
+        spool.seek(0)
+        with open(upload_path(job.id), 'r+b') as file:
+            file.truncate(offset)
+            file.seek(offset)
+            shutil.copyfileobj(spool, file)
+            file.flush()
+            os.fsync(file.fileno())
+    except BaseException:
+        db.rollback()
+        raise
+
+    # Смещение фиксируется только после записи части на диск
+    db.commit()
+    db.refresh(job)
+    return True
+
+
+def enqueue_job(job_id: int) -> None:
+    from app.tasks import import_finance_statement
+
+    try:
+        import_finance_statement.delay(job_id)
+    except Exception as e:
+        # Задача останется в очереди и будет запущена resume_stalled_imports
+        logger.warning(f"Failed to enqueue finance import {job_id}: {e}")
+
+
+def claim_job(db: Session, job_id: int) -> Optional[FinanceImportJob]:
+    """Захватить задачу для обработки: новую или брошенную другим воркером"""
+    stale_before = func.now() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS)
+    claimed = db.execute(
+        update(FinanceImportJob)
+        .where(
+            FinanceImportJob.id == job_id,
+            or_(
+                FinanceImportJob.status == 'queued',
+                and_(FinanceImportJob.status == 'processing', FinanceImportJob.updated_at < stale_before)
+            )
+        )
+        .values(status='processing', updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return db.get(FinanceImportJob, job_id) if claimed else None
+
+
+def _save_progress(db: Session, job: FinanceImportJob, pipeline) -> None:
+    """Контрольная точка: фиксируется вместе с записями только что обработанного пакета"""
+    rows = pipeline.rows_processed - job.rows_processed
+    job.rows_processed = pipeline.rows_processed
+    job.records_created = pipeline.records_created
+    job.records_failed = pipeline.records_failed
+    job.records_skipped = pipeline.records_skipped
+    job.errors = list(pipeline.errors)
+    db.commit()
+    import_rows_quota.charge_sync(job.user_id, rows)
+
+
+def _finish(db: Session, job: FinanceImportJob, status: str, error: Optional[str] = None) -> None:
+    job.status = status
+    job.error = error
+    db.commit()
+    _remove_upload(job.id)
+
+
+def run_import_job(db: Session, job_id: int) -> Optional[FinanceImportJob]:
+    """
+    Выполнить (или продолжить с контрольной точки) импорт задачи.
+
+    Returns:
+        FinanceImportJob или None, если задача уже обрабатывается или завершена
+    """
+    from app.services.finance_import import FinanceImportPipeline, statement_rows
+
+    job = claim_job(db, job_id)
+    if job is None:
+        return None
+
+    pipeline = FinanceImportPipeline(
+        db, job.user_id, job.file_name,
+        on_progress=lambda current: _save_progress(db, job, current)
+    )
+    pipeline.rows_processed = job.rows_processed
+    pipeline.records_created = job.records_created
+    pipeline.records_failed = job.records_failed
+    pipeline.records_skipped = job.records_skipped
+    pipeline.errors = list(job.errors or [])
+
+    if job.rows_processed:
+        logger.info(f"Resuming finance import {job.id} from row {job.rows_processed}")
+
+    try:
+        with open(upload_path(job.id), 'rb') as file, closing(statement_rows(file, job.file_name)) as rows:
+            pipeline.run(rows, skip_rows=job.rows_processed)
+    except ValueError as e:
+        # Формат не распознан: повтор не поможет
+        db.rollback()
+        _finish(db, job, 'failed', f"Не удалось определить формат файла: {str(e)}")
+        return job
+    except Exception:
+        # Незафиксированный пакет откатывается; задача снова доступна для захвата
+        db.rollback()
+        job.status = 'queued'
+        db.commit()
+        raise
+
+    _finish(db, job, 'completed')
+    return job
+
+
+def fail_job(db: Session, job_id: int, error: str) -> None:
+    job = db.get(FinanceImportJob, job_id)
+    if job is not None and job.status != 'completed':
+        _finish(db, job, 'failed', error)
+
+
+def resume_stalled_jobs(db: Session) -> List[int]:
+    """
+    Вернуть в работу задачи, брошенные воркером или не попавшие в очередь,
+    и закрыть загрузки, не завершённые за IMPORT_UPLOAD_TTL_HOURS.
+
+    Returns:
+        list: id задач, которые нужно запустить снова
+    """
+    stale_before = func.now() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS)
+    stalled = [job_id for (job_id,) in db.query(FinanceImportJob.id).filter(
+        FinanceImportJob.status.in_(('queued', 'processing')),
+        FinanceImportJob.updated_at < stale_before
+    ).all()]
+
+    abandoned = db.query(FinanceImportJob).filter(
+        FinanceImportJob.status == 'uploading',
+        FinanceImportJob.updated_at < func.now() - timedelta(hours=settings.IMPORT_UPLOAD_TTL_HOURS)
+    ).all()
+    for job in abandoned:
+        _finish(db, job, 'failed', "Загрузка файла не завершена")
+
+    return stalled
@@ -0,0 +1,170 @@
+"""
+Финансовые AI-инсайты: реестр правил и предрассчитанные результаты.
+
+Правила регистрируются декоратором `insight_rule` и получают общий
+контекст с лениво вычисляемыми данными (сводка, денежный поток), так что
+новое правило не добавляет запросов к уже используемым данным. Инсайты
+считаются в Celery после изменения данных (с задержкой) и ночью, а
+запрос /finance/insights читает сохранённый результат.
+"""
+import logging
+from datetime import date, datetime, timedelta, timezone
+from functools import cached_property
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.finance import FinanceInsightSnapshot
+from app.schemas.finance import AIInsight, CashFlowData, FinanceInsights, FinanceSummary
+from app.services import finance_anomalies
+from app.services.finance_service import FinanceService
+
+logger = logging.getLogger(__name__)
+
+REFRESH_DEBOUNCE_KEY = "finance:insights:refresh:{user_id}"
+
+PRIORITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+
+
+class InsightContext:
+    """Данные пользователя для правил; каждое значение вычисляется один раз"""
+
+    def __init__(self, db: Session, user_id: int, today: Optional[date] = None):
+        self.db = db
+        self.user_id = user_id
+        self.today = today or date.today()
+
+    @cached_property
+    def summary_90d(self) -> FinanceSummary:
+        return FinanceService.get_summary(self.db, self.user_id, self.today - timedelta(days=90), self.today)
+
+    @cached_property
+    def cash_flow_3m(self) -> CashFlowData:
+        return FinanceService.get_cash_flow(self.db, self.user_id, months=3, end_date=self.today)
+
+
+InsightRule = Callable[[InsightContext], Iterable[AIInsight]]
+
+INSIGHT_RULES: Dict[str, InsightRule] = {}
+
+
+def insight_rule(name: str) -> Callable[[InsightRule], InsightRule]:
+    """Зарегистрировать правило инсайтов"""
+    def register(rule: InsightRule) -> InsightRule:
+        INSIGHT_RULES[name] = rule
+        return rule
+    return register
+
+
+@insight_rule("negative_cash_flow")
+def negative_cash_flow(ctx: InsightContext) -> Iterable[AIInsight]:
+    summary = ctx.summary_90d
+    if summary.net_income < 0:
+        yield AIInsight(
+            type="warning",
+            title="Отрицательный денежный поток",
+            description=f"За последние 3 месяца расходы превысили доходы на {abs(summary.net_income):,.2f} ₽",
+            priority="high",
+            amount=abs(summary.net_income)
+        )
+
+
+@insight_rule("top_expense_category")
+def top_expense_category(ctx: InsightContext) -> Iterable[AIInsight]:
+    if not ctx.summary_90d.expense_by_category:
+        return
+    top_expense = ctx.summary_90d.expense_by_category[0]
+    if top_expense.percentage > 30:
+        yield AIInsight(
+            type="tip",
+            title=f"Высокие расходы на {top_expense.category}",
+            description=f"Эта категория составляет {top_expense.percentage:.1f}% всех расходов. Рассмотрите возможность оптимизации.",
+            priority="medium",
+            category=top_expense.category,
+            amount=top_expense.amount
+        )
+
+
+@insight_rule("income_growth")
+def income_growth(ctx: InsightContext) -> Iterable[AIInsight]:
+    trends = ctx.cash_flow_3m.monthly_trends
+    if len(trends) < 2:
+        return
+    last_month, prev_month = trends[-1], trends[-2]
+    growth = ((last_month.income - prev_month.income) / prev_month.income * 100) if prev_month.income > 0 else 0
+    if growth > 10:
+        yield AIInsight(
+            type="opportunity",
+            title="Рост доходов",
+            description=f"Доходы выросли на {growth:.1f}% по сравнению с прошлым месяцем!",
+            priority="low",
+            amount=last_month.income - prev_month.income
+        )
+
+
+@insight_rule("amount_outliers")
+def amount_outliers(ctx: InsightContext) -> Iterable[AIInsight]:
+    return finance_anomalies.find_amount_outliers(ctx.db, ctx.user_id, ctx.today)
+
+
+@insight_rule("category_spikes")
+def category_spikes(ctx: InsightContext) -> Iterable[AIInsight]:
+    return finance_anomalies.find_category_spikes(ctx.db, ctx.user_id, ctx.today)
+
+
+@insight_rule("new_counterparties")
+def new_counterparties(ctx: InsightContext) -> Iterable[AIInsight]:
+    return finance_anomalies.find_new_counterparties(ctx.db, ctx.user_id, ctx.today)
+
+
+def compute_insights(db: Session, user_id: int, today: Optional[date] = None) -> FinanceInsights:
+    """Выполнить все зарегистрированные правила"""
+    ctx = InsightContext(db, user_id, today)
+    insights: List[AIInsight] = []
+    for name, rule in INSIGHT_RULES.items():
+        try:
+            insights.extend(rule(ctx))
+        except Exception as e:
+            # Ошибка одного правила не должна лишать пользователя остальных инсайтов
+            logger.exception(f"Insight rule {name} failed for user {user_id}: {e}")
+
+    insights.sort(key=lambda insight: PRIORITY_ORDER.get(insight.priority, len(PRIORITY_ORDER)))
+    return FinanceInsights(insights=insights, generated_at=datetime.now(timezone.utc))
+
+
+def refresh_insights(db: Session, user_id: int) -> FinanceInsights:
+    """Пересчитать и сохранить инсайты пользователя"""
+    result = compute_insights(db, user_id)
+
+    snapshot = db.query(FinanceInsightSnapshot).filter(FinanceInsightSnapshot.user_id == user_id).first()
+    if snapshot is None:
+        snapshot = FinanceInsightSnapshot(user_id=user_id)
+        db.add(snapshot)
+    snapshot.insights = [insight.model_dump(mode="json") for insight in result.insights]
+    snapshot.generated_at = result.generated_at
+    db.commit()
+    return result
+
+
+def get_stored_insights(db: Session, user_id: int) -> Optional[FinanceInsights]:
+    """Сохранённые инсайты или None, если они ещё не рассчитывались"""
+    snapshot = db.query(FinanceInsightSnapshot).filter(FinanceInsightSnapshot.user_id == user_id).first()
+    if snapshot is None:
+        return None
+    return FinanceInsights(
+        insights=[AIInsight(**insight) for insight in snapshot.insights],
+        generated_at=snapshot.generated_at
+    )
+
+
+async def schedule_refresh(user_id: int) -> None:
+    """Запланировать пересчёт инсайтов после изменения данных"""
+    from app.config import settings
+    from app.tasks import refresh_finance_insights, schedule_debounced
+
+    await schedule_debounced(
+        refresh_finance_insights,
+        REFRESH_DEBOUNCE_KEY.format(user_id=user_id),
+        settings.INSIGHTS_REFRESH_DELAY_SECONDS,
+        user_id
+    )
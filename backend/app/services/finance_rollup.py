@@ -0,0 +1,33 @@
+"""
+Дневные агрегаты финансовых записей (finance_daily_rollup).
+
+Таблица обновляется триггером в той же транзакции, что и запись в
+finance_records (включая пакетный импорт и COPY), поэтому аналитика
+читает агрегаты вместо исходных транзакций. Полная перестройка нужна
+только для первичного заполнения или после ручных правок данных.
+"""
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.database import sync_engine
+
+
+def rebuild_rollup(user_id: Optional[int] = None) -> int:
+    """Пересчитать агрегаты (для пользователя или для всех). Возвращает число строк."""
+    user_filter = "WHERE user_id = :user_id" if user_id is not None else ""
+    params = {"user_id": user_id} if user_id is not None else {}
+
+    with sync_engine.begin() as conn:
+        # Блокирует запись в finance_records до конца пересчёта, чтобы
+        # дельты триггера не смешались с пересчитанными значениями
+        conn.execute(text("LOCK TABLE finance_records IN SHARE MODE"))
+        conn.execute(text(f"DELETE FROM finance_daily_rollup {user_filter}"), params)
+        result = conn.execute(text(f"""
+            INSERT INTO finance_daily_rollup (user_id, day, type, category, amount, count)
+            SELECT user_id, date, type, coalesce(category, ''), sum(amount), count(*)
+            FROM finance_records
+            {user_filter}
+            GROUP BY user_id, date, type, coalesce(category, '')
+        """), params)
+        return result.rowcount
@@ -1,14 +1,12 @@
 """Сервис для работы с финансами"""
-import csv
-import io
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, BinaryIO, Callable
 from datetime import datetime, date, timedelta
 from decimal import Decimal
+from dateutil.relativedelta import relativedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, extract
-from collections import defaultdict
+from sqlalchemy import func, and_, case, column, values, Integer, String, Date
 
-from app.models.finance import FinanceRecord, FinanceBudget, FinanceGoal
+from app.models.finance import FinanceRecord, FinanceBudget, FinanceGoal, FinanceDailyRollup
 from app.schemas.finance import (
     FinanceRecordCreate,
     FinanceRecordUpdate,
@@ -18,7 +16,6 @@ from app.schemas.finance import (
     MonthlyTrend,
     CashFlowData,
     BudgetStatus,
-    AIInsight,
     FinanceInsights,
     FinanceBudgetCreate,
     FinanceBudgetUpdate,
@@ -27,6 +24,70 @@ from app.schemas.finance import (
 )
 
 
+MAX_CASH_FLOW_BUCKETS = 1000
+
+_BUCKET_STEPS = {
+    'week': relativedelta(weeks=1),
+    'month': relativedelta(months=1),
+    'quarter': relativedelta(months=3),
+}
+
+
+def _bucket_start(day: date, period: str) -> date:
+    """Начало календарного периода (как date_trunc в Postgres)"""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'quarter':
+        return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+    return day.replace(day=1)
+
+
+def _calendar_buckets(start_date: date, end_date: date, period: str) -> List[tuple]:
+    """
+    Периоды [(начало периода, первый день, последний день)], покрывающие диапазон;
+    крайние периоды обрезаются по границам диапазона
+    """
+    buckets = []
+    current = _bucket_start(start_date, period)
+    while current <= end_date and len(buckets) <= MAX_CASH_FLOW_BUCKETS:
+        next_start = current + _BUCKET_STEPS[period]
+        buckets.append((current, max(current, start_date), min(next_start - timedelta(days=1), end_date)))
+        current = next_start
+    return buckets
+
+
+def budget_window(budget: FinanceBudget, today: date) -> tuple:
+    """
+    Текущее окно бюджета: месяц (или год), отсчитываемый от start_date
+    и содержащий сегодняшний день (или end_date, если бюджет уже закончился)
+    """
+    step = relativedelta(years=1) if budget.period == 'yearly' else relativedelta(months=1)
+    reference = min(today, budget.end_date) if budget.end_date else today
+
+    steps = 0
+    if reference > budget.start_date:
+        elapsed = relativedelta(reference, budget.start_date)
+        steps = elapsed.years if budget.period == 'yearly' else elapsed.years * 12 + elapsed.months
+        # Окно, начинающееся с конца короткого месяца (31 -> 28), может закончиться раньше
+        if budget.start_date + step * (steps + 1) <= reference:
+            steps += 1
+
+    window_start = budget.start_date + step * steps
+    window_end = budget.start_date + step * (steps + 1) - timedelta(days=1)
+    if budget.end_date:
+        window_end = min(window_end, budget.end_date)
+    return window_start, window_end
+
+
+def _bucket_label(bucket_start: date, period: str) -> str:
+    if period == 'week':
+        year, week, _ = bucket_start.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == 'quarter':
+        return f"{bucket_start.year}-Q{(bucket_start.month - 1) // 3 + 1}"
+    return f"{bucket_start.year}-{bucket_start.month:02d}"
+
+
 class FinanceService:
     """Сервис для работы с финансовыми данными"""
 
@@ -60,25 +121,18 @@ class FinanceService:
     def categorize_transaction(description: str, transaction_type: str) -> tuple[str, float]:
         """
         Автоматическая категоризация транзакции на основе описания
+        (только встроенные правила; с учётом правил пользователя -
+        category_matcher.categorize_batch)
         
         Returns:
             tuple: (category, confidence)
         """
-        if not description:
-            return ("Без категории", 0.0)
-
-        description_lower = description.lower()
-        categories = FinanceService.EXPENSE_CATEGORIES if transaction_type == "expense" else FinanceService.INCOME_CATEGORIES
-
-        # Простая эвристика: ищем ключевые слова
-        for keyword, category in categories.items():
-            if keyword in description_lower:
-                return (category, 0.8)
+        from app.services.finance_categorizer import category_matcher
 
-        return ("Прочее", 0.5)
+        return category_matcher.categorize(description, transaction_type)
 
     @staticmethod
-    def parse_csv_row(row: Dict[str, str]) -> Optional[FinanceRecordCreate]:
+    def parse_csv_row(row: Dict[str, str], categorize: bool = True) -> Optional[FinanceRecordCreate]:
         """
         Парсинг строки CSV в FinanceRecordCreate
         
@@ -116,7 +170,8 @@ class FinanceService:
             category = row.get('category', row.get('Категория', ''))
 
             # Автоматическая категоризация, если категория не указана
-            if not category:
+            # (при пакетном импорте выполняется отдельно, сразу для всего пакета)
+            if not category and categorize:
                 category, _ = FinanceService.categorize_transaction(description, transaction_type)
 
             return FinanceRecordCreate(
@@ -126,6 +181,7 @@ class FinanceService:
                 category=category,
                 type=transaction_type,
                 counterparty=row.get('counterparty', row.get('Контрагент', '')),
+                counterparty_inn=row.get('counterparty_inn') or None,
                 payment_method=row.get('payment_method', row.get('Способ оплаты', '')),
                 account=row.get('account', row.get('Счёт', '')),
             )
@@ -134,72 +190,37 @@ class FinanceService:
             return None
 
     @staticmethod
-    async def upload_csv(
+    async def upload_statement(
         db: Session,
         user_id: int,
-        file_content: bytes,
+        file: BinaryIO,
         file_name: str,
-        encoding: str = 'utf-8'
+        on_progress: Optional[Callable[[Any], None]] = None
     ) -> CSVUploadResponse:
-        """Загрузка финансовых данных из CSV"""
+        """
+        Загрузка финансовых данных из выписки CSV или XLSX (потоково, пакетами)
         
-        records_created = 0
-        records_failed = 0
-        errors = []
+        Формат (кодировка, разделитель, колонки, форматы даты и суммы)
+        определяется один раз по образцу, после чего импорт выполняется за один проход.
+        """
+        from app.services.finance_import import FinanceImportPipeline, statement_rows
+
+        try:
+            rows = statement_rows(file, file_name)
+        except ValueError as e:
+            return CSVUploadResponse(
+                success=False,
+                records_created=0,
+                records_failed=0,
+                errors=[f"Не удалось определить формат файла: {str(e)}"],
+                file_name=file_name
+            )
+
+        pipeline = FinanceImportPipeline(db, user_id, file_name, on_progress=on_progress)
 
         try:
-            # Декодирование файла
-            content = file_content.decode(encoding)
-            csv_file = io.StringIO(content)
-            
-            # Определение разделителя
-            sample = content[:1024]
-            sniffer = csv.Sniffer()
-            delimiter = sniffer.sniff(sample).delimiter
-            
-            # Чтение CSV
-            reader = csv.DictReader(csv_file, delimiter=delimiter)
-            
-            for row_num, row in enumerate(reader, start=2):  # start=2 т.к. 1-я строка - заголовки
-                record_data = FinanceService.parse_csv_row(row)
-                
-                if record_data:
-                    try:
-                        # Автоматическая категоризация с AI
-                        ai_category, ai_confidence = FinanceService.categorize_transaction(
-                            record_data.description or '',
-                            record_data.type
-                        )
-                        
-                        # Создание записи
-                        db_record = FinanceRecord(
-                            user_id=user_id,
-                            date=record_data.date,
-                            description=record_data.description,
-                            amount=record_data.amount,
-                            category=record_data.category,
-                            type=record_data.type,
-                            counterparty=record_data.counterparty,
-                            payment_method=record_data.payment_method,
-                            account=record_data.account,
-                            source_file=file_name,
-                            raw_data=str(row),
-                            ai_category=ai_category,
-                            ai_confidence=float(ai_confidence),
-                            is_verified=False,
-                        )
-                        db.add(db_record)
-                        records_created += 1
-                        
-                    except Exception as e:
-                        records_failed += 1
-                        errors.append(f"Строка {row_num}: {str(e)}")
-                else:
-                    records_failed += 1
-                    errors.append(f"Строка {row_num}: не удалось распарсить данные")
-            
+            pipeline.run(rows)
             db.commit()
-            
         except Exception as e:
             db.rollback()
             return CSVUploadResponse(
@@ -210,13 +231,7 @@ class FinanceService:
                 file_name=file_name
             )
 
-        return CSVUploadResponse(
-            success=records_created > 0,
-            records_created=records_created,
-            records_failed=records_failed,
-            errors=errors[:10],  # Ограничиваем количество ошибок
-            file_name=file_name
-        )
+        return pipeline.result()
 
     @staticmethod
     def get_summary(
@@ -232,58 +247,51 @@ class FinanceService:
         if not end_date:
             end_date = date.today()
 
-        # Запрос всех транзакций за период
-        records = db.query(FinanceRecord).filter(
+        # Агрегаты по типу и категории одним запросом по дневному rollup;
+        # доля категории - оконная сумма по типу
+        rollup = FinanceDailyRollup
+        transaction_type = case((rollup.type == 'income', 'income'), else_='expense').label('type')
+        category = func.coalesce(func.nullif(rollup.category, ''), 'Без категории').label('category')
+        amount = func.sum(rollup.amount).label('amount')
+        rows = db.query(
+            transaction_type,
+            category,
+            amount,
+            func.sum(rollup.count).label('count'),
+            func.sum(func.sum(rollup.amount)).over(partition_by=transaction_type).label('type_total')
+        ).filter(
             and_(
-                FinanceRecord.user_id == user_id,
-                FinanceRecord.date >= start_date,
-                FinanceRecord.date <= end_date
+                rollup.user_id == user_id,
+                rollup.day >= start_date,
+                rollup.day <= end_date
             )
+        ).group_by(transaction_type, category).having(func.sum(rollup.count) > 0).order_by(
+            transaction_type, amount.desc()
         ).all()
 
-        # Подсчёт сумм
-        total_income = sum(r.amount for r in records if r.type == 'income')
-        total_expense = sum(r.amount for r in records if r.type == 'expense')
-        
-        # Группировка по категориям
-        income_by_cat = defaultdict(lambda: {'amount': Decimal(0), 'count': 0})
-        expense_by_cat = defaultdict(lambda: {'amount': Decimal(0), 'count': 0})
-        
-        for record in records:
-            category = record.category or 'Без категории'
-            if record.type == 'income':
-                income_by_cat[category]['amount'] += record.amount
-                income_by_cat[category]['count'] += 1
-            else:
-                expense_by_cat[category]['amount'] += record.amount
-                expense_by_cat[category]['count'] += 1
-
-        # Формирование списков категорий
-        income_categories = [
-            CategorySummary(
-                category=cat,
-                amount=data['amount'],
-                count=data['count'],
-                percentage=float(data['amount'] / total_income * 100) if total_income > 0 else 0
-            )
-            for cat, data in sorted(income_by_cat.items(), key=lambda x: x[1]['amount'], reverse=True)
-        ]
-        
-        expense_categories = [
-            CategorySummary(
-                category=cat,
-                amount=data['amount'],
-                count=data['count'],
-                percentage=float(data['amount'] / total_expense * 100) if total_expense > 0 else 0
-            )
-            for cat, data in sorted(expense_by_cat.items(), key=lambda x: x[1]['amount'], reverse=True)
-        ]
+        totals = {'income': Decimal(0), 'expense': Decimal(0)}
+        by_type: Dict[str, List[CategorySummary]] = {'income': [], 'expense': []}
+        transaction_count = 0
+        for row in rows:
+            totals[row.type] = Decimal(row.type_total)
+            transaction_count += int(row.count)
+            by_type[row.type].append(CategorySummary(
+                category=row.category,
+                amount=row.amount,
+                count=int(row.count),
+                percentage=float(Decimal(row.amount) / Decimal(row.type_total) * 100) if row.type_total > 0 else 0
+            ))
+
+        total_income = totals['income']
+        total_expense = totals['expense']
+        income_categories = by_type['income']
+        expense_categories = by_type['expense']
 
         return FinanceSummary(
             total_income=total_income,
             total_expense=total_expense,
             net_income=total_income - total_expense,
-            transaction_count=len(records),
+            transaction_count=transaction_count,
             income_by_category=income_categories,
             expense_by_category=expense_categories,
             period_start=start_date,
@@ -294,62 +302,77 @@ class FinanceService:
     def get_cash_flow(
         db: Session,
         user_id: int,
-        months: int = 12
+        months: int = 12,
+        period: str = 'month',
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
     ) -> CashFlowData:
-        """Получить данные денежного потока по месяцам"""
+        """
+        Получить денежный поток по календарным периодам (month, week, quarter)
         
-        end_date = date.today()
-        start_date = end_date - timedelta(days=months * 30)
-
-        # Группировка по месяцам
-        records = db.query(
-            extract('year', FinanceRecord.date).label('year'),
-            extract('month', FinanceRecord.date).label('month'),
-            FinanceRecord.type,
-            func.sum(FinanceRecord.amount).label('total')
+        По умолчанию - последние `months` календарных месяцев, включая текущий.
+        Периоды без операций заполняются нулями.
+        """
+        if not end_date:
+            end_date = date.today()
+        if not start_date:
+            start_date = _bucket_start(end_date.replace(day=1) - relativedelta(months=months - 1), period)
+
+        buckets = _calendar_buckets(start_date, end_date, period)
+        if len(buckets) > MAX_CASH_FLOW_BUCKETS:
+            raise ValueError(f"Слишком длинный период: не более {MAX_CASH_FLOW_BUCKETS} интервалов")
+
+        # Суммы по периодам из дневного rollup
+        bucket = func.date_trunc(period, FinanceDailyRollup.day).label('bucket')
+        rows = db.query(
+            bucket,
+            FinanceDailyRollup.type,
+            func.sum(FinanceDailyRollup.amount).label('total')
         ).filter(
             and_(
-                FinanceRecord.user_id == user_id,
-                FinanceRecord.date >= start_date,
-                FinanceRecord.date <= end_date
+                FinanceDailyRollup.user_id == user_id,
+                FinanceDailyRollup.day >= start_date,
+                FinanceDailyRollup.day <= end_date
             )
-        ).group_by('year', 'month', FinanceRecord.type).all()
+        ).group_by(bucket, FinanceDailyRollup.type).all()
 
-        # Организация данных по месяцам
-        monthly_data = defaultdict(lambda: {'income': Decimal(0), 'expense': Decimal(0)})
-        
-        for year, month, trans_type, total in records:
-            month_key = f"{int(year)}-{int(month):02d}"
-            if trans_type == 'income':
-                monthly_data[month_key]['income'] = total
-            else:
-                monthly_data[month_key]['expense'] = total
+        totals: Dict[tuple, Decimal] = {}
+        for bucket_start, trans_type, total in rows:
+            if isinstance(bucket_start, datetime):
+                bucket_start = bucket_start.date()
+            key = (bucket_start, 'income' if trans_type == 'income' else 'expense')
+            totals[key] = totals.get(key, Decimal(0)) + total
 
-        # Формирование трендов
+        # Нулевое заполнение, средние и максимумы за один проход
         trends = []
-        for month_key in sorted(monthly_data.keys()):
-            data = monthly_data[month_key]
-            trends.append(MonthlyTrend(
-                month=month_key,
-                income=data['income'],
-                expense=data['expense'],
-                net=data['income'] - data['expense']
-            ))
-
-        # Средние значения
-        avg_income = sum(t.income for t in trends) / len(trends) if trends else Decimal(0)
-        avg_expense = sum(t.expense for t in trends) / len(trends) if trends else Decimal(0)
-        
-        # Максимумы
-        highest_income_month = max(trends, key=lambda t: t.income).month if trends else ""
-        highest_expense_month = max(trends, key=lambda t: t.expense).month if trends else ""
+        income_sum = expense_sum = Decimal(0)
+        highest_income = highest_expense = None
+        for bucket_start, first_day, last_day in buckets:
+            income = totals.get((bucket_start, 'income'), Decimal(0))
+            expense = totals.get((bucket_start, 'expense'), Decimal(0))
+            trend = MonthlyTrend(
+                month=_bucket_label(bucket_start, period),
+                period_start=first_day,
+                period_end=last_day,
+                income=income,
+                expense=expense,
+                net=income - expense
+            )
+            trends.append(trend)
+            income_sum += income
+            expense_sum += expense
+            if income > 0 and (highest_income is None or income > highest_income.income):
+                highest_income = trend
+            if expense > 0 and (highest_expense is None or expense > highest_expense.expense):
+                highest_expense = trend
 
         return CashFlowData(
+            period=period,
             monthly_trends=trends,
-            average_income=avg_income,
-            average_expense=avg_expense,
-            highest_income_month=highest_income_month,
-            highest_expense_month=highest_expense_month
+            average_income=income_sum / len(trends) if trends else Decimal(0),
+            average_expense=expense_sum / len(trends) if trends else Decimal(0),
+            highest_income_month=highest_income.month if highest_income else "",
+            highest_expense_month=highest_expense.month if highest_expense else ""
         )
 
     @staticmethod
@@ -357,59 +380,10 @@ class FinanceService:
         db: Session,
         user_id: int
     ) -> FinanceInsights:
-        """Генерация AI инсайтов и рекомендаций"""
-        
-        insights = []
-        
-        # Получаем данные за последние 3 месяца
-        end_date = date.today()
-        start_date = end_date - timedelta(days=90)
-        
-        summary = FinanceService.get_summary(db, user_id, start_date, end_date)
-        
-        # Инсайт 1: Убыточность
-        if summary.net_income < 0:
-            insights.append(AIInsight(
-                type="warning",
-                title="Отрицательный денежный поток",
-                description=f"За последние 3 месяца расходы превысили доходы на {abs(summary.net_income):,.2f} ₽",
-                priority="high",
-                amount=abs(summary.net_income)
-            ))
-        
-        # Инсайт 2: Топовая категория расходов
-        if summary.expense_by_category:
-            top_expense = summary.expense_by_category[0]
-            if top_expense.percentage > 30:
-                insights.append(AIInsight(
-                    type="tip",
-                    title=f"Высокие расходы на {top_expense.category}",
-                    description=f"Эта категория составляет {top_expense.percentage:.1f}% всех расходов. Рассмотрите возможность оптимизации.",
-                    priority="medium",
-                    category=top_expense.category,
-                    amount=top_expense.amount
-                ))
-        
-        # Инсайт 3: Рост доходов
-        cash_flow = FinanceService.get_cash_flow(db, user_id, months=3)
-        if len(cash_flow.monthly_trends) >= 2:
-            last_month = cash_flow.monthly_trends[-1]
-            prev_month = cash_flow.monthly_trends[-2]
-            growth = ((last_month.income - prev_month.income) / prev_month.income * 100) if prev_month.income > 0 else 0
-            
-            if growth > 10:
-                insights.append(AIInsight(
-                    type="opportunity",
-                    title="Рост доходов",
-                    description=f"Доходы выросли на {growth:.1f}% по сравнению с прошлым месяцем!",
-                    priority="low",
-                    amount=last_month.income - prev_month.income
-                ))
-
-        return FinanceInsights(
-            insights=insights,
-            generated_at=datetime.now()
-        )
+        """Генерация AI инсайтов и рекомендаций (правила - в finance_insights)"""
+        from app.services.finance_insights import compute_insights
+
+        return compute_insights(db, user_id)
 
     # ========== CRUD операции для бюджетов ==========
 
@@ -436,28 +410,74 @@ class FinanceService:
         if not budget:
             return None
 
-        # Подсчёт потраченной суммы
-        spent = db.query(func.sum(FinanceRecord.amount)).filter(
-            and_(
-                FinanceRecord.user_id == user_id,
-                FinanceRecord.category == budget.category,
-                FinanceRecord.type == 'expense',
-                FinanceRecord.date >= budget.start_date,
-                FinanceRecord.date <= (budget.end_date or date.today())
-            )
-        ).scalar() or Decimal(0)
-
-        remaining = budget.amount - spent
-        percentage_used = float(spent / budget.amount * 100) if budget.amount > 0 else 0
+        return FinanceService.get_budget_statuses(db, user_id, [budget])[0]
 
-        return BudgetStatus(
-            budget=budget,
-            spent=spent,
-            remaining=remaining,
-            percentage_used=percentage_used,
-            is_over_budget=spent > budget.amount
+    @staticmethod
+    def get_budget_statuses(
+        db: Session,
+        user_id: int,
+        budgets: Optional[List[FinanceBudget]] = None,
+        today: Optional[date] = None
+    ) -> List[BudgetStatus]:
+        """
+        Статусы нескольких бюджетов (по умолчанию - всех активных)
+        
+        Потраченные суммы за текущие окна всех бюджетов считаются одним
+        запросом: окна передаются как VALUES и соединяются с дневным rollup.
+        """
+        if budgets is None:
+            budgets = db.query(FinanceBudget).filter(
+                FinanceBudget.user_id == user_id,
+                FinanceBudget.is_active == True
+            ).order_by(FinanceBudget.created_at.desc()).all()
+        if not budgets:
+            return []
+
+        today = today or date.today()
+        windows = {budget.id: budget_window(budget, today) for budget in budgets}
+
+        window_table = values(
+            column('budget_id', Integer),
+            column('category', String),
+            column('window_start', Date),
+            column('window_end', Date),
+            name='budget_windows'
+        ).data([
+            (budget.id, budget.category, *windows[budget.id])
+            for budget in budgets
+        ])
+        rollup = FinanceDailyRollup
+        spent_by_budget = dict(
+            db.query(
+                window_table.c.budget_id,
+                func.coalesce(func.sum(rollup.amount), 0)
+            ).select_from(window_table).outerjoin(
+                rollup,
+                and_(
+                    rollup.user_id == user_id,
+                    rollup.type == 'expense',
+                    rollup.category == window_table.c.category,
+                    rollup.day >= window_table.c.window_start,
+                    rollup.day <= window_table.c.window_end
+                )
+            ).group_by(window_table.c.budget_id).all()
         )
 
+        statuses = []
+        for budget in budgets:
+            spent = Decimal(spent_by_budget.get(budget.id) or 0)
+            window_start, window_end = windows[budget.id]
+            statuses.append(BudgetStatus(
+                budget=budget,
+                spent=spent,
+                remaining=budget.amount - spent,
+                percentage_used=float(spent / budget.amount * 100) if budget.amount > 0 else 0,
+                is_over_budget=spent > budget.amount,
+                period_start=window_start,
+                period_end=window_end
+            ))
+        return statuses
+
     # ========== CRUD операции для целей ==========
 
     @staticmethod
@@ -0,0 +1,241 @@
+"""Определение формата банковской выписки по небольшому образцу файла"""
+import codecs
+import csv
+import hashlib
+import re
+from collections import OrderedDict
+from datetime import datetime
+from typing import BinaryIO, Dict, List, Optional
+
+SAMPLE_SIZE = 64 * 1024
+SAMPLE_ROWS = 200
+FORMAT_CACHE_SIZE = 256
+
+# Каноническое поле -> варианты названий колонок у разных банков (в нижнем регистре)
+FIELD_ALIASES: Dict[str, List[str]] = {
+    'date': ['date', 'дата', 'дата операции', 'дата платежа', 'дата проводки', 'дата транзакции'],
+    'description': ['description', 'описание', 'назначение', 'назначение платежа', 'описание операции', 'комментарий'],
+    'amount': ['amount', 'сумма', 'сумма операции', 'сумма платежа', 'сумма в валюте счета'],
+    'income_amount': ['приход', 'поступление', 'зачисление', 'кредит', 'credit'],
+    'expense_amount': ['расход', 'списание', 'дебет', 'debit'],
+    'type': ['type', 'тип', 'тип операции', 'направление'],
+    'category': ['category', 'категория'],
+    'counterparty': ['counterparty', 'контрагент', 'наименование контрагента'],
+    'counterparty_inn': ['counterparty_inn', 'инн', 'инн контрагента'],
+    'payment_method': ['payment_method', 'способ оплаты'],
+    'account': ['account', 'счёт', 'счет', 'номер счета', 'номер счёта'],
+}
+
+DATE_FORMATS = ['%d.%m.%Y', '%Y-%m-%d', '%d/%m/%Y', '%d.%m.%y', '%Y.%m.%d', '%d-%m-%Y']
+
+AMOUNT_JUNK = re.compile(r"[\s '₽$€]|руб\.?|rub", re.IGNORECASE)
+
+
+class StatementFormat:
+    """Кодировка, разделитель, соответствие колонок и форматы даты/суммы"""
+
+    def __init__(
+        self,
+        encoding: str,
+        delimiter: str,
+        columns: Dict[str, int],
+        date_format: Optional[str],
+        decimal_separator: str
+    ):
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.columns = columns  # каноническое поле -> индекс колонки
+        self.date_format = date_format
+        self.decimal_separator = decimal_separator
+
+    def normalize_row(self, values: List[str]) -> Dict[str, str]:
+        """
+        Привести строку к каноническим полям, которые понимает
+        FinanceService.parse_csv_row: дата в ISO, сумма со знаком и точкой.
+        """
+        def get(field: str) -> str:
+            index = self.columns.get(field)
+            if index is None or index >= len(values):
+                return ''
+            return (values[index] or '').strip()
+
+        fields = {
+            field: get(field)
+            for field in ('description', 'type', 'category', 'counterparty', 'counterparty_inn', 'payment_method', 'account')
+        }
+        fields['date'] = self.normalize_date(get('date'))
+
+        if 'amount' in self.columns:
+            fields['amount'] = self.normalize_amount(get('amount'))
+        else:
+            # Отдельные колонки прихода и расхода
+            income = self.normalize_amount(get('income_amount')).lstrip('-')
+            expense = self.normalize_amount(get('expense_amount')).lstrip('-')
+            if income and _is_nonzero(income):
+                fields['amount'] = income
+            elif expense:
+                fields['amount'] = '-' + expense
+            else:
+                fields['amount'] = ''
+        return fields
+
+    def normalize_date(self, value: str) -> str:
+        value = value.split(' ')[0].split('T')[0]
+        if not value or not self.date_format:
+            return value
+        try:
+            return datetime.strptime(value, self.date_format).date().isoformat()
+        except ValueError:
+            return value
+
+    def normalize_amount(self, value: str) -> str:
+        value = AMOUNT_JUNK.sub('', value).replace('−', '-').replace('–', '-')
+        if value.startswith('(') and value.endswith(')'):
+            value = '-' + value[1:-1]
+        thousands = '.' if self.decimal_separator == ',' else ','
+        return value.replace(thousands, '').replace(self.decimal_separator, '.')
+
+
+def _is_nonzero(value: str) -> bool:
+    try:
+        return float(value) != 0
+    except ValueError:
+        return False
+
+
+def _detect_encoding(sample: bytes) -> str:
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # final=False: образец может обрываться посреди многобайтного символа
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1251'
+
+
+def _map_columns(header: List[str]) -> Dict[str, int]:
+    columns: Dict[str, int] = {}
+    for index, name in enumerate(header):
+        normalized = name.strip().strip('"').lower()
+        for field, aliases in FIELD_ALIASES.items():
+            if field not in columns and normalized in aliases:
+                columns[field] = index
+                break
+    return columns
+
+
+def _detect_date_format(values: List[str]) -> Optional[str]:
+    values = [v.strip().split(' ')[0].split('T')[0] for v in values if v and v.strip()]
+    for date_format in DATE_FORMATS:
+        try:
+            for value in values:
+                datetime.strptime(value, date_format)
+            return date_format
+        except ValueError:
+            continue
+    return None
+
+
+def _detect_decimal_separator(values: List[str]) -> str:
+    commas = dots = 0
+    for value in values:
+        value = AMOUNT_JUNK.sub('', value)
+        last_comma, last_dot = value.rfind(','), value.rfind('.')
+        if last_comma > last_dot:
+            commas += 1
+        elif last_dot > last_comma:
+            dots += 1
+    return ',' if commas > dots else '.'
+
+
+def has_required_columns(columns: Dict[str, int]) -> bool:
+    return 'date' in columns and (
+        'amount' in columns or 'income_amount' in columns or 'expense_amount' in columns
+    )
+
+
+def find_header(rows: List[List[str]]) -> Optional[int]:
+    """Индекс строки заголовков среди первых строк (выше могут быть название банка, период и т.п.)"""
+    for index, row in enumerate(rows):
+        if has_required_columns(_map_columns(row)):
+            return index
+    return None
+
+
+def format_from_rows(
+    header: List[str],
+    sample_rows: List[List[str]],
+    encoding: str = '',
+    delimiter: str = ''
+) -> StatementFormat:
+    """Формат по строке заголовков и образцу строк данных"""
+    columns = _map_columns(header)
+    if not has_required_columns(columns):
+        raise ValueError("Не найдены колонки даты и суммы")
+
+    def column_values(field: str) -> List[str]:
+        index = columns.get(field)
+        if index is None:
+            return []
+        return [row[index] for row in sample_rows if index < len(row)]
+
+    date_format = _detect_date_format(column_values('date'))
+    amount_values = column_values('amount') + column_values('income_amount') + column_values('expense_amount')
+    decimal_separator = _detect_decimal_separator(amount_values)
+
+    return StatementFormat(encoding, delimiter, columns, date_format, decimal_separator)
+
+
+class StatementFormatDetector:
+    """
+    Определяет формат выписки за один проход по ограниченному образцу.
+    Результаты кэшируются по отпечатку строки заголовков: выгрузки
+    одного банка имеют одинаковый заголовок.
+    """
+
+    def __init__(self, cache_size: int = FORMAT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, StatementFormat]" = OrderedDict()
+
+    def detect(self, stream: BinaryIO) -> StatementFormat:
+        """Определить формат; поток возвращается на начало"""
+        position = stream.tell()
+        sample = stream.read(SAMPLE_SIZE)
+        stream.seek(position)
+
+        if not sample.strip():
+            raise ValueError("Файл пуст")
+
+        # Кодировка определяется всегда: ASCII-заголовок не гарантирует кодировку тела
+        encoding = _detect_encoding(sample)
+        header_bytes = sample.split(b'\n', 1)[0]
+        fingerprint = hashlib.sha1(header_bytes + encoding.encode()).hexdigest()
+        cached = self._cache.get(fingerprint)
+        if cached is not None:
+            self._cache.move_to_end(fingerprint)
+            return cached
+
+        detected = self._detect(sample, encoding)
+        self._cache[fingerprint] = detected
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return detected
+
+    def _detect(self, sample: bytes, encoding: str) -> StatementFormat:
+        text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample, final=False)
+        if len(sample) >= SAMPLE_SIZE and '\n' in text:
+            text = text[:text.rfind('\n')]  # отбрасываем оборванную последнюю строку
+
+        try:
+            delimiter = csv.Sniffer().sniff('\n'.join(text.splitlines()[:20]), delimiters=',;\t|').delimiter
+        except csv.Error:
+            delimiter = ','
+
+        rows = list(csv.reader(text.splitlines(), delimiter=delimiter))
+        if not rows:
+            raise ValueError("Не удалось прочитать заголовки")
+        return format_from_rows(rows[0], rows[1:SAMPLE_ROWS + 1], encoding, delimiter)
+
+
+statement_format_detector = StatementFormatDetector()
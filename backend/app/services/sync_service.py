@@ -0,0 +1,133 @@
+"""
+Delta sync - changes across modules since a client cursor.
+"""
+from datetime import timedelta
+from typing import Dict, Any, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.task import Task
+from app.models.finance import FinanceRecord
+from app.models.document import Document
+from app.models.marketing import MarketingCampaign
+from app.models.chat import ChatConversation
+from app.models.sync import SyncTombstone, SyncHorizon
+
+PRUNE_BATCH_SIZE = 10000
+
+
+class SyncService:
+    """
+    Return rows created, updated or deleted since a cursor.
+
+    Every synced row carries `change_seq`, the id of the transaction that
+    last wrote it (set by a trigger). Reads are capped below the xmin of
+    the current snapshot, so rows of still-running transactions are never
+    skipped: they are returned by a later sync once committed.
+    """
+
+    ENTITIES = {
+        "tasks": Task,
+        "finance_records": FinanceRecord,
+        "documents": Document,
+        "marketing_campaigns": MarketingCampaign,
+        "chat_conversations": ChatConversation,
+    }
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_changes(self, user_id: int, since: int, limit: int = 500) -> Dict[str, Any]:
+        """Get changes after `since`, at most about `limit` rows per entity."""
+        watermark = self.snapshot_xmin()
+
+        # Everything below the watermark is committed (or rolled back)
+        cutoff = max(since, watermark - 1)
+        has_more = False
+
+        sources = list(self.ENTITIES.values()) + [SyncTombstone]
+        for model in sources:
+            boundary = self._page_boundary(model, user_id, since, cutoff, limit)
+            if boundary is not None and boundary < cutoff:
+                cutoff = boundary
+                has_more = True
+
+        result: Dict[str, Any] = {
+            name: self._fetch(model, user_id, since, cutoff)
+            for name, model in self.ENTITIES.items()
+        }
+        result["deleted"] = [
+            {"entity": t.entity, "id": t.entity_id}
+            for t in self._fetch(SyncTombstone, user_id, since, cutoff)
+        ]
+        result["cursor"] = str(cutoff)
+        result["has_more"] = has_more
+        return result
+
+    def snapshot_xmin(self) -> int:
+        """Oldest transaction still running; all change_seq below it are final."""
+        return self.db.execute(
+            text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+        ).scalar()
+
+    def _page_boundary(self, model, user_id: int, since: int, cutoff: int, limit: int) -> Optional[int]:
+        """
+        Highest cursor that keeps this entity's page within `limit` rows.
+
+        Pages end on transaction boundaries; a single transaction larger
+        than `limit` is returned whole so the cursor always advances.
+        """
+        seqs: List[int] = [
+            seq for (seq,) in self.db.query(model.change_seq).filter(
+                model.user_id == user_id,
+                model.change_seq > since,
+                model.change_seq <= cutoff
+            ).order_by(model.change_seq).limit(limit + 1).all()
+        ]
+        if len(seqs) <= limit:
+            return None
+        if seqs[0] == seqs[limit]:
+            return seqs[0]
+        return seqs[limit] - 1
+
+    def _fetch(self, model, user_id: int, since: int, cutoff: int) -> list:
+        return self.db.query(model).filter(
+            model.user_id == user_id,
+            model.change_seq > since,
+            model.change_seq <= cutoff
+        ).order_by(model.change_seq, model.id).all()
+
+    def oldest_cursor(self) -> int:
+        """
+        Oldest cursor still served. Tombstones up to this value may have been
+        pruned, so a client behind it must start over with a full sync.
+        """
+        return self.db.query(SyncHorizon.change_seq).filter(SyncHorizon.id == 1).scalar() or 0
+
+    def prune_tombstones(self, retention_days: int) -> int:
+        """Delete tombstones older than `retention_days` and advance the horizon. Returns rows deleted."""
+        expired = func.now() - timedelta(days=retention_days)
+        deleted = 0
+        while True:
+            batch = select(SyncTombstone.id).where(
+                SyncTombstone.created_at < expired
+            ).order_by(SyncTombstone.id).limit(PRUNE_BATCH_SIZE).scalar_subquery()
+            seqs = self.db.execute(
+                delete(SyncTombstone).where(SyncTombstone.id.in_(batch)).returning(SyncTombstone.change_seq)
+            ).scalars().all()
+            if not seqs:
+                break
+
+            # The horizon moves in the same transaction as the delete
+            horizon = insert(SyncHorizon).values(id=1, change_seq=max(seqs))
+            self.db.execute(horizon.on_conflict_do_update(
+                index_elements=[SyncHorizon.id],
+                set_={
+                    "change_seq": func.greatest(SyncHorizon.change_seq, horizon.excluded.change_seq),
+                    "updated_at": func.now(),
+                }
+            ))
+            self.db.commit()
+            deleted += len(seqs)
+        return deleted
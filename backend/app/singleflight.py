@@ -0,0 +1,132 @@
+"""
+Request coalescing (single-flight) for expensive read-only computations.
+
+Concurrent identical calls inside one worker share a single execution.
+With Redis enabled, a short-lived lock extends this across workers: the
+lock holder publishes its result and the other workers wait for it
+instead of recomputing.
+"""
+import asyncio
+import logging
+import uuid
+from typing import Callable, Dict, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+from redis.exceptions import RedisError
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+# Delete the lock only if we still own it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one execution."""
+
+    def __init__(
+        self,
+        namespace: str,
+        lock_timeout: float = 30.0,
+        result_ttl: int = 5,
+        poll_interval: float = 0.05
+    ):
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], T], model: Type[T]) -> T:
+        """
+        Run `fn` (a blocking callable) once per `key` among concurrent callers.
+
+        `model` is used to (de)serialize the result when it is shared
+        between workers through Redis.
+        """
+        full_key = f"singleflight:{self.namespace}:{key}"
+
+        call = self._calls.get(full_key)
+        if call is not None:
+            return await asyncio.shield(call)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[full_key] = future
+        try:
+            result = await self._execute(full_key, fn, model)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._calls[full_key]
+
+    async def _execute(self, key: str, fn: Callable[[], T], model: Type[T]) -> T:
+        if not settings.SINGLEFLIGHT_REDIS_ENABLED:
+            return await run_in_threadpool(fn)
+
+        try:
+            redis = await get_redis()
+            token = uuid.uuid4().hex
+            acquired = await redis.set(f"{key}:lock", token, nx=True, px=int(self.lock_timeout * 1000))
+        except (RedisError, OSError) as e:
+            logger.warning(f"Single-flight lock unavailable, executing locally: {e}")
+            return await run_in_threadpool(fn)
+
+        if not acquired:
+            shared = await self._wait_for_result(redis, key, model)
+            if shared is not None:
+                return shared
+            return await run_in_threadpool(fn)
+
+        try:
+            result = await run_in_threadpool(fn)
+            try:
+                await redis.set(f"{key}:result:{token}", result.model_dump_json(), ex=self.result_ttl)
+            except (RedisError, OSError):
+                pass
+            return result
+        finally:
+            try:
+                await redis.eval(RELEASE_LOCK_SCRIPT, 1, f"{key}:lock", token)
+            except (RedisError, OSError):
+                pass
+
+    async def _wait_for_result(self, redis, key: str, model: Type[T]) -> Optional[T]:
+        """Wait for the lock holder in another worker to publish its result."""
+        deadline = asyncio.get_running_loop().time() + self.lock_timeout
+        token = None
+        try:
+            while asyncio.get_running_loop().time() < deadline:
+                current = await redis.get(f"{key}:lock")
+                if current is not None:
+                    token = current
+                if token is not None:
+                    payload = await redis.get(f"{key}:result:{token}")
+                    if payload is not None:
+                        return model.model_validate_json(payload)
+                if current is None:
+                    # The holder finished (or failed) without a result for us
+                    return None
+                await asyncio.sleep(self.poll_interval)
+        except (RedisError, OSError):
+            return None
+        return None
+
+
+finance_analytics_flight = SingleFlight("finance")
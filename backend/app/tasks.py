@@ -1,8 +1,167 @@
 # Celery tasks will be defined here
+import logging
+
 from app.celery_worker import celery
 
+logger = logging.getLogger(__name__)
+
+
+async def schedule_debounced(task, key: str, delay: int, *args) -> None:
+    """
+    Запустить задачу через `delay` секунд, если она ещё не запланирована
+    по этому ключу: серия изменений данных даёт один запуск
+    """
+    from app.redis_client import get_redis
+
+    try:
+        redis = await get_redis()
+        if await redis.set(key, 1, nx=True, ex=delay):
+            task.apply_async(args, countdown=delay)
+    except Exception as e:
+        logger.warning(f"Failed to schedule {task.name} ({key}): {e}")
+
 
 @celery.task
 def sample_task(x: int, y: int):
     """Sample task for testing"""
     return x + y
+
+
+@celery.task
+def train_category_model(user_id: int):
+    """Переобучить классификатор категорий пользователя на проверенных записях"""
+    from app.database import SyncSessionLocal
+    from app.services.finance_classifier import train_user_model
+
+    db = SyncSessionLocal()
+    try:
+        return train_user_model(db, user_id)
+    finally:
+        db.close()
+
+
+@celery.task
+def refresh_finance_insights(user_id: int):
+    """Пересчитать сохранённые финансовые инсайты пользователя"""
+    from app.database import SyncSessionLocal
+    from app.services.finance_insights import refresh_insights
+
+    db = SyncSessionLocal()
+    try:
+        result = refresh_insights(db, user_id)
+        return {"user_id": user_id, "insights": len(result.insights)}
+    finally:
+        db.close()
+
+
+@celery.task
+def refresh_all_finance_insights():
+    """Ночной пересчёт инсайтов: отдельная задача на каждого пользователя с финансовыми данными"""
+    from app.database import SyncSessionLocal
+    from app.models.finance import FinanceRecord
+
+    db = SyncSessionLocal()
+    try:
+        user_ids = [user_id for (user_id,) in db.query(FinanceRecord.user_id).distinct().all()]
+    finally:
+        db.close()
+
+    for user_id in user_ids:
+        refresh_finance_insights.delay(user_id)
+    return {"users": len(user_ids)}
+
+
+# Сообщение подтверждается после выполнения: при гибели воркера задача вернётся в очередь
+# (повторную доставку живой задачи отсекает claim_job)
+@celery.task(bind=True, max_retries=3, acks_late=True, reject_on_worker_lost=True)
+def import_finance_statement(self, job_id: int):
+    """Импорт загруженной частями выписки (продолжается с контрольной точки)"""
+    from app.config import settings
+    from app.database import SyncSessionLocal
+    from app.services.finance_import_jobs import fail_job, run_import_job
+
+    db = SyncSessionLocal()
+    try:
+        try:
+            job = run_import_job(db, job_id)
+        except Exception as e:
+            if self.request.retries >= self.max_retries:
+                fail_job(db, job_id, f"Ошибка обработки файла: {str(e)}")
+                raise
+            raise self.retry(exc=e, countdown=60)
+
+        if job is None:
+            return {"job_id": job_id, "status": "skipped"}
+        if job.records_created:
+            refresh_finance_insights.apply_async(
+                (job.user_id,), countdown=settings.INSIGHTS_REFRESH_DELAY_SECONDS
+            )
+        return {"job_id": job_id, "status": job.status, "rows": job.rows_processed}
+    finally:
+        db.close()
+
+
+@celery.task
+def resume_stalled_imports():
+    """Перезапуск импортов, брошенных упавшим воркером, и очистка незавершённых загрузок"""
+    from app.database import SyncSessionLocal
+    from app.services.finance_import_jobs import resume_stalled_jobs
+
+    db = SyncSessionLocal()
+    try:
+        job_ids = resume_stalled_jobs(db)
+    finally:
+        db.close()
+
+    for job_id in job_ids:
+        import_finance_statement.delay(job_id)
+    return {"resumed": len(job_ids)}
+
+
+@celery.task
+def link_counterparties(user_id: int):
+    """Связать записи и документы пользователя, созданные до справочника контрагентов"""
+    from app.database import SyncSessionLocal
+    from app.services.counterparties import link_unresolved
+
+    db = SyncSessionLocal()
+    try:
+        return {"user_id": user_id, "linked": link_unresolved(db, user_id)}
+    finally:
+        db.close()
+
+
+@celery.task
+def backfill_counterparties():
+    """
+    Заполнение справочника контрагентов для записей и документов, созданных
+    до него: задача на каждого пользователя с несвязанными строками.
+    Ставится в очередь при запуске воркера; когда связывать нечего,
+    ничего не делает.
+    """
+    from app.database import SyncSessionLocal
+    from app.services.counterparties import users_with_unlinked
+
+    db = SyncSessionLocal()
+    try:
+        user_ids = users_with_unlinked(db)
+    finally:
+        db.close()
+
+    for user_id in user_ids:
+        link_counterparties.delay(user_id)
+    return {"users": len(user_ids)}
+
+
+@celery.task
+def prune_sync_tombstones():
+    """Удалить записи об удалениях старше срока хранения delta sync"""
+    from app.config import settings
+    from app.database import SyncSessionLocal
+    from app.services.sync_service import SyncService
+
+    db = SyncSessionLocal()
+    try:
+        return {"deleted": SyncService(db).prune_tombstones(settings.SYNC_TOMBSTONE_RETENTION_DAYS)}
+    finally:
+        db.close()
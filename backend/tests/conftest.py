@@ -0,0 +1,34 @@
+# Shared fixtures: finance tables in an in-memory SQLite database
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.services import finance_import
+
+FINANCE_TABLES = [
+    "counterparties",
+    "finance_records",
+    "finance_budgets",
+    "finance_budget_spend",
+    "finance_budget_alerts",
+    "finance_daily_rollup",
+    "finance_category_rules",
+    "finance_category_models",
+]
+
+
+@pytest.fixture
+def finance_db(monkeypatch):
+    """Сессия SQLite с финансовыми таблицами; INSERT ... ON CONFLICT строится для SQLite"""
+    # Одно соединение на все потоки: часть кода выполняется в run_in_threadpool
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in FINANCE_TABLES])
+    monkeypatch.setattr(finance_import, "insert", sqlite.insert)
+
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
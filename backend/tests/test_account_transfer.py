@@ -0,0 +1,135 @@
+# Tests for account export/import: archive format and id remapping
+import gzip
+import io
+import itertools
+import json
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.database import Base
+from app.models.document import Template
+from app.services import account_transfer
+from app.services.account_transfer import _AccountImporter, _copy_value, _read_archive
+
+TARGET_USER_ID = 77
+SYSTEM_TEMPLATE_ID = 1
+
+
+class Importer(_AccountImporter):
+    """Новые id выдаёт счётчик, а не sequence PostgreSQL"""
+
+    ids = itertools.count(1000)
+
+    def _allocate_ids(self, table, count):
+        return [next(self.ids) for _ in range(count)]
+
+
+@pytest.fixture
+def importer():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Template.__table__])
+    with engine.begin() as conn:
+        conn.execute(Template.__table__.insert().values(id=SYSTEM_TEMPLATE_ID, name="Договор", content="..."))
+        # COPY в PostgreSQL в тестах не выполняется: проверяются данные, которые в него уходят
+        yield Importer(conn, TARGET_USER_ID)
+    engine.dispose()
+
+
+def copied(importer, table, rows):
+    """Строки COPY как словари по колонкам"""
+    column_list, buffer = importer.encode_chunk(table, rows)
+    columns = [c.strip('"') for c in column_list.split(", ")]
+    return [
+        dict(zip(columns, [None if field == "\\N" else field for field in line.split("\t")]))
+        for line in buffer.read().splitlines()
+    ]
+
+
+def make_archive(header, lines):
+    out = io.BytesIO()
+    with gzip.open(out, "wt", encoding="utf-8") as archive:
+        archive.write(json.dumps(header) + "\n")
+        for table, row in lines:
+            archive.write(json.dumps({"table": table, "row": row}, ensure_ascii=False) + "\n")
+    out.seek(0)
+    return out
+
+
+def test_copy_value_escaping():
+    assert _copy_value(None) == "\\N"
+    assert _copy_value(True) == "t"
+    assert _copy_value("a\tb\nc\\d") == "a\\tb\\nc\\\\d"
+    assert _copy_value(["x", "y"]) == '["x", "y"]'
+    assert _copy_value({"k": "знач"}, is_json=True) == '{"k": "знач"}'
+
+
+def test_archive_round_trip():
+    header = {"format": account_transfer.ARCHIVE_FORMAT, "version": account_transfer.ARCHIVE_VERSION,
+              "user": {"email": "a@example.com", "full_name": "Анна"}}
+    lines = [("counterparties", {"id": 5, "name": "ООО Ромашка"}), ("finance_records", {"id": 9, "counterparty_id": 5})]
+
+    read_header, rows = _read_archive(make_archive(header, lines))
+
+    assert read_header["user"]["email"] == "a@example.com"
+    assert list(rows) == lines
+
+
+@pytest.mark.parametrize("header", [
+    {"format": "other", "version": 1},
+    {"format": account_transfer.ARCHIVE_FORMAT, "version": 99},
+])
+def test_foreign_archive_rejected(header):
+    with pytest.raises(ValueError):
+        _read_archive(make_archive(header, []))
+
+
+def test_foreign_keys_remapped_to_new_ids(importer):
+    templates = copied(importer, "templates", [{"id": 10, "name": "Акт", "content": "...", "variables": {"n": 1}}])
+    counterparties = copied(importer, "counterparties", [{"id": 5, "name": "ООО Ромашка"}, {"id": 6, "name": "ИП Иванов"}])
+    documents = copied(importer, "documents", [
+        {"id": 20, "title": "Акт 1", "template_id": 10, "counterparty_id": 6},
+        {"id": 21, "title": "Договор", "template_id": SYSTEM_TEMPLATE_ID, "counterparty_id": None},
+        {"id": 22, "title": "Без шаблона", "template_id": 404, "counterparty_id": 5},
+    ])
+    records = copied(importer, "finance_records", [{"id": 30, "description": "Оплата", "counterparty_id": 5}])
+
+    template_id = templates[0]["id"]
+    romashka, ivanov = (row["id"] for row in counterparties)
+    assert templates[0]["variables"] == '{"n": 1}'
+    assert all(row["user_id"] == str(TARGET_USER_ID) for row in templates + counterparties + documents + records)
+
+    assert [(d["template_id"], d["counterparty_id"]) for d in documents] == [
+        (template_id, ivanov),
+        (str(SYSTEM_TEMPLATE_ID), None),  # Системный шаблон общий: id не меняется
+        (None, romashka),  # Ссылка на шаблон вне архива не переносится
+    ]
+    assert records[0]["counterparty_id"] == romashka
+    assert len({row["id"] for row in templates + counterparties + documents + records}) == 7
+    assert "20" not in {d["id"] for d in documents}
+
+
+def test_subtasks_follow_parents_across_chunks(importer):
+    parents = copied(importer, "tasks", [{"id": 1, "title": "Проект", "parent_task_id": None}])
+    children = copied(importer, "tasks", [
+        {"id": 2, "title": "Этап", "parent_task_id": 1},
+        {"id": 3, "title": "Подзадача", "parent_task_id": 2},
+    ])
+
+    assert parents[0]["parent_task_id"] is None
+    assert children[0]["parent_task_id"] == parents[0]["id"]
+    assert children[1]["parent_task_id"] == children[0]["id"]
+
+
+def test_chat_messages_follow_conversation(importer):
+    conversation = copied(importer, "chat_conversations", [{"id": 4, "title": "Вопрос"}])
+    messages = copied(importer, "chat_messages", [{"id": 8, "conversation_id": 4, "content": "Привет\tмир"}])
+
+    assert messages[0]["conversation_id"] == conversation[0]["id"]
+    assert "user_id" not in messages[0]
+    assert messages[0]["content"] == "Привет\\tмир"
+
+
+def test_unknown_table_rejected(importer):
+    with pytest.raises(ValueError):
+        importer.encode_chunk("users", [{"id": 1}])
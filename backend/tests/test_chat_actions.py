@@ -0,0 +1,56 @@
+# Tests for chat actions that change finance data
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+
+from app.api.v1.endpoints import chat
+from app.auth import get_current_user
+from app.config import settings
+from app.database import get_db_sync
+from app.main import app
+from app.models.finance import FinanceRecord
+from app.rate_limit import chat_action_limiter
+
+USER_ID = 1
+
+
+@pytest.fixture
+def client_app(finance_db, monkeypatch):
+    refreshed = []
+
+    async def schedule_refresh(user_id):
+        refreshed.append(user_id)
+
+    monkeypatch.setattr(chat, "schedule_refresh", schedule_refresh)
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=USER_ID)
+    app.dependency_overrides[get_db_sync] = lambda: finance_db
+    app.dependency_overrides[chat_action_limiter] = lambda: None
+    yield refreshed
+    app.dependency_overrides.clear()
+
+
+async def execute(action_type, parameters):
+    payload = {
+        "conversation_id": 1,
+        "action": {"type": action_type, "title": "", "description": "", "parameters": parameters, "confidence": 1.0},
+    }
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        return await client.post(f"{settings.API_V1_PREFIX}/chat/actions/execute", json=payload)
+
+
+@pytest.mark.asyncio
+async def test_add_expense_schedules_insights_refresh(client_app, finance_db):
+    response = await execute("add_expense", {"amount": 1500, "description": "Кофе для офиса"})
+
+    assert response.json()["success"] is True
+    assert finance_db.query(FinanceRecord).count() == 1
+    assert client_app == [USER_ID]
+
+
+@pytest.mark.asyncio
+async def test_failed_or_other_actions_do_not_refresh(client_app):
+    await execute("add_income", {"description": "без суммы"})
+    await execute("unknown", {})
+
+    assert client_app == []
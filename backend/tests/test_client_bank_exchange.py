@@ -0,0 +1,110 @@
+# Tests for 1CClientBankExchange statement parsing
+import io
+
+from app.services.client_bank_exchange import document_to_row, is_client_bank_exchange, iter_client_bank_exchange_rows
+from app.services.finance_import import statement_rows
+
+OWN = "40702810000000000001"
+OTHER = "40702810900000000002"
+
+
+def payment(**fields):
+    document = {
+        "_section": "Платежное поручение",
+        "Дата": "01.02.2024",
+        "Сумма": "1500,50",
+        "НазначениеПлатежа": "Оплата по счёту 15",
+        "ПлательщикСчет": OWN,
+        "Плательщик1": "ООО Наша фирма",
+        "ПлательщикИНН": "7701000001",
+        "ПолучательСчет": OTHER,
+        "Получатель1": "ООО Ромашка",
+        "ПолучательИНН": "7702000002",
+    }
+    document.update(fields)
+    return document
+
+
+def test_expense_from_own_account():
+    row = document_to_row(payment(ДатаСписано="02.02.2024"), {OWN})
+
+    assert row["type"] == "expense"
+    assert row["amount"] == "-1500.50"
+    assert row["date"] == "2024-02-02"
+    assert row["counterparty"] == "ООО Ромашка"
+    assert row["counterparty_inn"] == "7702000002"
+    assert row["account"] == OWN
+
+
+def test_income_to_own_account():
+    row = document_to_row(payment(ДатаПоступило="03.02.2024"), {OTHER})
+
+    assert row["type"] == "income"
+    assert row["amount"] == "1500.50"
+    assert row["date"] == "2024-02-03"
+    assert row["counterparty"] == "ООО Наша фирма"
+    assert row["counterparty_inn"] == "7701000001"
+    assert row["account"] == OTHER
+
+
+def test_direction_from_dates_without_own_accounts():
+    # Без РасчСчет в заголовке направление определяет дата списания
+    expense = document_to_row(payment(ДатаСписано="02.02.2024"), set())
+    income = document_to_row(payment(ДатаПоступило="03.02.2024"), set())
+
+    assert expense["type"] == "expense"
+    assert income["type"] == "income"
+    # Без даты списания/поступления - дата документа
+    assert income["date"] == "2024-02-03"
+    assert document_to_row(payment(), set())["date"] == "2024-02-01"
+
+
+def test_payer_with_inn_prefix():
+    row = document_to_row(payment(Плательщик1="", Плательщик="ИНН 7701000001 ООО Наша фирма"), {OTHER})
+
+    assert row["counterparty"] == "ООО Наша фирма"
+
+
+STATEMENT = """1CClientBankExchange
+ВерсияФормата=1.03
+Кодировка=Windows
+РасчСчет={own}
+СекцияДокумент=Платежное поручение
+Номер=1
+Дата=01.02.2024
+Сумма=100.00
+ПлательщикСчет={own}
+ПолучательСчет={other}
+Получатель1=ООО Ромашка
+ДатаСписано=01.02.2024
+КонецДокумента
+СекцияДокумент=Платежное поручение
+Номер=2
+Дата=02.02.2024
+Сумма=250.00
+ПлательщикСчет={other}
+Плательщик1=ООО Ромашка
+ПолучательСчет={own}
+ДатаПоступило=02.02.2024
+КонецДокумента
+КонецФайла
+""".format(own=OWN, other=OTHER)
+
+
+def test_statement_in_cp1251():
+    data = STATEMENT.encode("cp1251")
+    assert is_client_bank_exchange(data[:64])
+
+    rows = list(statement_rows(io.BytesIO(data), "kl_to_1c.txt"))
+
+    assert [(line, row["type"], row["amount"]) for line, row, _ in rows] == [
+        (5, "expense", "-100.00"),
+        (14, "income", "250.00"),
+    ]
+
+
+def test_stream_left_open():
+    stream = io.BytesIO(STATEMENT.encode("utf-8"))
+    list(iter_client_bank_exchange_rows(stream))
+
+    assert not stream.closed
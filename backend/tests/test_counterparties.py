@@ -0,0 +1,153 @@
+# Tests for counterparty normalization, batch resolution and backfill
+from datetime import date
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from sqlalchemy.dialects import sqlite
+
+from app import redis_client
+from app.celery_worker import backfill_on_startup
+from app.models.counterparty import Counterparty
+from app.models.finance import FinanceRecord
+from app.services import counterparties
+from app.services.counterparties import (
+    CounterpartyResolver,
+    _unlinked,
+    normalize_counterparty_name,
+    normalize_inn,
+)
+
+USER_ID = 1
+
+
+@pytest.fixture
+def counterparty_db(finance_db, monkeypatch):
+    """finance_db с частичными уникальными индексами контрагентов, как в PostgreSQL"""
+    with finance_db.get_bind().begin() as connection:
+        # postgresql_where не переносится в SQLite: частичные индексы создаются вручную
+        connection.exec_driver_sql("DROP INDEX uq_counterparties_user_name_without_inn")
+        connection.exec_driver_sql(
+            "CREATE UNIQUE INDEX uq_counterparties_user_name_without_inn "
+            "ON counterparties (user_id, normalized_name) WHERE inn IS NULL"
+        )
+        connection.exec_driver_sql("DROP INDEX uq_counterparties_user_inn")
+        connection.exec_driver_sql(
+            "CREATE UNIQUE INDEX uq_counterparties_user_inn ON counterparties (user_id, inn) WHERE inn IS NOT NULL"
+        )
+    monkeypatch.setattr(counterparties, "insert", sqlite.insert)
+    return finance_db
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("7701234567", "7701234567"),
+    ("770123456789", "770123456789"),
+    ("7701234567/770101001", "7701234567"),
+    ("7701234567\\770101001", "7701234567"),
+    (" 7701234567 770101001", "7701234567"),
+    ("ИНН 7701234567", "7701234567"),
+    ("77012345678", None),
+    ("7701234567890", None),
+    ("12345", None),
+    ("", None),
+    (None, None),
+])
+def test_normalize_inn(value, expected):
+    assert normalize_inn(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("ООО «Ромашка»", "ромашка"),
+    ("Ромашка ООО", "ромашка"),
+    ('ооо "ромашка"', "ромашка"),
+    ('Общество с ограниченной ответственностью "Ёлка"', "елка"),
+    ("ИП Иванов И.И.", "иванов и и"),
+    ("ИП", "ип"),
+    ("Газпромнефть", "газпромнефть"),
+    (None, ""),
+])
+def test_normalize_counterparty_name(value, expected):
+    assert normalize_counterparty_name(value) == expected
+
+
+def test_same_batch_name_and_inn_merge(counterparty_db):
+    ids = CounterpartyResolver(counterparty_db, USER_ID).resolve_batch([
+        ("ООО Ромашка", None),
+        ("Ромашка ООО", "7701234567/770101001"),
+        ('ооо "ромашка"', None),
+        (None, None),
+        ("", ""),
+    ])
+
+    assert ids[0] == ids[1] == ids[2] is not None
+    assert ids[3] is None and ids[4] is None
+    counterparty = counterparty_db.query(Counterparty).one()
+    assert counterparty.inn == "7701234567"
+
+
+def test_inn_assigned_to_counterparty_known_by_name(counterparty_db):
+    first = CounterpartyResolver(counterparty_db, USER_ID).resolve("ООО Ромашка", None)
+    counterparty_db.commit()
+
+    # Новый резолвер (следующий импорт): контрагент загружается из БД и получает ИНН
+    second = CounterpartyResolver(counterparty_db, USER_ID).resolve("Ромашка", "7701234567")
+    counterparty_db.commit()
+
+    assert second == first
+    assert counterparty_db.get(Counterparty, first).inn == "7701234567"
+    assert CounterpartyResolver(counterparty_db, USER_ID).resolve("Ромашка", None) == first
+
+
+def test_inn_is_the_key(counterparty_db):
+    resolver = CounterpartyResolver(counterparty_db, USER_ID)
+    ids = resolver.resolve_batch([
+        ("ООО Ромашка", "7701234567"),
+        ("Ромашка-Сервис", "7701234567"),
+        ("ООО Ромашка", "7709876543"),
+    ])
+
+    assert ids[0] == ids[1]
+    assert ids[2] != ids[0]
+    assert counterparty_db.query(Counterparty).count() == 2
+    # Другой пользователь получает своих контрагентов
+    assert CounterpartyResolver(counterparty_db, USER_ID + 1).resolve("ООО Ромашка", "7701234567") not in ids
+
+
+def test_unlinked_matches_resolver_definition(counterparty_db):
+    parties = [
+        ("ООО Ромашка", None),
+        ("-", None),
+        ("—", "123"),
+        ("", "7701234567/770101001"),
+        (None, "ИНН 770123456789"),
+        (None, None),
+    ]
+    counterparty_db.add_all([
+        FinanceRecord(user_id=USER_ID, date=date(2024, 1, 1), amount=100, type="expense",
+                      counterparty=name, counterparty_inn=inn)
+        for name, inn in parties
+    ])
+    counterparty_db.commit()
+
+    unlinked = counterparty_db.query(FinanceRecord.counterparty, FinanceRecord.counterparty_inn).filter(
+        _unlinked(FinanceRecord, FinanceRecord.counterparty, FinanceRecord.counterparty_inn)
+    ).order_by(FinanceRecord.id).all()
+
+    resolved = CounterpartyResolver(counterparty_db, USER_ID).resolve_batch(parties)
+    assert [tuple(row) for row in unlinked] == [
+        party for party, counterparty_id in zip(parties, resolved) if counterparty_id is not None
+    ]
+    assert len(unlinked) == 3
+
+
+def test_backfill_queued_once(monkeypatch):
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_client, "get_sync_redis", lambda: redis)
+    sent = []
+    sender = SimpleNamespace(app=SimpleNamespace(send_task=sent.append))
+
+    # Два воркера и перезапуск
+    for _ in range(3):
+        backfill_on_startup(sender)
+
+    assert sent == ["app.tasks.backfill_counterparties"]
@@ -0,0 +1,132 @@
+# Tests for transaction anomaly detectors
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.models.finance import FinanceDailyRollup, FinanceRecord
+from app.services.finance_anomalies import (
+    find_amount_outliers,
+    find_category_spikes,
+    find_new_counterparties,
+    robust_z,
+)
+
+USER_ID = 1
+TODAY = date(2024, 7, 15)
+
+
+def add_records(db, *records):
+    for day, amount, category, counterparty in records:
+        db.add(FinanceRecord(
+            user_id=USER_ID, date=day, amount=amount, type="expense",
+            category=category, counterparty=counterparty, description="Оплата"
+        ))
+    db.commit()
+
+
+def add_monthly(db, category, amounts):
+    """Траты по категории: по одной строке rollup на месяц, последний - прошлый месяц"""
+    month = np.datetime64(TODAY, 'M') - np.timedelta64(len(amounts), 'M')
+    for offset, amount in enumerate(amounts):
+        day = (month + np.timedelta64(offset, 'M')).astype('datetime64[D]').item() + timedelta(days=9)
+        db.add(FinanceDailyRollup(user_id=USER_ID, day=day, type="expense", category=category, amount=amount, count=1))
+    db.commit()
+
+
+def test_robust_z_per_group():
+    codes = np.array([0, 0, 0, 0, 1, 1, 1])
+    amounts = np.array([100.0, 110.0, 90.0, 1000.0, 5.0, 5.0, 5.0])
+
+    z, medians = robust_z(codes, amounts, 2)
+
+    np.testing.assert_allclose(medians, [105, 5])
+    assert z[3] > 3.5 > z[0]
+    # Нулевой разброс в группе не даёт выбросов
+    assert not z[4:].any()
+
+
+def test_amount_outlier_in_recent_month(finance_db):
+    add_records(finance_db, *[
+        (TODAY - timedelta(days=40 + 7 * i), 1000 + 10 * (i % 5), "Продукты", None) for i in range(12)
+    ])
+    add_records(
+        finance_db,
+        (TODAY - timedelta(days=3), 9000, "Продукты", None),
+        (TODAY - timedelta(days=2), 1020, "Продукты", None),
+        # Мало наблюдений в категории: не оценивается
+        (TODAY - timedelta(days=1), 50000, "Техника", None),
+    )
+
+    insights = find_amount_outliers(finance_db, USER_ID, TODAY)
+
+    assert len(insights) == 1
+    assert insights[0].category == "Продукты"
+    assert insights[0].amount == 9000
+    assert "12.07.2024" in insights[0].description
+
+
+def test_old_outlier_not_reported(finance_db):
+    add_records(finance_db, *[
+        (TODAY - timedelta(days=40 + 7 * i), 1000 + 10 * (i % 5), "Продукты", None) for i in range(12)
+    ])
+    add_records(finance_db, (TODAY - timedelta(days=100), 9000, "Продукты", None))
+
+    assert find_amount_outliers(finance_db, USER_ID, TODAY) == []
+
+
+def test_no_history_no_outliers(finance_db):
+    assert find_amount_outliers(finance_db, USER_ID, TODAY) == []
+
+
+def test_category_spike_against_baseline(finance_db):
+    add_monthly(finance_db, "Такси", [1000, 1100, 900, 1000, 1050, 950, 1000, 1000, 1100, 900, 1000, 1000, 3000])
+    add_monthly(finance_db, "Продукты", [10000, 10500, 9800, 10200, 9900, 10100, 10000, 10300, 9700, 10000, 10100, 9900, 10400])
+
+    insights = find_category_spikes(finance_db, USER_ID, TODAY)
+
+    assert len(insights) == 1
+    assert insights[0].category == "Такси"
+    assert insights[0].amount == 2000
+    assert "06.2024" in insights[0].description
+
+
+def test_spike_needs_baseline_months(finance_db):
+    # Категория появилась недавно: истории для базы не хватает
+    add_monthly(finance_db, "Такси", [1000, 5000])
+
+    assert find_category_spikes(finance_db, USER_ID, TODAY) == []
+
+
+def test_seasonal_month_is_not_a_spike(finance_db):
+    # Тот же месяц год назад был таким же: база учитывает сезонность
+    add_monthly(finance_db, "Отпуск", [3000, 1000, 900, 1000, 1100, 1000, 950, 1000, 1050, 1000, 1000, 1000, 3000])
+
+    assert find_category_spikes(finance_db, USER_ID, TODAY) == []
+
+
+def test_new_large_counterparty(finance_db):
+    for i in range(10):
+        add_records(finance_db, *[
+            (TODAY - timedelta(days=60 + 30 * month), 500 + 100 * i, None, f"Магазин {i}") for month in range(3)
+        ])
+    add_records(
+        finance_db,
+        (TODAY - timedelta(days=5), 20000, None, "ООО Новый"),
+        (TODAY - timedelta(days=4), 300, None, "Кофейня"),
+    )
+
+    insights = find_new_counterparties(finance_db, USER_ID, TODAY)
+
+    assert [insight.title for insight in insights] == ["Новый контрагент: ООО Новый"]
+    assert insights[0].amount == 20000
+    assert "10.07.2024" in insights[0].description
+
+
+def test_only_new_counterparties(finance_db):
+    add_records(
+        finance_db,
+        (TODAY - timedelta(days=5), 20000, None, "ООО Новый"),
+        (TODAY - timedelta(days=4), 300, None, "Кофейня"),
+    )
+
+    assert find_new_counterparties(finance_db, USER_ID, TODAY) == []
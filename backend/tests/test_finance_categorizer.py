@@ -0,0 +1,44 @@
+# Tests for keyword categorization
+import random
+
+from app.services.finance_categorizer import KeywordAutomaton, CompiledRules, CategoryMatcher, OTHER, UNCATEGORIZED
+
+
+def brute_force_matches(keywords, text):
+    return {index for index, keyword in enumerate(keywords) if keyword in text}
+
+
+def test_automaton_matches_brute_force():
+    rng = random.Random(42)
+    # Маленький алфавит даёт много пересекающихся и вложенных ключевых слов
+    alphabet = "абв"
+    for _ in range(200):
+        keywords = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 5))) for _ in range(rng.randint(1, 15))]
+        automaton = KeywordAutomaton(keywords)
+        for _ in range(20):
+            text = "".join(rng.choice(alphabet + " ") for _ in range(rng.randint(0, 40)))
+            assert automaton.matches(text) == brute_force_matches(keywords, text), (keywords, text)
+
+
+def test_automaton_overlapping_keywords():
+    keywords = ["he", "she", "his", "hers"]
+    assert KeywordAutomaton(keywords).matches("ushers") == {0, 1, 3}
+
+
+def test_duplicate_keywords_all_reported():
+    assert KeywordAutomaton(["кафе", "кафе"]).matches("кафе у дома") == {0, 1}
+
+
+def test_compiled_rules_ignore_other_transaction_type():
+    rules = CompiledRules([("такси", "Транспорт", "expense", 1.0), ("такси", "Подработка", "income", 1.0)])
+    scores = {}
+    rules.score("поездка такси", "expense", scores)
+    assert list(scores) == ["Транспорт"]
+
+
+def test_builtin_rules_without_db():
+    matcher = CategoryMatcher()
+    assert matcher.categorize("", "expense") == UNCATEGORIZED
+    assert matcher.categorize("zzz qqq", "expense") == OTHER
+    assert matcher.categorize("АРЕНДА офиса за май", "expense")[0] == "Недвижимость"
+    assert matcher.categorize("аренда офиса за май", "income")[0] == "Доход от аренды"
@@ -0,0 +1,60 @@
+# Tests for the learned category classifier and its cold-start fallback
+from datetime import date
+
+import pytest
+
+from app.config import settings
+from app.models.finance import FinanceCategoryModel, FinanceRecord
+from app.services import finance_classifier
+from app.services.finance_categorizer import category_matcher
+
+USER_ID = 1
+
+
+def add_verified(db, description, category, transaction_type="expense", count=1):
+    db.add_all([
+        FinanceRecord(
+            user_id=USER_ID, date=date(2024, 1, 1), amount=100, type=transaction_type,
+            description=description, category=category, is_verified=True
+        )
+        for _ in range(count)
+    ])
+    db.commit()
+
+
+ITEMS = [("аренда склада", "expense"), ("ООО Ромашка по счёту 15", "expense"), ("", "expense")]
+
+
+def test_cold_start_uses_rules(finance_db, monkeypatch):
+    monkeypatch.setattr(finance_classifier, "category_models", finance_classifier.CategoryModelCache(4))
+
+    assert finance_classifier.categorize_batch(ITEMS, finance_db, USER_ID) == category_matcher.categorize_batch(ITEMS, finance_db, USER_ID)
+
+
+def test_too_few_samples_keeps_rules(finance_db, monkeypatch):
+    monkeypatch.setattr(finance_classifier, "category_models", finance_classifier.CategoryModelCache(4))
+    add_verified(finance_db, "ООО Ромашка поставка", "Закупки", count=3)
+    add_verified(finance_db, "ИП Иванов услуги", "Подрядчики", count=3)
+
+    result = finance_classifier.train_user_model(finance_db, USER_ID)
+
+    assert result["trained"] is False
+    assert finance_db.query(FinanceCategoryModel).count() == 0
+    assert finance_classifier.categorize_batch(ITEMS, finance_db, USER_ID) == category_matcher.categorize_batch(ITEMS, finance_db, USER_ID)
+
+
+def test_trained_model_overrides_weak_rule_match(finance_db, monkeypatch):
+    monkeypatch.setattr(settings, "CATEGORY_MODEL_MIN_SAMPLES", 10)
+    monkeypatch.setattr(finance_classifier, "category_models", finance_classifier.CategoryModelCache(4))
+    add_verified(finance_db, "ООО Ромашка поставка", "Закупки", count=10)
+    add_verified(finance_db, "ИП Иванов услуги", "Подрядчики", count=10)
+
+    assert finance_classifier.train_user_model(finance_db, USER_ID)["trained"] is True
+    results = finance_classifier.categorize_batch(ITEMS + [("ООО Ромашка", "income")], finance_db, USER_ID)
+
+    rules = category_matcher.categorize_batch(ITEMS + [("ООО Ромашка", "income")], finance_db, USER_ID)
+    assert results[1][0] == "Закупки"
+    assert results[1][1] > rules[1][1]
+    # Пустое описание и тип без обученных классов остаются за правилами
+    assert results[2] == rules[2]
+    assert results[3] == rules[3]
@@ -0,0 +1,47 @@
+# Tests for finance export formula neutralisation
+import csv
+import io
+from datetime import date
+
+import pytest
+from openpyxl import load_workbook
+from sqlalchemy.orm import sessionmaker
+
+from app.models.finance import FinanceRecord
+from app.services import finance_export
+
+USER_ID = 1
+DESCRIPTIONS = ['=HYPERLINK("http://evil","x")', '+1+2', '-5', '@SUM(A1)', '\tтаб', 'Аренда офиса']
+
+
+@pytest.fixture
+def criteria(finance_db, monkeypatch):
+    finance_db.add_all([
+        FinanceRecord(user_id=USER_ID, date=date(2024, 1, i + 1), amount=100, type="expense", description=description)
+        for i, description in enumerate(DESCRIPTIONS)
+    ])
+    finance_db.commit()
+    # Экспорт открывает собственную сессию: та же база через общее соединение
+    monkeypatch.setattr(finance_export, "SyncSessionLocal", sessionmaker(bind=finance_db.get_bind()))
+    return finance_export.record_filters(USER_ID)
+
+
+def test_csv_prefixes_formulas(criteria):
+    data = b"".join(finance_export.stream_csv(criteria)).decode("utf-8-sig")
+    rows = list(csv.reader(io.StringIO(data), delimiter=';'))
+
+    descriptions = [row[5] for row in rows[1:]]
+    assert descriptions[:5] == ["'" + value for value in DESCRIPTIONS[:5]]
+    assert descriptions[5] == 'Аренда офиса'
+    # Суммы расходов остаются числами
+    assert rows[1][2] == '-100.00'
+
+
+def test_xlsx_writes_formulas_as_strings(criteria):
+    data = b"".join(finance_export.stream_xlsx(criteria))
+    sheet = load_workbook(io.BytesIO(data)).active
+
+    cells = [row[5] for row in sheet.iter_rows(min_row=2)]
+    assert [cell.value for cell in cells] == DESCRIPTIONS
+    assert all(cell.data_type == 's' for cell in cells)
+    assert all(row[2].data_type == 'n' for row in sheet.iter_rows(min_row=2))
@@ -0,0 +1,166 @@
+# Tests for the cash flow forecast
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.models.finance import FinanceDailyRollup, FinanceRecord
+from app.models.sync import SyncTombstone
+from app.services import finance_forecast
+from app.services.finance_forecast import (
+    ForecastCache,
+    build_forecast,
+    find_recurring_payments,
+    forecast_series,
+    holt_forecast,
+)
+
+USER_ID = 1
+TODAY = date(2024, 7, 15)
+
+
+@pytest.fixture
+def forecast_db(finance_db):
+    SyncTombstone.__table__.create(finance_db.get_bind())
+    return finance_db
+
+
+def add_record(db, day, amount, transaction_type="expense", counterparty=None, description="Оплата"):
+    """Запись и её дневной агрегат (в PostgreSQL rollup ведёт триггер)"""
+    db.add(FinanceRecord(
+        user_id=USER_ID, date=day, amount=amount, type=transaction_type,
+        counterparty=counterparty, description=description
+    ))
+    rollup = db.get(FinanceDailyRollup, (USER_ID, day, transaction_type, ''))
+    if rollup is None:
+        db.add(FinanceDailyRollup(user_id=USER_ID, day=day, type=transaction_type, category='', amount=amount, count=1))
+    else:
+        rollup.amount += amount
+        rollup.count += 1
+    db.commit()
+
+
+def test_holt_follows_linear_trend():
+    history = np.array([[100.0 + 10 * month for month in range(24)]])
+
+    forecast = holt_forecast(history, 3)
+
+    np.testing.assert_allclose(forecast[0], [340, 350, 360], rtol=0.01)
+
+
+def test_short_history_uses_simple_models():
+    # Меньше 4 месяцев: только среднее
+    forecast, methods = forecast_series(np.array([[100.0, 200.0], [50.0, 50.0]]), 2)
+    assert methods == ['mean', 'mean']
+    np.testing.assert_allclose(forecast, [[150, 150], [50, 50]])
+
+    # Меньше 12 месяцев: сезонная модель не рассматривается
+    trend = np.array([[100.0 + 50 * month for month in range(10)], [80.0] * 10])
+    _, methods = forecast_series(trend, 3)
+    assert methods == ['holt', 'mean']
+
+
+def test_seasonal_history_picks_seasonal_naive():
+    season = np.array([100.0, 100, 100, 100, 100, 500, 100, 100, 100, 100, 100, 900])
+    history = np.vstack([np.tile(season, 3), np.tile(season, 3) / 2])
+
+    forecast, methods = forecast_series(history, 12)
+
+    assert methods == ['seasonal_naive', 'seasonal_naive']
+    np.testing.assert_allclose(forecast[0], season)
+
+
+def test_forecast_is_never_negative():
+    history = np.array([[1000.0 - 100 * month for month in range(12)]])
+
+    forecast, _ = forecast_series(history, 12)
+
+    assert (forecast >= 0).all()
+
+
+def test_empty_history(forecast_db):
+    forecast = build_forecast(forecast_db, USER_ID, horizon=3, today=TODAY)
+
+    assert forecast.history_months == 0
+    assert forecast.methods == {'income': 'none', 'expense': 'none'}
+    assert [point.month for point in forecast.forecast] == ['2024-07', '2024-08', '2024-09']
+    assert all(point.income == 0 and point.expense == 0 for point in forecast.forecast)
+
+
+def test_recurring_payments(forecast_db):
+    for month in range(1, 7):
+        add_record(forecast_db, date(2024, month, 5), 30000 + month * 10, counterparty="ООО Арендодатель")
+        add_record(forecast_db, date(2024, month, 10), 300 * month, description="Такси")
+    # Подписка закончилась: нет платежей в двух последних месяцах
+    for month in range(1, 5):
+        add_record(forecast_db, date(2024, month, 20), 990, description="Старая подписка")
+    # Доход в трёх месяцах из шести - не регулярный
+    for month in (2, 4, 6):
+        add_record(forecast_db, date(2024, month, 25), 5000, "income", description="Разовый заказ")
+
+    payments = find_recurring_payments(forecast_db, USER_ID, date(2024, 6, 1))
+
+    # lower() в SQLite не меняет регистр кириллицы
+    assert [(p.name.lower(), p.type, p.months_seen) for p in payments] == [("ооо арендодатель", "expense", 6)]
+    assert payments[0].amount == pytest.approx(30035, abs=10)
+
+
+def test_recurring_payments_are_forecast_floor(forecast_db):
+    # Аренда каждый месяц: прогноз расходов не ниже неё
+    for month in range(1, 7):
+        add_record(forecast_db, date(2024, month, 5), 20000, counterparty="Аренда")
+    add_record(forecast_db, date(2024, 1, 20), 1, "income", description="Проценты")
+
+    forecast = build_forecast(forecast_db, USER_ID, horizon=6, today=TODAY)
+
+    assert forecast.history_months == 6
+    assert all(point.expense >= 20000 for point in forecast.forecast)
+
+
+def test_cache_invalidation(forecast_db, monkeypatch):
+    calls = []
+
+    def build(db, user_id, horizon, today=None):
+        calls.append(user_id)
+        return build_forecast(db, user_id, horizon, today=TODAY)
+
+    class Today(date):
+        current = TODAY
+
+        @classmethod
+        def today(cls):
+            return cls.current
+
+    monkeypatch.setattr(finance_forecast, "build_forecast", build)
+    monkeypatch.setattr(finance_forecast, "date", Today)
+    cache = ForecastCache(size=2)
+
+    first = cache.get(forecast_db, USER_ID, 3)
+    assert len(cache.get(forecast_db, USER_ID, 6).forecast) == 6
+    assert len(first.forecast) == 3
+    assert len(calls) == 1
+
+    # Новая запись меняет курсор изменений
+    add_record(forecast_db, date(2024, 7, 1), 100)
+    forecast_db.query(FinanceRecord).update({FinanceRecord.change_seq: 2})
+    forecast_db.commit()
+    cache.get(forecast_db, USER_ID, 3)
+    assert len(calls) == 2
+
+    # Удаление - курсор надгробия
+    forecast_db.add(SyncTombstone(id=1, user_id=USER_ID, entity='finance_record', entity_id=99, change_seq=3))
+    forecast_db.commit()
+    cache.get(forecast_db, USER_ID, 3)
+    assert len(calls) == 3
+
+    # Новый месяц: прошлый месяц становится полным
+    Today.current = date(2024, 8, 1)
+    cache.get(forecast_db, USER_ID, 3)
+    cache.get(forecast_db, USER_ID, 3)
+    assert len(calls) == 4
+
+    # Вытеснение LRU
+    cache.get(forecast_db, USER_ID + 1, 3)
+    cache.get(forecast_db, USER_ID + 2, 3)
+    cache.get(forecast_db, USER_ID, 3)
+    assert len(calls) == 7
@@ -0,0 +1,118 @@
+# Tests for import fingerprints of repeated operations
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from openpyxl import Workbook
+
+from app.models.finance import FinanceRecord
+from app.services.finance_import import FinanceImportPipeline, OccurrenceCounter, record_fingerprint, statement_rows
+from app.services.finance_service import FinanceService
+from app.services.statement_format import SAMPLE_SIZE
+
+USER_ID = 1
+
+STATEMENT = (
+    "Дата;Описание;Сумма\n"
+    "01.02.2024;Кофе;-150,00\n"
+    "01.02.2024;Кофе;-150,00\n"
+    "01.02.2024;КОФЕ ;-150\n"
+    "02.02.2024;Аренда;-1000\n"
+).encode()
+
+
+def run_import(db, data, batch_size=2):
+    pipeline = FinanceImportPipeline(db, USER_ID, "statement.csv", batch_size=batch_size)
+    pipeline.run(statement_rows(io.BytesIO(data), "statement.csv"))
+    db.commit()
+    return pipeline
+
+
+def xlsx_bytes(rows):
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def test_fingerprint_numbers_repeats():
+    day = date(2024, 2, 1)
+    first = record_fingerprint(day, "expense", Decimal("150"), "Кофе", None, 1)
+
+    assert first != record_fingerprint(day, "expense", Decimal("150"), "Кофе", None, 2)
+    assert first == record_fingerprint(day, "expense", Decimal("150.00"), "  кофе ", "", 1)
+    assert first != record_fingerprint(day, "income", Decimal("150"), "Кофе", None, 1)
+
+
+def test_occurrence_counter_keeps_a_window_of_dates():
+    occurrences = OccurrenceCounter(window=3)
+    start = date(2024, 1, 1)
+    for day in range(100):
+        for _ in range(5):
+            occurrences.next(start + timedelta(days=day), "base")
+    assert occurrences.next(start + timedelta(days=99), "base") == 6
+    assert occurrences.next(start + timedelta(days=99), "other") == 1
+    assert len(occurrences._by_date) == 3
+
+    # Даты внутри окна можно перемешивать
+    assert occurrences.next(start + timedelta(days=97), "base") == 6
+
+
+def test_foreign_byte_after_encoding_sample(finance_db):
+    rows = "".join(f"01.02.2024;Оплата {i};-{100 + i},00\n" for i in range(3000))
+    data = ("Дата;Описание;Сумма\n" + rows).encode()
+    assert len(data) > SAMPLE_SIZE
+    # Кодировка определена как UTF-8, а в конце строка в cp1251
+    data += "02.02.2024;Оплата по счёту;-500,00\n".encode("cp1251")
+
+    pipeline = run_import(finance_db, data, batch_size=500)
+
+    assert pipeline.records_created == 3001
+    last = finance_db.query(FinanceRecord).filter(FinanceRecord.date == date(2024, 2, 2)).one()
+    assert last.amount == 500
+    assert "\ufffd" in last.description
+
+
+def test_repeated_rows_in_one_file_are_kept(finance_db):
+    pipeline = run_import(finance_db, STATEMENT)
+
+    assert pipeline.records_created == 4
+    fingerprints = [fingerprint for (fingerprint,) in finance_db.query(FinanceRecord.fingerprint)]
+    assert len(set(fingerprints)) == 4
+
+
+def test_reimport_skips_every_row(finance_db):
+    run_import(finance_db, STATEMENT)
+    pipeline = run_import(finance_db, STATEMENT, batch_size=3)
+
+    assert pipeline.records_created == 0
+    assert pipeline.records_skipped == 4
+    assert finance_db.query(FinanceRecord).count() == 4
+
+
+def test_extra_repeat_in_newer_statement_is_added(finance_db):
+    run_import(finance_db, STATEMENT)
+    pipeline = run_import(finance_db, STATEMENT + "03.02.2024;Кофе;-150\n01.02.2024;Кофе;-150\n".encode())
+
+    assert pipeline.records_created == 2
+    assert pipeline.records_skipped == 4
+
+
+@pytest.mark.parametrize("data", [
+    b"not a zip archive",
+    xlsx_bytes([["a", "b"], [1, 2]]),
+])
+def test_xlsx_format_errors_raised_eagerly(data):
+    with pytest.raises(ValueError):
+        statement_rows(io.BytesIO(data), "statement.xlsx")
+
+
+@pytest.mark.asyncio
+async def test_xlsx_format_error_reported_by_upload(finance_db):
+    result = await FinanceService.upload_statement(finance_db, USER_ID, io.BytesIO(b"not a zip archive"), "statement.xlsx")
+
+    assert result.success is False
+    assert result.errors[0].startswith("Не удалось определить формат файла")
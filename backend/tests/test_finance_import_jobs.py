@@ -0,0 +1,181 @@
+# Tests for chunked statement uploads and resumable import jobs
+import io
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+
+from app.auth import get_current_user
+from app.config import settings
+from app.database import get_db_sync
+from app.main import app
+from app.models.finance import FinanceImportJob, FinanceRecord
+from app.rate_limit import import_rows_quota
+from app.services import finance_import_jobs
+from app.services.finance_import import FinanceImportPipeline, statement_rows
+
+USER_ID = 1
+
+
+@pytest.fixture
+def jobs(finance_db, monkeypatch, tmp_path):
+    FinanceImportJob.__table__.create(finance_db.get_bind())
+    monkeypatch.setattr(settings, "IMPORT_UPLOAD_DIR", str(tmp_path))
+    enqueued = []
+    monkeypatch.setattr(finance_import_jobs, "enqueue_job", enqueued.append)
+    monkeypatch.setattr(import_rows_quota, "charge_sync", lambda user_id, rows: None)
+    return enqueued
+
+
+async def body(*parts):
+    for part in parts:
+        yield part
+
+
+def statement(rows):
+    lines = ["Дата;Описание;Сумма"]
+    for i in range(rows):
+        # Операции повторяются по всему файлу: номера повторов восстанавливаются при продолжении
+        lines.append(f"01.02.2024;Оплата {i % 1500};-{100 + i % 1500},00")
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def upload(db, data, chunk_size):
+    job = finance_import_jobs.create_job(db, USER_ID, "statement.csv", len(data))
+    for offset in range(0, len(data), chunk_size):
+        job = await finance_import_jobs.receive_chunk(db, job, offset, body(data[offset:offset + chunk_size]))
+        assert job is not None
+    return job
+
+
+@pytest.mark.asyncio
+async def test_upload_queues_job_when_complete(finance_db, jobs):
+    data = statement(10)
+    job = await upload(finance_db, data, chunk_size=50)
+
+    assert job.status == "queued"
+    assert job.received_size == len(data)
+    assert jobs == [job.id]
+    with open(finance_import_jobs.upload_path(job.id), "rb") as file:
+        assert file.read() == data
+
+
+@pytest.mark.asyncio
+async def test_stale_offset_is_rejected(finance_db, jobs):
+    job = finance_import_jobs.create_job(finance_db, USER_ID, "statement.csv", 10)
+    assert await finance_import_jobs.receive_chunk(finance_db, job, 0, body(b"12345")) is not None
+
+    # Повтор той же части (например, после таймаута ответа) не сдвигает смещение
+    assert await finance_import_jobs.receive_chunk(finance_db, job, 0, body(b"abcde")) is None
+
+    finance_db.refresh(job)
+    assert job.received_size == 5
+    with open(finance_import_jobs.upload_path(job.id), "rb") as file:
+        assert file.read() == b"12345"
+
+
+@pytest.mark.asyncio
+async def test_unconfirmed_tail_is_truncated(finance_db, jobs):
+    job = finance_import_jobs.create_job(finance_db, USER_ID, "statement.csv", 10)
+    await finance_import_jobs.receive_chunk(finance_db, job, 0, body(b"12345"))
+    # Часть записана, но смещение не подтверждено (обрыв до commit)
+    with open(finance_import_jobs.upload_path(job.id), "ab") as file:
+        file.write(b"garbage")
+
+    await finance_import_jobs.receive_chunk(finance_db, job, 5, body(b"67", b"890"))
+
+    with open(finance_import_jobs.upload_path(job.id), "rb") as file:
+        assert file.read() == b"1234567890"
+    assert job.status == "queued"
+
+
+@pytest.mark.asyncio
+async def test_oversized_chunk_leaves_offset(finance_db, jobs):
+    job = finance_import_jobs.create_job(finance_db, USER_ID, "statement.csv", 10)
+
+    with pytest.raises(ValueError):
+        await finance_import_jobs.receive_chunk(finance_db, job, 0, body(b"12345", b"678901"))
+
+    finance_db.refresh(job)
+    assert job.received_size == 0
+    assert job.status == "uploading"
+
+
+@pytest.mark.asyncio
+async def test_chunk_endpoint_conflict(finance_db, jobs):
+    job = finance_import_jobs.create_job(finance_db, USER_ID, "statement.csv", 10)
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=USER_ID)
+    app.dependency_overrides[get_db_sync] = lambda: finance_db
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            url = f"{settings.API_V1_PREFIX}/finance/imports/{job.id}/chunks"
+            accepted = await client.put(url, params={"offset": 0}, content=b"12345")
+            wrong = await client.put(url, params={"offset": 3}, content=b"67890")
+            missing = await client.put(f"{settings.API_V1_PREFIX}/finance/imports/999/chunks",
+                                       params={"offset": 0}, content=b"1")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert accepted.status_code == 200
+    assert accepted.json()["received_size"] == 5
+    assert wrong.status_code == 409
+    assert wrong.headers["Upload-Offset"] == "5"
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_resume_from_checkpoint(finance_db, jobs, monkeypatch):
+    rows = 4500
+    job = await upload(finance_db, statement(rows), chunk_size=32 * 1024)
+
+    checkpoints = []
+
+    def crash_after_first_checkpoint(user_id, count):
+        checkpoints.append(count)
+        if len(checkpoints) == 1:
+            raise RuntimeError("worker lost")
+
+    monkeypatch.setattr(import_rows_quota, "charge_sync", crash_after_first_checkpoint)
+    with pytest.raises(RuntimeError):
+        finance_import_jobs.run_import_job(finance_db, job.id)
+
+    finance_db.refresh(job)
+    assert job.status == "queued"
+    assert 0 < job.rows_processed < rows
+    assert finance_db.query(FinanceRecord).count() == job.rows_processed
+
+    job = finance_import_jobs.run_import_job(finance_db, job.id)
+
+    assert job.status == "completed"
+    assert job.rows_processed == rows
+    assert job.records_created == rows
+    assert job.records_skipped == 0
+    assert finance_db.query(FinanceRecord).count() == rows
+    assert len({fingerprint for (fingerprint,) in finance_db.query(FinanceRecord.fingerprint)}) == rows
+    assert sum(checkpoints) == rows
+    assert finance_db.query(FinanceImportJob).filter(FinanceImportJob.status == "completed").count() == 1
+
+
+def test_skip_rows_restores_repeat_numbers(finance_db):
+    data = (
+        "Дата;Описание;Сумма\n"
+        "01.02.2024;Кофе;-150,00\n"
+        "01.02.2024;Кофе;-150,00\n"
+        "01.02.2024;Кофе;-150,00\n"
+        "02.02.2024;Аренда;-1000\n"
+    ).encode()
+
+    def run(skip_rows, rows=None):
+        pipeline = FinanceImportPipeline(finance_db, USER_ID, "statement.csv", batch_size=2)
+        source = statement_rows(io.BytesIO(data), "statement.csv")
+        pipeline.run(source if rows is None else list(source)[:rows], skip_rows=skip_rows)
+        finance_db.commit()
+        return pipeline
+
+    # Первые две строки уже импортированы до падения
+    run(0, rows=2)
+    pipeline = run(skip_rows=2)
+
+    assert pipeline.records_created == 2
+    assert pipeline.records_skipped == 0
+    assert finance_db.query(FinanceRecord).count() == 4
@@ -0,0 +1,166 @@
+# Tests for Idempotency-Key replay
+import asyncio
+import hashlib
+
+import pytest
+from fakeredis import aioredis as fake_aioredis
+from httpx import AsyncClient
+from redis.exceptions import ConnectionError as RedisConnectionError
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app import idempotency
+from app.config import settings
+from app.idempotency import IdempotencyMiddleware
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fake_aioredis.FakeRedis(decode_responses=True)
+
+    async def get_redis():
+        return client
+
+    monkeypatch.setattr(idempotency, "get_redis", get_redis)
+    return client
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def service(calls):
+    async def verify_all(request):
+        payload = await request.json()
+        calls.append(payload)
+        if payload.get("delay"):
+            await asyncio.sleep(payload["delay"])
+        if payload.get("fail"):
+            return JSONResponse({"detail": "boom"}, status_code=503)
+        return JSONResponse({"updated": len(payload["ids"]), "call": len(calls)})
+
+    app = Starlette(routes=[Route("/records/bulk", verify_all, methods=["POST", "PATCH", "PUT"])])
+    return IdempotencyMiddleware(app, routes=[("PATCH", "/records/bulk"), ("POST", "/records/bulk")])
+
+
+async def send(service, method, key=None, payload=None):
+    headers = {"Idempotency-Key": key} if key else {}
+    async with AsyncClient(app=service, base_url="http://test") as client:
+        return await client.request(method, "/records/bulk", json=payload or {"ids": [1, 2]}, headers=headers)
+
+
+@pytest.mark.asyncio
+async def test_patch_is_replayed(service, redis, calls):
+    first = await send(service, "PATCH", "verify-all-1")
+    second = await send(service, "PATCH", "verify-all-1")
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json() == {"updated": 2, "call": 1}
+    assert second.headers["idempotent-replayed"] == "true"
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_key_scoped_to_method(service, redis, calls):
+    await send(service, "PATCH", "same-key")
+    response = await send(service, "POST", "same-key")
+
+    assert response.json()["call"] == 2
+    assert "idempotent-replayed" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_unregistered_method_passes_through(service, redis, calls):
+    await send(service, "PUT", "key")
+    await send(service, "PUT", "key")
+
+    assert len(calls) == 2
+
+
+def lock_key(method, key):
+    """Ключ блокировки запроса без Authorization (см. IdempotencyMiddleware)"""
+    caller = hashlib.sha256(b"").hexdigest()[:32]
+    return f"idempotency:{caller}:{method}:/records/bulk:{key}:lock"
+
+
+@pytest.mark.asyncio
+async def test_post_is_replayed(service, redis, calls):
+    first = await send(service, "POST", "create-1")
+    second = await send(service, "POST", "create-1")
+
+    assert second.json() == first.json()
+    assert second.headers["idempotent-replayed"] == "true"
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_requests_without_key_are_not_deduplicated(service, redis, calls):
+    await send(service, "POST")
+    await send(service, "POST")
+
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_key_reused_with_other_payload(service, redis, calls):
+    await send(service, "POST", "create-1", {"ids": [1, 2]})
+    response = await send(service, "POST", "create-1", {"ids": [3]})
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_duplicate_waits_for_running_request(service, redis, calls, monkeypatch):
+    monkeypatch.setattr(idempotency, "POLL_INTERVAL", 0.01)
+    payload = {"ids": [1], "delay": 0.2}
+
+    first, second = await asyncio.gather(
+        send(service, "POST", "slow-1", payload),
+        send(service, "POST", "slow-1", payload),
+    )
+
+    assert first.json() == second.json()
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_request_still_running_after_lock_timeout(service, redis, calls, monkeypatch):
+    monkeypatch.setattr(idempotency, "POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT_SECONDS", 1)
+    # Первый запрос с этим ключом выполняется в другом процессе
+    await redis.set(lock_key("POST", "busy-1"), "other")
+
+    response = await send(service, "POST", "busy-1")
+
+    assert response.status_code == 409
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_server_errors_are_not_stored(service, redis, calls):
+    failed = await send(service, "POST", "retry-1", {"ids": [1], "fail": True})
+    retried = await send(service, "POST", "retry-1", {"ids": [1], "fail": True})
+
+    assert failed.status_code == retried.status_code == 503
+    assert "idempotent-replayed" not in retried.headers
+    assert len(calls) == 2
+    # Блокировка снята, ключ свободен для повтора
+    assert await redis.get(lock_key("POST", "retry-1")) is None
+
+
+@pytest.mark.asyncio
+async def test_fails_open_without_redis(service, calls, monkeypatch):
+    async def get_redis():
+        raise RedisConnectionError("Redis is down")
+
+    monkeypatch.setattr(idempotency, "get_redis", get_redis)
+
+    first = await send(service, "POST", "create-1")
+    second = await send(service, "POST", "create-1")
+
+    assert first.status_code == second.status_code == 200
+    assert len(calls) == 2
@@ -0,0 +1,115 @@
+# Tests for keyset pagination
+import base64
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+
+from app.auth import get_current_user
+from app.config import settings
+from app.database import get_db_sync
+from app.main import app
+from app.models.document import Document
+from app.models.finance import FinanceRecord
+from app.pagination import decode_cursor, encode_cursor, keyset_page
+
+USER_ID = 1
+KEY = [FinanceRecord.date, FinanceRecord.id]
+
+
+def add_records(db, *days):
+    for day in days:
+        db.add(FinanceRecord(user_id=USER_ID, date=day, amount=100, type="expense", description="Оплата"))
+    db.commit()
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor([date(2024, 3, 1), 42])
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, KEY) == [date(2024, 3, 1), 42]
+
+
+def test_datetime_cursor_round_trip():
+    created_at = datetime(2024, 3, 1, 12, 30, 15)
+    cursor = encode_cursor([created_at, 7])
+
+    assert decode_cursor(cursor, [Document.created_at, Document.id]) == [created_at, 7]
+
+
+@pytest.mark.parametrize("cursor", [
+    "не base64",
+    base64.urlsafe_b64encode(b"{not json").decode(),
+    encode_cursor([date(2024, 3, 1)]),  # Не та длина ключа
+    encode_cursor(["2024-13-01", 1]),  # Не дата
+    encode_cursor(["2024-03-01", "abc"]),  # Не id
+    base64.urlsafe_b64encode(b'{"date":"2024-03-01"}').decode(),  # Не список
+])
+def test_tampered_cursor_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, KEY)
+
+
+def test_pages_follow_date_then_id(finance_db):
+    # Несколько записей в один день: порядок внутри дня задаёт id
+    add_records(finance_db, date(2024, 3, 2), date(2024, 3, 1), date(2024, 3, 2), date(2024, 3, 1), date(2024, 3, 2))
+    query = finance_db.query(FinanceRecord)
+
+    seen = []
+    cursor = None
+    while True:
+        rows, cursor = keyset_page(query, KEY, cursor, 2)
+        seen.extend((row.date, row.id) for row in rows)
+        if cursor is None:
+            break
+
+    assert seen == sorted(((r.date, r.id) for r in query), reverse=True)
+    assert len(seen) == 5
+
+
+def test_last_full_page_has_no_cursor(finance_db):
+    add_records(finance_db, date(2024, 3, 1), date(2024, 3, 2))
+
+    rows, cursor = keyset_page(finance_db.query(FinanceRecord), KEY, None, 2)
+
+    assert len(rows) == 2
+    assert cursor is None
+
+
+def test_offset_ignored_with_cursor(finance_db):
+    add_records(finance_db, *[date(2024, 3, day) for day in range(1, 7)])
+    query = finance_db.query(FinanceRecord)
+
+    first, cursor = keyset_page(query, KEY, None, 2, offset=2)
+    assert [row.date.day for row in first] == [4, 3]
+
+    second, _ = keyset_page(query, KEY, cursor, 2, offset=2)
+    assert [row.date.day for row in second] == [2, 1]
+
+
+@pytest.fixture
+def client_db(finance_db):
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=USER_ID)
+    app.dependency_overrides[get_db_sync] = lambda: finance_db
+    yield finance_db
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_records_endpoint_exposes_cursor(client_db):
+    add_records(client_db, date(2024, 3, 1), date(2024, 3, 2), date(2024, 3, 3))
+    url = f"{settings.API_V1_PREFIX}/finance/records"
+    origin = {"Origin": settings.CORS_ORIGINS[0]}
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await client.get(url, params={"limit": 2}, headers=origin)
+        second = await client.get(url, params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+        tampered = await client.get(url, params={"cursor": "garbage"})
+
+    assert [r["date"] for r in first.json()] == ["2024-03-03", "2024-03-02"]
+    # Браузер отдаст заголовок скрипту только если он явно перечислен
+    assert "X-Next-Cursor" in first.headers["Access-Control-Expose-Headers"]
+    assert [r["date"] for r in second.json()] == ["2024-03-01"]
+    assert "X-Next-Cursor" not in second.headers
+    assert tampered.status_code == 400
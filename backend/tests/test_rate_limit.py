@@ -0,0 +1,113 @@
+# Tests for Redis token-bucket rate limits and quotas
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from fakeredis import aioredis as fake_aioredis
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app import rate_limit
+from app.config import settings
+from app.rate_limit import Quota, RateLimiter, consume_tokens
+
+USER = SimpleNamespace(id=1)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Общий сервер fakeredis для асинхронного (API) и синхронного (Celery) клиентов"""
+    server = fakeredis.FakeServer()
+    client = fake_aioredis.FakeRedis(server=server, decode_responses=True)
+
+    async def get_redis():
+        return client
+
+    monkeypatch.setattr(rate_limit, "get_redis", get_redis)
+    monkeypatch.setattr(rate_limit, "get_sync_redis", lambda: fakeredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    return server
+
+
+@pytest.mark.asyncio
+async def test_bucket_allows_capacity_then_rejects(server):
+    results = [await consume_tokens("bucket", 3, 3 / 60) for _ in range(4)]
+
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    # Один жетон восстанавливается за 20 секунд
+    assert 19 < results[-1][1] <= 20
+
+
+@pytest.mark.asyncio
+async def test_bucket_refills_over_time(server):
+    assert (await consume_tokens("bucket", 1, 10))[0] is True
+    assert (await consume_tokens("bucket", 1, 10))[0] is False
+
+    await asyncio.sleep(0.15)
+
+    assert (await consume_tokens("bucket", 1, 10))[0] is True
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_raises_429_per_user(server):
+    limiter = RateLimiter("test", 1, 60)
+    await limiter(current_user=USER)
+
+    with pytest.raises(HTTPException) as error:
+        await limiter(current_user=USER)
+
+    assert error.value.status_code == 429
+    assert error.value.headers["Retry-After"] == "60"
+    # У другого пользователя свой бакет
+    await limiter(current_user=SimpleNamespace(id=2))
+
+
+@pytest.mark.asyncio
+async def test_quota_charged_after_the_fact(server):
+    quota = Quota("tokens", 1000, 3600)
+    await quota.check(USER.id)
+
+    # Фактическая стоимость списывается полностью, даже больше остатка
+    await quota.charge(USER.id, 1500)
+
+    with pytest.raises(HTTPException) as error:
+        await quota.check(USER.id)
+    assert error.value.status_code == 429
+    # Долг 500 токенов при 1000 в час
+    assert 1790 <= int(error.value.headers["Retry-After"]) <= 1800
+
+
+@pytest.mark.asyncio
+async def test_sync_charge_shares_the_bucket(server):
+    quota = Quota("rows", 100, 3600)
+
+    quota.charge_sync(USER.id, 150)
+
+    with pytest.raises(HTTPException):
+        await quota.check(USER.id)
+
+
+@pytest.mark.asyncio
+async def test_fails_open_without_redis(monkeypatch):
+    async def get_redis():
+        raise RedisConnectionError("Redis is down")
+
+    def get_sync_redis():
+        raise RedisConnectionError("Redis is down")
+
+    monkeypatch.setattr(rate_limit, "get_redis", get_redis)
+    monkeypatch.setattr(rate_limit, "get_sync_redis", get_sync_redis)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+
+    assert await consume_tokens("bucket", 1, 1) == (True, 0.0)
+    await RateLimiter("test", 1, 60)(current_user=USER)
+    Quota("rows", 100, 3600).charge_sync(USER.id, 150)
+
+
+@pytest.mark.asyncio
+async def test_disabled_limits_skip_redis(server, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+
+    assert all([(await consume_tokens("bucket", 1, 1 / 60))[0] for _ in range(3)])
+    assert not fakeredis.FakeRedis(server=server).keys()
@@ -0,0 +1,52 @@
+# Tests for request coalescing
+import asyncio
+import threading
+import time
+
+import pytest
+from pydantic import BaseModel
+
+from app.config import settings
+from app.singleflight import SingleFlight
+
+
+class Result(BaseModel):
+    value: int
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution(monkeypatch):
+    monkeypatch.setattr(settings, "SINGLEFLIGHT_REDIS_ENABLED", False)
+    flight = SingleFlight("test")
+    calls = []
+    lock = threading.Lock()
+
+    def compute():
+        with lock:
+            calls.append(1)
+        time.sleep(0.05)
+        return Result(value=42)
+
+    results = await asyncio.gather(*[flight.do("key", compute, Result) for _ in range(5)])
+
+    assert len(calls) == 1
+    assert all(r.value == 42 for r in results)
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_waiters(monkeypatch):
+    monkeypatch.setattr(settings, "SINGLEFLIGHT_REDIS_ENABLED", False)
+    flight = SingleFlight("test")
+
+    def compute():
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(
+        *[flight.do("key", compute, Result) for _ in range(3)],
+        return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    # The key is released after failure
+    assert await flight.do("key", lambda: Result(value=1), Result) == Result(value=1)
@@ -0,0 +1,150 @@
+# Tests for delta sync
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+
+from app.auth import get_current_user
+from app.config import settings
+from app.database import get_db_sync
+from app.main import app
+from app.models.finance import FinanceRecord
+from app.models.sync import SyncHorizon, SyncTombstone
+from app.services.sync_service import SyncService
+
+USER_ID = 1
+
+
+@pytest.fixture
+def sync_db(finance_db, monkeypatch):
+    SyncTombstone.__table__.create(finance_db.get_bind())
+    SyncHorizon.__table__.create(finance_db.get_bind())
+    # В SQLite доступны только финансовые таблицы (имена индексов documents и tasks совпадают)
+    monkeypatch.setattr(SyncService, "ENTITIES", {"finance_records": FinanceRecord})
+    return finance_db
+
+
+def watermark(monkeypatch, xmin):
+    """Самая старая незавершённая транзакция (в PostgreSQL - pg_snapshot_xmin)"""
+    monkeypatch.setattr(SyncService, "snapshot_xmin", lambda self: xmin)
+
+
+def add_record(db, change_seq, user_id=USER_ID):
+    # В PostgreSQL change_seq ставит триггер
+    record = FinanceRecord(
+        user_id=user_id, date=date(2024, 3, 1), amount=100, type="expense",
+        description=f"Операция {change_seq}", change_seq=change_seq
+    )
+    db.add(record)
+    db.commit()
+    return record
+
+
+def synced(changes):
+    return [record.change_seq for record in changes["finance_records"]]
+
+
+def test_changes_after_cursor(sync_db, monkeypatch):
+    watermark(monkeypatch, 100)
+    for seq in (5, 10, 12):
+        add_record(sync_db, seq)
+    add_record(sync_db, 11, user_id=2)
+
+    changes = SyncService(sync_db).get_changes(USER_ID, 5)
+
+    assert synced(changes) == [10, 12]
+    assert changes["cursor"] == "99"
+    assert changes["has_more"] is False
+
+
+def test_running_transactions_stay_behind_watermark(sync_db, monkeypatch):
+    # Транзакция 20 ещё не завершена: её строки и всё после неё ждут следующей синхронизации
+    watermark(monkeypatch, 20)
+    for seq in (10, 20, 25):
+        add_record(sync_db, seq)
+
+    changes = SyncService(sync_db).get_changes(USER_ID, 0)
+    assert synced(changes) == [10]
+    assert changes["cursor"] == "19"
+
+    watermark(monkeypatch, 30)
+    changes = SyncService(sync_db).get_changes(USER_ID, int(changes["cursor"]))
+    assert synced(changes) == [20, 25]
+
+
+def test_cursor_never_moves_back(sync_db, monkeypatch):
+    watermark(monkeypatch, 10)
+
+    assert SyncService(sync_db).get_changes(USER_ID, 50)["cursor"] == "50"
+
+
+def test_pages_end_on_transaction_boundary(sync_db, monkeypatch):
+    watermark(monkeypatch, 100)
+    for seq in (10, 10, 11, 12):
+        add_record(sync_db, seq)
+
+    first = SyncService(sync_db).get_changes(USER_ID, 0, limit=2)
+    assert synced(first) == [10, 10]
+    assert first["has_more"] is True
+
+    second = SyncService(sync_db).get_changes(USER_ID, int(first["cursor"]), limit=2)
+    assert synced(second) == [11, 12]
+    assert second["has_more"] is False
+
+
+def test_large_transaction_returned_whole(sync_db, monkeypatch):
+    watermark(monkeypatch, 100)
+    for seq in (10, 10, 10, 11):
+        add_record(sync_db, seq)
+
+    changes = SyncService(sync_db).get_changes(USER_ID, 0, limit=2)
+
+    assert synced(changes) == [10, 10, 10]
+    assert changes["cursor"] == "10"
+    assert changes["has_more"] is True
+
+
+def test_tombstones_reported_as_deleted(sync_db, monkeypatch):
+    watermark(monkeypatch, 100)
+    sync_db.add_all([
+        SyncTombstone(id=1, user_id=USER_ID, entity="finance_record", entity_id=7, change_seq=8),
+        SyncTombstone(id=2, user_id=USER_ID, entity="task", entity_id=3, change_seq=15),
+        SyncTombstone(id=3, user_id=2, entity="task", entity_id=4, change_seq=15),
+    ])
+    sync_db.commit()
+
+    changes = SyncService(sync_db).get_changes(USER_ID, 10)
+
+    assert changes["deleted"] == [{"entity": "task", "id": 3}]
+
+
+@pytest.fixture
+def sync_client(sync_db, monkeypatch):
+    watermark(monkeypatch, 100)
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=USER_ID)
+    app.dependency_overrides[get_db_sync] = lambda: sync_db
+    yield
+    app.dependency_overrides.clear()
+
+
+async def get_sync(since):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        return await client.get(f"{settings.API_V1_PREFIX}/sync", params={"since": since})
+
+
+@pytest.mark.asyncio
+async def test_cursor_behind_prune_horizon_is_gone(sync_client, sync_db):
+    sync_db.add(SyncHorizon(id=1, change_seq=50))
+    sync_db.commit()
+
+    assert (await get_sync("49")).status_code == 410
+    assert (await get_sync("50")).status_code == 200
+    # Полная синхронизация доступна всегда
+    assert (await get_sync("0")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_invalid_cursor(sync_client):
+    assert (await get_sync("abc")).status_code == 400
+    assert (await get_sync("-1")).status_code == 400
@@ -1,9 +1,11 @@
 import apiClient from './client'
 import type {
   FinanceRecord,
+  FinanceRecordPage,
   FinanceRecordCreate,
   FinanceRecordUpdate,
   CSVUploadResponse,
+  FinanceImportJob,
   FinanceSummary,
   FinanceSummaryWithTrends,
   CashFlowData,
@@ -37,10 +39,13 @@ export const financeAPI = {
     type?: 'income' | 'expense'
     category?: string
     limit?: number
-    offset?: number
-  }): Promise<FinanceRecord[]> {
+    cursor?: string
+  }): Promise<FinanceRecordPage> {
     const response = await apiClient.get('/finance/records', { params })
-    return response.data
+    return {
+      records: response.data,
+      nextCursor: response.headers['x-next-cursor'] ?? null,
+    }
   },
 
   /**
@@ -84,6 +89,48 @@ export const financeAPI = {
     return response.data
   },
 
+  // ========== Фоновый импорт ==========
+
+  /**
+   * Загрузить выписку частями; после обрыва загрузка продолжается
+   * со смещения, которое вернул сервер
+   */
+  async uploadStatementInChunks(
+    file: File,
+    onProgress?: (job: FinanceImportJob) => void,
+    chunkSize = 8 * 1024 * 1024
+  ): Promise<FinanceImportJob> {
+    let job: FinanceImportJob = (await apiClient.post('/finance/imports', {
+      file_name: file.name,
+      total_size: file.size,
+    })).data
+
+    let retries = 0
+    while (job.status === 'uploading') {
+      const offset = job.received_size
+      try {
+        job = (await apiClient.put(`/finance/imports/${job.id}/chunks`, file.slice(offset, offset + chunkSize), {
+          params: { offset },
+          headers: { 'Content-Type': 'application/octet-stream' },
+        })).data
+        retries = 0
+      } catch (e: any) {
+        if (++retries > 3 || (e.response && e.response.status !== 409)) throw e
+        job = await this.getImport(job.id)
+      }
+      onProgress?.(job)
+    }
+    return job
+  },
+
+  /**
+   * Статус фонового импорта
+   */
+  async getImport(id: number): Promise<FinanceImportJob> {
+    const response = await apiClient.get(`/finance/imports/${id}`)
+    return response.data
+  },
+
   // ========== Аналитика ==========
   
   /**
@@ -14,11 +14,14 @@ import type {
   BudgetStatus,
   FinanceGoal,
   FinanceGoalCreate,
+  FinanceImportJob,
+  CSVUploadResponse,
 } from '@/types/finance'
 
 export const useFinanceStore = defineStore('finance', () => {
   // ========== State ==========
   const records = ref<FinanceRecord[]>([])
+  const recordsCursor = ref<string | null>(null)
   const currentSummary = ref<FinanceSummary | null>(null)
   const summaryWithTrends = ref<FinanceSummaryWithTrends | null>(null)
   const cashFlowData = ref<CashFlowData | null>(null)
@@ -34,6 +37,7 @@ export const useFinanceStore = defineStore('finance', () => {
   const totalExpense = computed(() => currentSummary.value?.total_expense || 0)
   const netIncome = computed(() => currentSummary.value?.net_income || 0)
   
+  const hasMoreRecords = computed(() => recordsCursor.value !== null)
   const incomeRecords = computed(() => records.value.filter(r => r.type === 'income'))
   const expenseRecords = computed(() => records.value.filter(r => r.type === 'expense'))
   
@@ -42,16 +46,39 @@ export const useFinanceStore = defineStore('finance', () => {
   
   // ========== Actions: Records ==========
   
-  async function fetchRecords(params?: {
+  type RecordFilters = {
     start_date?: string
     end_date?: string
     type?: 'income' | 'expense'
     category?: string
-  }) {
+  }
+  let recordFilters: RecordFilters | undefined
+  
+  async function fetchRecords(params?: RecordFilters) {
+    try {
+      loading.value = true
+      error.value = null
+      recordFilters = params
+      const page = await financeAPI.getRecords(params)
+      records.value = page.records
+      recordsCursor.value = page.nextCursor
+    } catch (e: any) {
+      error.value = e.response?.data?.detail || 'Ошибка загрузки транзакций'
+      throw e
+    } finally {
+      loading.value = false
+    }
+  }
+
+  // Следующая страница с теми же фильтрами: курсор продолжает после последней записи
+  async function fetchMoreRecords() {
+    if (recordsCursor.value === null) return
     try {
       loading.value = true
       error.value = null
-      records.value = await financeAPI.getRecords(params)
+      const page = await financeAPI.getRecords({ ...recordFilters, cursor: recordsCursor.value })
+      records.value.push(...page.records)
+      recordsCursor.value = page.nextCursor
     } catch (e: any) {
       error.value = e.response?.data?.detail || 'Ошибка загрузки транзакций'
       throw e
@@ -113,11 +140,39 @@ export const useFinanceStore = defineStore('finance', () => {
 
   // ========== Actions: CSV Upload ==========
   
+  // Большие файлы загружаются частями и импортируются в фоне
+  const CHUNKED_UPLOAD_THRESHOLD = 10 * 1024 * 1024
+  const importJob = ref<FinanceImportJob | null>(null)
+  
+  async function importInBackground(file: File): Promise<CSVUploadResponse> {
+    let job = await financeAPI.uploadStatementInChunks(file, (current) => {
+      importJob.value = current
+    })
+    while (job.status === 'queued' || job.status === 'processing') {
+      await new Promise(resolve => setTimeout(resolve, 2000))
+      job = await financeAPI.getImport(job.id)
+      importJob.value = job
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Ошибка импорта')
+    }
+    return {
+      success: true,
+      records_created: job.records_created,
+      records_failed: job.records_failed,
+      records_skipped: job.records_skipped,
+      errors: job.errors,
+      file_name: job.file_name,
+    }
+  }
+  
   async function uploadCSV(file: File) {
     try {
       loading.value = true
       error.value = null
-      const response = await financeAPI.uploadCSV(file)
+      const response = file.size > CHUNKED_UPLOAD_THRESHOLD
+        ? await importInBackground(file)
+        : await financeAPI.uploadCSV(file)
       // Перезагружаем данные после импорта
       await Promise.all([
         fetchRecords(),
@@ -272,6 +327,8 @@ export const useFinanceStore = defineStore('finance', () => {
 
   function $reset() {
     records.value = []
+    recordsCursor.value = null
+    recordFilters = undefined
     currentSummary.value = null
     cashFlowData.value = null
     insights.value = null
@@ -284,6 +341,7 @@ export const useFinanceStore = defineStore('finance', () => {
   return {
     // State
     records,
+    recordsCursor,
     currentSummary,
     summaryWithTrends,
     cashFlowData,
@@ -292,11 +350,13 @@ export const useFinanceStore = defineStore('finance', () => {
     goals,
     loading,
     error,
+    importJob,
     
     // Computed
     totalIncome,
     totalExpense,
     netIncome,
+    hasMoreRecords,
     incomeRecords,
     expenseRecords,
     activeBudgets,
@@ -304,6 +364,7 @@ export const useFinanceStore = defineStore('finance', () => {
     
     // Actions
     fetchRecords,
+    fetchMoreRecords,
     createRecord,
     updateRecord,
     deleteRecord,
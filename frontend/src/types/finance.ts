@@ -22,6 +22,12 @@ export interface FinanceRecord {
   updated_at?: string
 }
 
+// Страница записей; nextCursor из заголовка X-Next-Cursor, null на последней странице
+export interface FinanceRecordPage {
+  records: FinanceRecord[]
+  nextCursor: string | null
+}
+
 export interface FinanceRecordCreate {
   date: string
   description?: string
@@ -57,10 +63,27 @@ export interface CSVUploadResponse {
   success: boolean
   records_created: number
   records_failed: number
+  records_skipped?: number
   errors: string[]
   file_name: string
 }
 
+export interface FinanceImportJob {
+  id: number
+  file_name: string
+  status: 'uploading' | 'queued' | 'processing' | 'completed' | 'failed'
+  total_size: number
+  received_size: number
+  rows_processed: number
+  records_created: number
+  records_failed: number
+  records_skipped: number
+  errors: string[]
+  error?: string
+  created_at: string
+  updated_at?: string
+}
+
 // ========== Summary Types ==========
 
 export interface CategorySummary {